@@ -0,0 +1,94 @@
+"""Fan-out latency of the shared rig-state bus (utils/rig_bus.py).
+
+Starts N subscriber threads, each with its own Subscription and local
+ValveStates, then publishes random valve toggles.  Latency is measured from
+publish to the moment a subscriber has applied the diff locally.
+
+    python benchmarks/bench_bus.py --subscribers 50 --events 2000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.rig_bus import RigStateService
+from utils.valve_state import ValveStates
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q / 100 * len(samples)))]
+
+
+def run(subscribers, events, valves, interval):
+    service = RigStateService()
+    published = {}  # version -> perf_counter at publish
+    latencies = [[] for _ in range(subscribers)]
+    done = threading.Event()
+    ready = threading.Barrier(subscribers + 1)
+
+    def subscriber(slot):
+        sub = service.subscribe()
+        states = ValveStates()
+        ready.wait()
+        while not done.is_set() or sub.version != service.version:
+            seen = sub.version
+            service.wait(seen, timeout=0.1)
+            states.apply(sub.poll(states.bits))
+            now = time.perf_counter()
+            # Every diff folded into this poll counts as delivered now
+            for version in range(seen + 1, sub.version + 1):
+                latencies[slot].append(now - published[version])
+        assert states.bits == service.bits
+
+    threads = [threading.Thread(target=subscriber, args=(i,), daemon=True) for i in range(subscribers)]
+    for t in threads:
+        t.start()
+    ready.wait()
+
+    rng = random.Random(0)
+    start = time.perf_counter()
+    for _ in range(events):
+        pos = rng.randrange(valves)
+        published[service.version + 1] = time.perf_counter()
+        service.toggle(pos)
+        if interval:
+            time.sleep(interval)
+    elapsed = time.perf_counter() - start
+    done.set()
+    for t in threads:
+        t.join()
+
+    samples = [x * 1e6 for per_sub in latencies for x in per_sub]
+    return {
+        "subscribers": subscribers,
+        "events": events,
+        "publish_rate_per_s": events / elapsed,
+        "deliveries": len(samples),
+        "p50_us": percentile(samples, 50),
+        "p95_us": percentile(samples, 95),
+        "p99_us": percentile(samples, 99),
+        "mean_us": statistics.fmean(samples),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subscribers", type=int, default=50)
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--valves", type=int, default=500)
+    parser.add_argument("--interval", type=float, default=0.001,
+                        help="seconds between published toggles (0 = as fast as possible)")
+    args = parser.parse_args()
+
+    result = run(args.subscribers, args.events, args.valves, args.interval)
+    for key, value in result.items():
+        print(f"{key:>20}: {value:,.1f}" if isinstance(value, float) else f"{key:>20}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Per-click server time: full script rerun vs the live_view fragment.
+
+Before fragments every valve button ended in ``st.rerun()``, so a click
+cost two full runs of streamlit_app.py (the click run plus the rerun).  Now
+a click re-runs only the ``live_view`` fragment.  For each system this
+script times a full run through AppTest and reads the fragment's own timing
+from ``st.session_state.click_timings``.
+
+    python benchmarks/bench_clicks.py --clicks 20
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from utils.systems import DISPLAY_NAMES, REGISTRY
+
+NAV_LABELS = {key: config.nav_label for key, config in REGISTRY.items()}
+
+
+def bench_system(system_name, clicks):
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(ROOT, "streamlit_app.py"), default_timeout=60).run()
+    next(b for b in at.button if b.label == NAV_LABELS[system_name]).click().run()
+
+    full, fragment = [], []
+    for _ in range(clicks):
+        start = time.perf_counter()
+        at.run()
+        full.append((time.perf_counter() - start) * 1000)
+
+        button = next(b for b in at.button if b.key and b.key.startswith("valve_"))
+        button.click().run()
+        fragment.append(at.session_state["click_timings"][system_name])
+    return statistics.median(full), statistics.median(fragment)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clicks", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'system':<18}{'before: 2x full run':>22}{'after: fragment':>18}")
+    for system_name in NAV_LABELS:
+        full_ms, fragment_ms = bench_system(system_name, args.clicks)
+        print(f"{DISPLAY_NAMES[system_name]:<18}{2 * full_ms:>19.1f} ms{fragment_ms:>15.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Interlock evaluation cost on synthetic rigs with thousands of rules (utils/interlocks.py).
+
+For each (segments, rules) case a synthetic rig (``utils.synthetic``) gets
+random rules; the benchmark times compiling the rule set, then a random
+walk of single valve toggles: ``InterlockState.update`` after each move and
+the ``reasons`` lookup the valve buttons make.
+
+    python benchmarks/bench_interlocks.py
+    python benchmarks/bench_interlocks.py --cases 10000:5000 100000:20000 --moves 5000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.interlocks import InterlockState
+from utils.shared import compile_data
+from utils.synthetic import generate
+from utils.systems import SystemConfig
+
+CASES = ((1_000, 1_000), (10_000, 5_000), (100_000, 20_000))
+
+
+def percentile(samples, q):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q / 100 * len(samples)))]
+
+
+def run(segments, rules, moves, seed=0):
+    rig = generate(segments, seed=seed, name=f"interlocks_{segments}")
+    entry = dict(rig.registry_entry(None, None, None), interlocks=rig.interlocks(rules, seed))
+    compiled = compile_data(rig.name, rig.valves_json(), rig.pipes_json(), config=SystemConfig(rig.name, entry))
+    compiled.reach  # the index the rule masks come from is timed separately
+
+    start = time.perf_counter()
+    rule_set = compiled.interlocks
+    compile_ms = (time.perf_counter() - start) * 1000
+
+    rng = random.Random(seed)
+    positions = list(compiled.positions)
+    bits = 0
+    for pos in rng.sample(positions, len(positions) // 3):
+        bits |= 1 << pos
+    state = InterlockState(rule_set, bits)
+    updates, lookups, touched = [], [], []
+    for _ in range(moves):
+        pos = rng.choice(positions)
+        start = time.perf_counter()
+        state.reasons(pos, not bits >> pos & 1)
+        lookups.append((time.perf_counter() - start) * 1e6)
+        bits ^= 1 << pos
+        start = time.perf_counter()
+        touched.append(state.update(bits))
+        updates.append((time.perf_counter() - start) * 1e6)
+    return {
+        "segments": segments,
+        "rules": len(rule_set),
+        "compile_ms": compile_ms,
+        "update_p50_us": percentile(updates, 50),
+        "update_p99_us": percentile(updates, 99),
+        "reasons_p50_us": percentile(lookups, 50),
+        "rules_per_move": statistics.fmean(touched),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", nargs="*", default=[f"{s}:{r}" for s, r in CASES],
+                        help="SEGMENTS:RULES pairs")
+    parser.add_argument("--moves", type=int, default=2000)
+    args = parser.parse_args()
+
+    columns = ("segments", "rules", "compile_ms", "update_p50_us", "update_p99_us", "reasons_p50_us",
+               "rules_per_move")
+    print("".join(f"{name:>16}" for name in columns))
+    for case in args.cases:
+        segments, rules = (int(part) for part in case.split(":"))
+        result = run(segments, rules, args.moves)
+        print("".join(f"{result[name]:>16,.1f}" if isinstance(result[name], float) else f"{result[name]:>16,}"
+                      for name in columns))
+
+
+if __name__ == "__main__":
+    main()
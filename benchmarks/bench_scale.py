@@ -0,0 +1,156 @@
+"""Load / solve / render benchmarks on the shipped systems and synthetic rigs.
+
+For every shipped system and for synthetic rigs (``utils.synthetic``) of
+100, 1k, 10k and 100k pipe segments this times:
+
+* ``load``   - JSON parse + model build + spatial index + solver tables
+               (+ PNG decode for shipped systems; synthetic drawings are pre-made)
+* ``solve``  - one flow/pressure solve for a random valve state
+* ``render`` - drawing the overlay on a copy of the P&ID
+
+and writes the results as JSON, so two runs can be compared:
+
+    python benchmarks/bench_scale.py --json before.json
+    python benchmarks/bench_scale.py --json after.json --compare before.json
+    python benchmarks/bench_scale.py --sizes 100 1000 --skip-shipped --quick
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SIZES = (100, 1_000, 10_000, 100_000)
+PHASES = ("load", "solve", "render")
+
+
+def timed(fn, repeat):
+    """``(result of the last call, [ms per call])``"""
+    times = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return result, times
+
+
+def summary(times):
+    return {"median_ms": statistics.median(times), "min_ms": min(times), "runs": len(times)}
+
+
+def bench_case(name, load, repeat):
+    """Time load/solve/render for one system; ``load()`` returns a CompiledSystem"""
+    from utils.render import render_pid_with_overlay
+    from utils.solver import solve
+
+    compiled, load_times = timed(load, repeat["load"])
+    rng = random.Random(1)
+    bits = [rng.getrandbits(max(1, max(compiled.positions, default=0) + 1)) for _ in range(repeat["solve"])]
+    states = iter(bits)
+    solution, solve_times = timed(lambda: solve(compiled.topology, next(states)), repeat["solve"])
+    _, render_times = timed(lambda: render_pid_with_overlay(compiled, bits[-1], solution), repeat["render"])
+    result = {
+        "pipes": len(compiled.model.pipes),
+        "valves": len(compiled.model.valves),
+        "load": summary(load_times),
+        "solve": summary(solve_times),
+        "render": summary(render_times),
+    }
+    print(f"{name:<16}{result['pipes']:>8}{result['valves']:>8}"
+          + "".join(f"{result[phase]['median_ms']:>12.2f}" for phase in PHASES))
+    return result
+
+
+def shipped_loader(system_name):
+    from utils.shared import compile_system
+    return lambda: compile_system(system_name)
+
+
+def synthetic_loader(segments):
+    from utils.shared import compile_data
+    from utils.synthetic import generate
+    from utils.systems import SystemConfig
+
+    rig = generate(segments, seed=segments)
+    valves_text, pipes_text = json.dumps(rig.valves_json()), json.dumps(rig.pipes_json())
+    config = SystemConfig(rig.name, rig.registry_entry(None, None, None))
+    image = rig.image().convert("RGBA")
+
+    def load():
+        return compile_data(config.key, json.loads(valves_text), json.loads(pipes_text),
+                            image=image, config=config)
+    return load
+
+
+def environment():
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                  capture_output=True, text=True).stdout.strip()
+    except OSError:
+        revision = ""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "revision": revision,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def compare(results, baseline_path):
+    """Print median ratios against an earlier ``--json`` file"""
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)["results"]
+    print(f"\nvs {baseline_path} (new / old median; <1 is faster)")
+    for case, result in results.items():
+        old = baseline.get(case)
+        if old is None:
+            continue
+        ratios = [f"{phase} {result[phase]['median_ms'] / old[phase]['median_ms']:.2f}x"
+                  for phase in PHASES if old.get(phase, {}).get("median_ms")]
+        print(f"  {case:<16}" + "   ".join(ratios))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="*", default=list(SIZES), help="synthetic rig sizes")
+    parser.add_argument("--skip-shipped", action="store_true", help="only the synthetic rigs")
+    parser.add_argument("--quick", action="store_true", help="fewer repetitions")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="earlier --json file to compare against")
+    args = parser.parse_args()
+
+    from utils.systems import REGISTRY
+
+    repeat = {"load": 3, "solve": 200, "render": 5}
+    if args.quick:
+        repeat = {"load": 1, "solve": 20, "render": 1}
+
+    print(f"{'case':<16}{'pipes':>8}{'valves':>8}" + "".join(f"{p + ' ms':>12}" for p in PHASES))
+    results = {}
+    if not args.skip_shipped:
+        for system_name in REGISTRY:
+            results[system_name] = bench_case(system_name, shipped_loader(system_name), repeat)
+    for segments in args.sizes:
+        # Big rigs: fewer repetitions of the slow phases
+        scaled = dict(repeat, load=max(1, repeat["load"] // (1 + segments // 10_000)),
+                      render=max(1, repeat["render"] // (1 + segments // 10_000)))
+        results[f"synthetic_{segments}"] = bench_case(f"synthetic_{segments}", synthetic_loader(segments), scaled)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({"environment": environment(), "repeat": repeat, "results": results}, f, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""Cold-start budget: import time and time to first paint per page.
+
+Each target (the dashboard home page and every registered system) is run
+in a fresh interpreter under ``-X importtime``: the child times its first
+AppTest run from interpreter start-up, and the parent reads the import log
+for the total and the app's own (``utils.*``) import time.  Background
+warm-up is switched off (``RIG_WARMUP=0``) so each number is the page on
+its own.
+
+    python benchmarks/bench_startup.py                  # table
+    python benchmarks/bench_startup.py --json out.json  # also save results
+    python benchmarks/bench_startup.py --check          # exit 1 if over budget
+    python -m pytest tests/test_startup.py              # same check, one test per target
+
+The budget lives in ``benchmarks/startup_budget.json``: a first-paint limit
+per target (``"system"`` covers every system without its own entry), a
+limit on app import time, and modules the home page must not load.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_PATH = os.path.join(ROOT, "benchmarks", "startup_budget.json")
+HEAVY_MODULES = ("PIL", "numpy", "pandas", "pyarrow")
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|(\s+)(\S+)$")
+
+
+def child(target):
+    """Run one page in this (fresh) process and print its first-paint timing"""
+    start = time.perf_counter()
+    from streamlit.testing.v1 import AppTest
+
+    if target == "home":
+        at = AppTest.from_file(os.path.join(ROOT, "streamlit_app.py"), default_timeout=120)
+    else:
+        at = AppTest.from_file(os.path.join(ROOT, "page", "system.py"), default_timeout=120)
+        at.query_params["system"] = target
+    run_start = time.perf_counter()
+    at.run()
+    end = time.perf_counter()
+    print(json.dumps({
+        "paint_ms": (end - start) * 1000,
+        "run_ms": (end - run_start) * 1000,
+        "errors": [str(e.value) for e in at.exception],
+        "heavy_modules": [m for m in HEAVY_MODULES if m in sys.modules],
+    }))
+
+
+def parse_importtime(stderr):
+    """``(total_ms, app_ms, top)`` from ``-X importtime`` output"""
+    total = app = 0
+    top = []
+    for line in stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, module = int(match.group(1)), int(match.group(2)), match.group(4)
+        total += self_us
+        if module == "utils" or module.startswith("utils."):
+            app += self_us
+        if len(match.group(3)) <= 3:  # top-level imports only
+            top.append((cumulative_us / 1000, module))
+    top.sort(reverse=True)
+    return total / 1000, app / 1000, top[:5]
+
+
+def measure(target, repeat):
+    env = dict(os.environ, RIG_WARMUP="0", PYTHONPATH=ROOT)
+    runs = []
+    for _ in range(repeat):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", os.path.abspath(__file__), "--child", target],
+            capture_output=True, text=True, env=env, cwd=ROOT, check=True)
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        result["import_ms"], result["app_import_ms"], result["top_imports"] = parse_importtime(proc.stderr)
+        runs.append(result)
+    best = min(runs, key=lambda r: r["paint_ms"])
+    return {
+        "paint_ms": statistics.median(r["paint_ms"] for r in runs),
+        "run_ms": statistics.median(r["run_ms"] for r in runs),
+        "import_ms": statistics.median(r["import_ms"] for r in runs),
+        "app_import_ms": statistics.median(r["app_import_ms"] for r in runs),
+        "errors": best["errors"],
+        "heavy_modules": best["heavy_modules"],
+        "top_imports": best["top_imports"],
+    }
+
+
+def check(results, budget):
+    """Budget violations as human-readable strings (empty when within budget)"""
+    failures = []
+    paint_budget = budget["paint_ms"]
+    for target, result in results.items():
+        limit = paint_budget.get(target, paint_budget["system"])
+        if result["paint_ms"] > limit:
+            failures.append(f"{target}: first paint {result['paint_ms']:.0f} ms > {limit} ms")
+        if result["app_import_ms"] > budget["app_import_ms"]:
+            failures.append(f"{target}: app imports {result['app_import_ms']:.1f} ms "
+                            f"> {budget['app_import_ms']} ms")
+        if result["errors"]:
+            failures.append(f"{target}: page raised {result['errors'][0]}")
+    loaded = set(results.get("home", {}).get("heavy_modules", ())) & set(budget["home_forbidden_modules"])
+    if loaded:
+        failures.append(f"home: loads {', '.join(sorted(loaded))} before first paint")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--repeat", type=int, default=3, help="fresh processes per target (median)")
+    parser.add_argument("--targets", nargs="*", help="home and/or system keys (default: all)")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--check", action="store_true", help="fail if over benchmarks/startup_budget.json")
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+        return 0
+
+    sys.path.insert(0, ROOT)
+    from utils.systems import REGISTRY
+
+    targets = args.targets or ["home", *REGISTRY]
+    results = {}
+    print(f"{'target':<10}{'first paint':>14}{'first run':>12}{'imports':>11}{'app':>9}  heavy modules")
+    for target in targets:
+        result = results[target] = measure(target, args.repeat)
+        print(f"{target:<10}{result['paint_ms']:>11.0f} ms{result['run_ms']:>9.0f} ms"
+              f"{result['import_ms']:>8.0f} ms{result['app_import_ms']:>6.1f} ms  "
+              f"{', '.join(result['heavy_modules']) or '-'}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.check:
+        with open(BUDGET_PATH, 'r') as f:
+            failures = check(results, json.load(f))
+        for failure in failures:
+            print(f"FAIL {failure}")
+        if failures:
+            return 1
+        print("Cold start within budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
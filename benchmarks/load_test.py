@@ -0,0 +1,274 @@
+"""Headless multi-session load test of streamlit_app.py.
+
+Starts the dashboard on a local port (or targets ``--url``) and opens N
+websocket sessions that speak Streamlit's own protocol, like N browser
+tabs: each session opens the home page, switches to a system, then at a
+Poisson rate toggles a random valve (a fragment rerun, as in the browser)
+or, less often, switches system.  Latency is measured from the click to
+the server's ``script_finished`` message.  CPU and RSS are sampled from the
+server process via /proc, so everything runs offline on one Linux box:
+
+    python benchmarks/load_test.py --sessions 20 --duration 60 --rate 0.5
+    python benchmarks/load_test.py --sessions 50 --duration 600 --json shift.json
+    python benchmarks/load_test.py --url ws://127.0.0.1:8501 --pid 1234
+
+(AppTest is not used for this: it swaps process-global runtime state on
+every run, so concurrent AppTest sessions in one process corrupt each
+other's results.)
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+# ==================== SERVER ====================
+def start_server(port):
+    """Dashboard with warm-up at boot, as in .devcontainer; returns the process"""
+    server = subprocess.Popen(
+        [sys.executable, "-m", "utils.warmup", "run", "streamlit_app.py",
+         "--server.headless", "true", "--server.port", str(port),
+         "--browser.gatherUsageStats", "false"],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=1):
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.kill()
+    raise RuntimeError(f"server did not come up on port {port}")
+
+
+def proc_rss(pid):
+    with open(f"/proc/{pid}/statm") as f:
+        return int(f.read().split()[1]) * PAGE_SIZE
+
+
+def proc_cpu_seconds(pid):
+    with open(f"/proc/{pid}/stat") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / CLOCK_TICKS  # utime + stime
+
+
+def percentiles(samples):
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered),
+        "p50_ms": pick(0.50),
+        "p90_ms": pick(0.90),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "max_ms": ordered[-1],
+    }
+
+
+# ==================== CLIENT ====================
+class Session:
+    """One browser-like websocket session"""
+
+    def __init__(self, url):
+        self.url = url
+        self.ws = None
+        self.page_hash = ""
+        self.buttons = {}  # widget id -> (label, fragment id)
+
+    async def connect(self):
+        import websockets
+
+        self.ws = await websockets.connect(f"{self.url}/_stcore/stream", subprotocols=["streamlit"],
+                                           max_size=None, open_timeout=30)
+
+    async def close(self):
+        await self.ws.close()
+
+    async def rerun(self, button=None, timeout=120):
+        """Send a rerun, optionally clicking widget ``button``; ``(elapsed_ms, had_exception)``"""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        msg = BackMsg()
+        msg.rerun_script.query_string = ""
+        msg.rerun_script.page_script_hash = self.page_hash
+        fragment_id = ""
+        if button is not None:
+            fragment_id = self.buttons[button][1]
+            state = msg.rerun_script.widget_states.widgets.add()
+            state.id = button
+            state.trigger_value = True
+            if fragment_id:
+                msg.rerun_script.fragment_id = fragment_id
+        # The run redraws the whole page or just the fragment's buttons
+        self.buttons = {widget_id: entry for widget_id, entry in self.buttons.items()
+                        if fragment_id and entry[1] != fragment_id}
+
+        start = time.perf_counter()
+        await self.ws.send(msg.SerializeToString())
+        failed = False
+        while True:
+            forward = ForwardMsg()
+            forward.ParseFromString(await asyncio.wait_for(self.ws.recv(), timeout))
+            kind = forward.WhichOneof("type")
+            if kind == "new_session":
+                self.page_hash = forward.new_session.page_script_hash
+            elif kind == "delta" and forward.delta.WhichOneof("type") == "new_element":
+                element = forward.delta.new_element
+                if element.WhichOneof("type") == "button":
+                    self.buttons[element.button.id] = (element.button.label, forward.delta.fragment_id)
+                elif element.WhichOneof("type") == "exception":
+                    failed = True
+            elif kind == "script_finished":
+                if forward.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    return (time.perf_counter() - start) * 1000, failed
+
+    def valve_buttons(self):
+        return [widget_id for widget_id in self.buttons if "-valve_" in widget_id]
+
+    def nav_buttons(self, labels):
+        return [widget_id for widget_id, (label, _) in self.buttons.items() if label in labels]
+
+
+async def operator(number, args, url, nav_labels, deadline, record):
+    """Open, pick a system, then toggle valves / switch systems until ``deadline``"""
+    rng = random.Random(args.seed * 1000 + number)
+    session = Session(url)
+    await session.connect()
+    try:
+        record("open", *await session.rerun())
+        record("navigate", *await session.rerun(rng.choice(session.nav_buttons(nav_labels))))
+        while True:
+            await asyncio.sleep(rng.expovariate(args.rate))
+            if time.perf_counter() >= deadline:
+                break
+            valves = session.valve_buttons()
+            nav = session.nav_buttons(nav_labels)
+            if valves and (rng.random() >= args.navigate_ratio or not nav):
+                record("toggle", *await session.rerun(rng.choice(valves)))
+            elif nav:
+                record("navigate", *await session.rerun(rng.choice(nav)))
+            else:
+                record("refresh", *await session.rerun())
+    finally:
+        await session.close()
+
+
+async def run_load(args, url, pid, nav_labels):
+    latencies, errors, samples = {}, {}, []
+
+    def record(kind, elapsed_ms, failed):
+        latencies.setdefault(kind, []).append(elapsed_ms)
+        if failed:
+            errors[kind] = errors.get(kind, 0) + 1
+
+    async def sample():
+        last_wall, last_cpu = time.perf_counter(), proc_cpu_seconds(pid)
+        while True:
+            await asyncio.sleep(0.5)
+            wall, cpu = time.perf_counter(), proc_cpu_seconds(pid)
+            samples.append({"cpu_percent": 100 * (cpu - last_cpu) / (wall - last_wall), "rss": proc_rss(pid)})
+            last_wall, last_cpu = wall, cpu
+
+    sampler = asyncio.create_task(sample()) if pid else None
+    start = time.perf_counter()
+    deadline = start + args.ramp + args.duration
+    tasks = []
+    for number in range(args.sessions):
+        tasks.append(asyncio.create_task(operator(number, args, url, nav_labels, deadline, record)))
+        await asyncio.sleep(args.ramp / max(1, args.sessions))
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    if sampler:
+        sampler.cancel()
+    failures = [repr(r) for r in results if isinstance(r, BaseException)]
+    return time.perf_counter() - start, latencies, errors, samples, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=10, help="concurrent sessions")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load after ramp-up")
+    parser.add_argument("--rate", type=float, default=0.5, help="interactions per second per session")
+    parser.add_argument("--navigate-ratio", type=float, default=0.1,
+                        help="share of interactions that switch system instead of toggling a valve")
+    parser.add_argument("--ramp", type=float, default=5, help="seconds over which sessions start")
+    parser.add_argument("--systems", nargs="*", help="registry keys to visit (default: all)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--port", type=int, default=8599, help="port for the server started here")
+    parser.add_argument("--url", help="existing server, e.g. ws://127.0.0.1:8501 (not started here)")
+    parser.add_argument("--pid", type=int, help="server PID for CPU/RSS when using --url")
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args()
+
+    from utils.systems import REGISTRY
+
+    nav_labels = [REGISTRY[key].nav_label for key in (args.systems or REGISTRY)]
+    server = None
+    if args.url:
+        url, pid = args.url.rstrip("/"), args.pid
+    else:
+        server = start_server(args.port)
+        url, pid = f"ws://127.0.0.1:{args.port}", server.pid
+    try:
+        rss_start = proc_rss(pid) if pid else 0
+        wall, latencies, errors, samples, failures = asyncio.run(run_load(args, url, pid, nav_labels))
+        rss_end = proc_rss(pid) if pid else 0
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(10)
+
+    interactions = sum(len(v) for v in latencies.values())
+    cpu = [s["cpu_percent"] for s in samples] or [0.0]
+    rss = [s["rss"] for s in samples] or [rss_end]
+    report = {
+        "config": vars(args),
+        "wall_s": wall,
+        "interactions": interactions,
+        "throughput_per_s": interactions / wall,
+        "latency": {kind: percentiles(values) for kind, values in latencies.items()},
+        "errors": errors,
+        "session_failures": failures,
+        "server_cpu_percent": {"mean": statistics.fmean(cpu), "max": max(cpu)},
+        "server_rss_mb": {"start": rss_start / 2**20, "peak": max(rss) / 2**20, "end": rss_end / 2**20},
+    }
+
+    print(f"{args.sessions} sessions, {interactions} interactions in {wall:.1f} s "
+          f"({report['throughput_per_s']:.1f}/s)")
+    print(f"{'interaction':<12}{'count':>7}{'p50':>9}{'p90':>9}{'p95':>9}{'p99':>9}{'max':>9}  ms")
+    for kind, stats in report["latency"].items():
+        print(f"{kind:<12}{stats['count']:>7}" + "".join(
+            f"{stats[key]:>9.1f}" for key in ("p50_ms", "p90_ms", "p95_ms", "p99_ms", "max_ms")))
+    if pid:
+        print(f"server CPU {report['server_cpu_percent']['mean']:.0f}% mean, "
+              f"{report['server_cpu_percent']['max']:.0f}% max · RSS {report['server_rss_mb']['start']:.0f} -> "
+              f"{report['server_rss_mb']['peak']:.0f} MB peak, {report['server_rss_mb']['end']:.0f} MB end")
+    if errors:
+        print(f"Interactions with an exception: {errors}")
+    for failure in failures:
+        print(f"Session failed: {failure}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 1 if errors or failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,21 +1,128 @@
 import streamlit as st
 import json
-from PIL import Image
+from PIL import ImageDraw
 import os
 
+from utils.detection import find_symbols, new_positions
+from utils.extraction import extract_pipes
+from utils.pid_click import encode_png, new_click, pid_click
+from utils.uploads import load_drawing
+
 st.set_page_config(layout="wide")
 st.title("🎯 P&ID Marker Tool")
 
+
+def next_tag(tag, taken):
+    """``tag`` if free, else the same prefix with the next free number (``V-101`` -> ``V-102``)"""
+    stem = tag.rstrip("0123456789")
+    digits = tag[len(stem):]
+    number = int(digits) if digits else 1
+    while tag in taken:
+        number += 1
+        tag = f"{stem}{number:0{len(digits)}d}" if digits else f"{stem}{number}"
+    return tag
+
+
+def pending_edits(key):
+    """Unapplied changes held by the data editor ``key``: ``(edited, added, deleted)``"""
+    state = st.session_state.get(key) or {}
+    edited = {int(i): row for i, row in state.get("edited_rows", {}).items()}
+    return edited, list(state.get("added_rows", ())), {int(i) for i in state.get("deleted_rows", ())}
+
+
+def table_base(key, rows):
+    """Rows the editor ``key`` is built on: frozen while it holds unapplied edits
+
+    A dynamic data editor is identified by its data, so refreshing the rows
+    under pending edits (a click marks a valve) would drop them.
+    """
+    base_key = f"{key}_base"
+    if base_key not in st.session_state or not any(pending_edits(key)):
+        st.session_state[base_key] = rows
+    return st.session_state[base_key]
+
+
+def reset_table(key):
+    for name in (key, f"{key}_base"):
+        st.session_state.pop(name, None)
+
+
+def apply_valve_edits(valves, base, key):
+    """``valves`` with the editor's changes to its ``base`` rows merged in (later marks are kept)"""
+    edited, added, deleted = pending_edits(key)
+    valves = dict(valves)
+    for i in deleted | edited.keys():
+        valves.pop(base[i]["tag"], None)
+    for row in [dict(base[i], **changes) for i, changes in edited.items() if i not in deleted] + added:
+        if row.get("tag") and row.get("x") is not None and row.get("y") is not None:
+            valves[str(row["tag"]).strip()] = {"x": int(row["x"]), "y": int(row["y"])}
+    return valves
+
+
+def apply_pipe_edits(pipes, base, key):
+    """``pipes`` with the editor's changes to its ``base`` rows merged in (later marks are kept)"""
+    edited, added, deleted = pending_edits(key)
+    pipes = list(pipes)
+    keys = ("x1", "y1", "x2", "y2")
+    for i in sorted(deleted | edited.keys()):
+        row = dict(base[i], **edited.get(i, {}))
+        at = pipes.index(base[i]) if base[i] in pipes else None
+        if i in deleted or not all(row.get(k) is not None for k in keys):
+            if at is not None:
+                del pipes[at]
+        elif at is not None:
+            pipes[at] = {k: int(row[k]) for k in keys}
+        else:
+            pipes.append({k: int(row[k]) for k in keys})
+    pipes += [{k: int(row[k]) for k in keys} for row in added if all(row.get(k) is not None for k in keys)]
+    return pipes
+
+
+def draw_markup(drawing, valves, pipes, current_pipe, proposals, candidates, box):
+    """Preview with marked items drawn on it, as a PNG data URL (reused while nothing changed)"""
+    marks = repr((valves, pipes, current_pipe, proposals, candidates, box))
+    cached = st.session_state.get('markup')
+    if cached and cached[0] == (drawing.digest, marks):
+        return cached[1]
+    if not (valves or pipes or current_pipe or proposals or candidates or box):
+        url = drawing.preview_url
+    else:
+        preview = drawing.preview.convert("RGB")
+        draw = ImageDraw.Draw(preview)
+        s = drawing.scale
+        for pipe in pipes:
+            draw.line([(pipe["x1"] * s, pipe["y1"] * s), (pipe["x2"] * s, pipe["y2"] * s)], fill=(0, 160, 0), width=3)
+        for pipe in proposals or ():
+            draw.line([(pipe["x1"] * s, pipe["y1"] * s), (pipe["x2"] * s, pipe["y2"] * s)], fill=(255, 0, 0), width=2)
+        for valve_id, valve in valves.items():
+            x, y = valve["x"] * s, valve["y"] * s
+            draw.ellipse([x - 5, y - 5, x + 5, y + 5], outline=(0, 0, 255), width=2)
+            draw.text((x + 7, y - 7), valve_id, fill=(0, 0, 255))
+        for c in candidates or ():
+            x, y = c["x"] * s, c["y"] * s
+            draw.rectangle([x - 6, y - 6, x + 6, y + 6], outline=(255, 128, 0), width=2)
+        if current_pipe:
+            x, y = current_pipe["x1"] * s, current_pipe["y1"] * s
+            draw.ellipse([x - 4, y - 4, x + 4, y + 4], fill=(0, 160, 0))
+        if box:
+            draw.rectangle([v * s for v in box], outline=(180, 0, 255), width=2)
+        url = encode_png(preview)
+    st.session_state.markup = ((drawing.digest, marks), url)
+    return url
+
+
 # Upload P&ID image
 uploaded_file = st.file_uploader("Upload P&ID Image", type=['png', 'jpg', 'jpeg'])
 if uploaded_file:
-    image = Image.open(uploaded_file)
-    st.image(image, use_container_width=True, caption="Click on valves and pipes")
-    
+    # Decoded, hashed and downscaled once per upload; reruns reuse it
+    drawing = load_drawing(uploaded_file, st.session_state, "marker_drawing")
+    image = drawing.image
+
     # Get image dimensions
     width, height = image.size
-    st.write(f"Image size: {width} x {height}")
-    
+    st.write(f"Image size: {width} x {height}"
+             + (f" (shown at {drawing.scale:.0%})" if drawing.scale < 1 else ""))
+
     # Initialize session state
     if 'valves' not in st.session_state:
         st.session_state.valves = {}
@@ -23,78 +130,212 @@ if uploaded_file:
         st.session_state.pipes = []
     if 'current_pipe' not in st.session_state:
         st.session_state.current_pipe = None
-    
+    if 'valve_id' not in st.session_state:
+        st.session_state.valve_id = "V-101"
+
+    # Apply the last click on the drawing (in full-resolution pixels) before drawing widgets
+    click_mode = st.radio("Clicking the drawing", ["Adds a valve", "Draws a pipe (start, then end)",
+                                                   "Picks the example symbol"], horizontal=True)
+    click = new_click("marker_click", "marker_click_handled")
+    if click:
+        x, y = drawing.to_full(click["x"], click["y"])
+        if click_mode == "Adds a valve":
+            valve_id = next_tag(st.session_state.valve_id.strip() or "V-101", st.session_state.valves)
+            st.session_state.valves[valve_id] = {"x": x, "y": y}
+            st.session_state.valve_id = next_tag(valve_id, st.session_state.valves)
+        elif click_mode.startswith("Draws a pipe"):
+            if st.session_state.current_pipe is None:
+                st.session_state.current_pipe = {"x1": x, "y1": y}
+            else:
+                pipe = dict(st.session_state.current_pipe, x2=x, y2=y)
+                if st.session_state.get('orthogonal', True):
+                    # Pipes on the drawings are horizontal or vertical
+                    if abs(x - pipe["x1"]) >= abs(y - pipe["y1"]):
+                        pipe["y2"] = pipe["y1"]
+                    else:
+                        pipe["x2"] = pipe["x1"]
+                st.session_state.pipes.append(pipe)
+                st.session_state.current_pipe = None
+        else:
+            st.session_state.example_x, st.session_state.example_y = x, y
+
     # Valve marking
     st.subheader("🔘 Mark Valves")
     col1, col2 = st.columns(2)
-    
+
     with col1:
-        valve_id = st.text_input("Valve ID", "V-101")
+        st.text_input("Valve ID", key="valve_id", help="Used for the next valve; numbers count up")
         if st.button("Add Valve at Center"):
+            valve_id = next_tag(st.session_state.valve_id.strip() or "V-101", st.session_state.valves)
             st.session_state.valves[valve_id] = {"x": width//2, "y": height//2}
-    
+
     with col2:
         if st.button("Clear All Valves"):
             st.session_state.valves = {}
-    
+
+    # Find every valve like one example symbol (template matching)
+    st.subheader("🔍 Find Valves")
+    st.write("Box one valve symbol (or click it in *Picks the example symbol* mode); "
+             "every similar symbol becomes a candidate.")
+    find_col1, find_col2 = st.columns(2)
+    # The centre is also set by clicks, so it lives in session state (no widget default)
+    st.session_state.example_x = min(st.session_state.get("example_x", width // 2), width - 1)
+    st.session_state.example_y = min(st.session_state.get("example_y", height // 2), height - 1)
+    with find_col1:
+        example_x = st.number_input("Example centre X", 0, width - 1, key="example_x")
+        example_y = st.number_input("Example centre Y", 0, height - 1, key="example_y")
+        example_w = st.number_input("Example width", 4, width, 20, key="example_w")
+        example_h = st.number_input("Example height", 4, height, 28, key="example_h")
+        match_threshold = st.slider("Match threshold", 0.3, 1.0, 0.6, 0.05)
+    example_box = (example_x - example_w // 2, example_y - example_h // 2,
+                   example_x + (example_w + 1) // 2, example_y + (example_h + 1) // 2)
+    with find_col2:
+        st.image(image.crop(example_box), width=120, caption="Example symbol")
+
+    if st.button("Find Valves"):
+        try:
+            found = find_symbols(image, example_box, threshold=match_threshold)
+        except ValueError as e:
+            st.error(f"❌ {e}")
+        else:
+            existing = [(v["x"], v["y"]) for v in st.session_state.valves.values()]
+            st.session_state.valve_candidates = new_positions(found, existing, min(example_w, example_h) / 2)
+
+    candidates = st.session_state.get('valve_candidates')
+    if candidates is not None:
+        st.write(f"**{len(candidates)} new valve candidates** (orange on the drawing)")
+        tag_prefix = st.text_input("Tag prefix for candidates", "V-AUTO-")
+        cand_col1, cand_col2 = st.columns(2)
+        with cand_col1:
+            if st.button("Add Candidates as Valves"):
+                number = 1
+                for c in sorted(candidates, key=lambda c: (c["y"], c["x"])):
+                    while f"{tag_prefix}{number}" in st.session_state.valves:
+                        number += 1
+                    st.session_state.valves[f"{tag_prefix}{number}"] = {"x": c["x"], "y": c["y"]}
+                st.session_state.valve_candidates = None
+                st.rerun()
+        with cand_col2:
+            if st.button("Discard Candidates"):
+                st.session_state.valve_candidates = None
+                st.rerun()
+
     # Pipe marking
     st.subheader("📏 Mark Pipes")
     pipe_col1, pipe_col2 = st.columns(2)
-    
+
     with pipe_col1:
-        if st.button("Start New Pipe"):
-            st.session_state.current_pipe = {"x1": width//4, "y1": height//4, "x2": width*3//4, "y2": height*3//4}
-    
+        st.checkbox("Keep drawn pipes horizontal/vertical", True, key="orthogonal")
+        if st.session_state.current_pipe is not None:
+            if st.button("Cancel Pipe"):
+                st.session_state.current_pipe = None
+                st.rerun()
+
     with pipe_col2:
         if st.button("Clear All Pipes"):
             st.session_state.pipes = []
-    
-    # Manual coordinate input
-    st.subheader("✏️ Manual Coordinates")
-    
+
+    # Automatic pipe detection: proposals are reviewed before they become pipes
+    st.subheader("🤖 Detect Pipes")
+    with st.expander("Detection settings"):
+        auto_threshold = st.checkbox("Automatic ink threshold", True)
+        threshold = None if auto_threshold else st.slider("Ink threshold", 0, 255, 128)
+        min_length = st.slider("Minimum line length (px)", 5, 200, 20)
+        gap = st.slider("Bridge breaks up to (px)", 0, 30, 6)
+        tolerance = st.slider("Stroke width tolerance (px)", 1, 10, 3)
+        split = st.checkbox("Split lines at tees", True)
+
+    if st.button("Detect Pipes"):
+        st.session_state.pipe_proposals = extract_pipes(image, threshold, min_length, gap, tolerance, split)
+
+    proposals = st.session_state.get('pipe_proposals')
+    if proposals is not None:
+        st.write(f"**{len(proposals)} proposed pipes** (red on the drawing)")
+        review_col1, review_col2, review_col3 = st.columns(3)
+        with review_col1:
+            if st.button("Add to Pipes"):
+                st.session_state.pipes.extend(proposals)
+                st.session_state.pipe_proposals = None
+                st.rerun()
+        with review_col2:
+            if st.button("Replace Pipes"):
+                st.session_state.pipes = list(proposals)
+                st.session_state.pipe_proposals = None
+                st.rerun()
+        with review_col3:
+            if st.button("Discard Proposals"):
+                st.session_state.pipe_proposals = None
+                st.rerun()
+
+    # The drawing: preview-sized, with everything marked so far
+    st.subheader("🖱️ Drawing")
+    markup = draw_markup(drawing, st.session_state.valves, st.session_state.pipes,
+                         st.session_state.current_pipe, proposals, candidates,
+                         example_box if click_mode == "Picks the example symbol" else None)
+    pid_click(markup, key="marker_click",
+              caption="Blue: valves · Green: pipes · Red: proposed pipes · Orange: valve candidates")
+
+    # Bulk editing of every item
+    st.subheader("✏️ Edit Coordinates")
+    st.write("Edit, add or delete rows, then apply.")
+
     col1, col2 = st.columns(2)
-    
+
+    # Stable keys, and rows frozen while edits are pending, so marking more items keeps the edits
+    valve_rows = table_base("valve_table", [{"tag": tag, "x": v["x"], "y": v["y"]}
+                                            for tag, v in st.session_state.valves.items()])
+    pipe_rows = table_base("pipe_table", [dict(pipe) for pipe in st.session_state.pipes])
     with col1:
-        st.write("**Valve Coordinates**")
-        for valve_id in list(st.session_state.valves.keys())[:5]:  # Show first 5
-            x = st.number_input(f"{valve_id} X", value=st.session_state.valves[valve_id]["x"], key=f"vx_{valve_id}")
-            y = st.number_input(f"{valve_id} Y", value=st.session_state.valves[valve_id]["y"], key=f"vy_{valve_id}")
-            st.session_state.valves[valve_id] = {"x": x, "y": y}
-    
+        st.write(f"**Valves ({len(st.session_state.valves)})**")
+        st.data_editor(valve_rows, num_rows="dynamic", use_container_width=True,
+                       column_config={"tag": "Tag", "x": "X", "y": "Y"}, key="valve_table")
+
     with col2:
-        st.write("**Pipe Coordinates**")
-        for i, pipe in enumerate(st.session_state.pipes[:5]):  # Show first 5 pipes
-            st.write(f"Pipe {i+1}:")
-            x1 = st.number_input(f"Start X", value=pipe["x1"], key=f"px1_{i}")
-            y1 = st.number_input(f"Start Y", value=pipe["y1"], key=f"py1_{i}")
-            x2 = st.number_input(f"End X", value=pipe["x2"], key=f"px2_{i}")
-            y2 = st.number_input(f"End Y", value=pipe["y2"], key=f"py2_{i}")
-            st.session_state.pipes[i] = {"x1": x1, "y1": y1, "x2": x2, "y2": y2}
-    
+        st.write(f"**Pipes ({len(st.session_state.pipes)})**")
+        st.data_editor(pipe_rows, num_rows="dynamic", use_container_width=True,
+                       column_config={"x1": "Start X", "y1": "Start Y", "x2": "End X", "y2": "End Y"},
+                       key="pipe_table")
+
+    if len(valve_rows) != len(st.session_state.valves) or len(pipe_rows) != len(st.session_state.pipes):
+        st.caption("The marks changed since you started editing; applying merges your edits into them.")
+    apply_col, discard_col = st.columns(2)
+    with apply_col:
+        if st.button("Apply Table Edits"):
+            st.session_state.valves = apply_valve_edits(st.session_state.valves, valve_rows, "valve_table")
+            st.session_state.pipes = apply_pipe_edits(st.session_state.pipes, pipe_rows, "pipe_table")
+            reset_table("valve_table")
+            reset_table("pipe_table")
+            st.rerun()
+    with discard_col:
+        if st.button("Discard Table Edits"):
+            reset_table("valve_table")
+            reset_table("pipe_table")
+            st.rerun()
+
     # Display current data
     st.subheader("📊 Current Data")
-    
+
     col1, col2 = st.columns(2)
-    
+
     with col1:
-        st.write("**Valves:**")
-        st.json(st.session_state.valves)
-    
+        with st.expander(f"Valves JSON ({len(st.session_state.valves)})"):
+            st.json(st.session_state.valves)
+
     with col2:
-        st.write("**Pipes:**")
-        st.json(st.session_state.pipes)
-    
+        with st.expander(f"Pipes JSON ({len(st.session_state.pipes)})"):
+            st.json(st.session_state.pipes)
+
     # Export data
     st.subheader("💾 Export Data")
     system_name = st.text_input("System Name", "mixing")
-    
+
     if st.button("Export JSON Files"):
         # Save valves
         with open(f"data/valves_{system_name}.json", 'w') as f:
             json.dump(st.session_state.valves, f, indent=2)
-        
+
         # Save pipes
         with open(f"data/pipes_{system_name}.json", 'w') as f:
             json.dump(st.session_state.pipes, f, indent=2)
-        
+
         st.success(f"✅ Exported valves_{system_name}.json and pipes_{system_name}.json")
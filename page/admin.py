@@ -0,0 +1,13 @@
+# Memory admin, standalone.  It reports on the process it runs in, so open it
+# from the dashboard's "🧠 Memory" button to see the dashboard's own numbers
+import os
+import sys
+
+import streamlit as st
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.admin import memory_admin
+
+st.set_page_config(layout="wide", page_title="Rig Simulation – Memory")
+st.title("🧠 Memory")
+memory_admin()
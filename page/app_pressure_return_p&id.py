@@ -0,0 +1,8 @@
+# Served by the generic engine; the system itself is defined in data/systems.json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.page_engine import run_page
+
+run_page("return")
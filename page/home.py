@@ -1,24 +1,25 @@
+import os
+import sys
+
 import streamlit as st
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.systems import REGISTRY
+
 st.set_page_config(page_title="Rig Simulation", layout="wide")
 st.title("Rig Multi-P&ID Simulation")
 st.markdown("### Choose a system to simulate pressurization and see cross-reaction")
 
-cols = st.columns(5)
-systems = [
-    ("Mixing Area", "app_mixing_p&id.py"),
-    ("Pressure Supply", "app_pressure_supply_p&id.py"), 
-    ("DGS Simulation", "app_DGS_SIM.py"),
-    ("Pressure Return", "app_pressure_return_p&id.py"),
-    ("Separation Seal", "app_separation_seal_p&id.py")  # Fixed spelling
-]
-
-for col, (name, file) in zip(cols, systems):
+# One button per registered system (data/systems.json); systems without a
+# page script of their own are served by the generic system.py page
+for col, (key, config) in zip(st.columns(len(REGISTRY)), REGISTRY.items()):
     with col:
-        if st.button(name, use_container_width=True):
-            st.switch_page(file)
+        if st.button(config.display_name, use_container_width=True):
+            if config.page:
+                st.switch_page(config.page)
+            st.switch_page("system.py", query_params={"system": key})
 
-st.success("All 5 systems share the same valves & pipes → Open a valve here → see reaction everywhere!")
+st.success(f"All {len(REGISTRY)} systems share the same valves & pipes → Open a valve here → see reaction everywhere!")
 
 st.markdown("---")
 st.subheader("🎯 Dynamic Simulation Features")
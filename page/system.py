@@ -0,0 +1,14 @@
+# Any registered system by key: system.py?system=<key> (see data/systems.json)
+import os
+import sys
+
+import streamlit as st
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.page_engine import run_page
+from utils.systems import REGISTRY
+
+system_name = st.query_params.get("system")
+if system_name not in REGISTRY:
+    system_name = next(iter(REGISTRY))
+run_page(system_name)
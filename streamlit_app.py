@@ -1,9 +1,16 @@
 # streamlit_app.py - RESTORED WORKING VERSION WITH ENHANCED EDITING
 import streamlit as st
-from PIL import Image, ImageDraw
 import json
-import math
 import os
+from utils.admin import memory_admin
+from utils.listing import filter_pipes, filter_valves, pipe_labels
+from utils.model import canonical_tag
+from utils.page_engine import dev_panel, init_session, live_view, run_timer, sync_valve_states
+from utils.shared import get_system
+from utils.systems import DISPLAY_NAMES, REGISTRY, get_system_files, resolve
+from utils.rig_bus import RIG
+from utils.valve_state import TAGS
+from utils.warmup import get_manifest, is_warming, start_warm_up
 
 st.set_page_config(
     page_title="Rig Simulation Dashboard",
@@ -11,17 +18,14 @@ st.set_page_config(
     layout="wide"
 )
 
+# Precompile every system into the shared caches (no-op after the first run)
+start_warm_up()
+
 # Initialize session state
 if 'current_system' not in st.session_state:
     st.session_state.current_system = "home"
-if 'valve_states' not in st.session_state:
-    st.session_state.valve_states = {}
-if 'selected_pipe' not in st.session_state:
-    st.session_state.selected_pipe = None
-if 'selected_valve' not in st.session_state:
-    st.session_state.selected_valve = None
-if 'calibration_mode' not in st.session_state:
-    st.session_state.calibration_mode = False
+# Valve state, rig subscription, selection and mode flags (utils/page_engine.py)
+init_session()
 if 'temp_valve_x' not in st.session_state:
     st.session_state.temp_valve_x = 0
 if 'temp_valve_y' not in st.session_state:
@@ -34,78 +38,16 @@ if 'temp_pipe_x2' not in st.session_state:
     st.session_state.temp_pipe_x2 = 0
 if 'temp_pipe_y2' not in st.session_state:
     st.session_state.temp_pipe_y2 = 0
-if 'edit_mode' not in st.session_state:
-    st.session_state.edit_mode = False
 
-# ==================== CORRECT FILE MAPPING ====================
-def get_system_files(system_name):
-    """Get the correct file names for each system - MATCHING YOUR ACTUAL FILES"""
-    file_map = {
-        "mixing": {
-            "valves": "data/valves_mixing.json",
-            "pipes": "data/pipes_mixing.json", 
-            "png": "assets/p&id_mixing.png"
-        },
-        "supply": {
-            "valves": "data/valves_pressure_in.json",
-            "pipes": "data/pipes_pressure_in.json",
-            "png": "assets/p&id_pressure_in.png"
-        },
-        "dgs": {
-            "valves": "data/valves_dgs.json",
-            "pipes": "data/pipes_dgs.json",
-            "png": "assets/p&id_dgs.png"
-        },
-        "return": {
-            "valves": "data/valves_pressure_return.json",
-            "pipes": "data/pipes_pressure_return.json",
-            "png": "assets/p&id_pressure_return.png"
-        },
-        "seal": {
-            "valves": "data/valves_separatoin_seal.json",
-            "pipes": "data/pipes_separation_seal.json",
-            "png": "assets/p&id_separation_seal.png"
-        }
-    }
-    
-    if system_name not in file_map:
-        return None, None, None
-    
-    config = file_map[system_name]
-    return config["valves"], config["pipes"], config["png"]
+sync_valve_states()
 
+# ==================== DATA LOADING ====================
 def load_system_data(system_name):
-    """Load data using correct file names"""
-    valves_path, pipes_path, png_path = get_system_files(system_name)
-    
-    # Load valves
-    valves = {}
-    if valves_path and os.path.exists(valves_path):
-        try:
-            with open(valves_path, 'r') as f:
-                valves = json.load(f)
-        except Exception as e:
-            st.error(f"❌ Error loading valves: {e}")
-    else:
-        st.error(f"❌ Missing: {valves_path}")
-    
-    # Load pipes
-    pipes = []
-    if pipes_path and os.path.exists(pipes_path):
-        try:
-            with open(pipes_path, 'r') as f:
-                pipes = json.load(f)
-        except Exception as e:
-            st.error(f"❌ Error loading pipes: {e}")
-    else:
-        st.error(f"❌ Missing: {pipes_path}")
-    
-    # Check PNG
-    if not png_path or not os.path.exists(png_path):
-        st.error(f"❌ Missing: {png_path}")
-        png_path = None
-    
-    return valves, pipes, png_path
+    """Get the shared compiled system (normalized model + decoded P&ID) for this process"""
+    compiled = get_system(system_name)
+    for message in compiled.errors:
+        st.error(f"❌ {message}")
+    return compiled
 
 def save_system_data(system_name, valves, pipes):
     """Save data back to files"""
@@ -113,7 +55,7 @@ def save_system_data(system_name, valves, pipes):
     
     if valves_path:
         try:
-            with open(valves_path, 'w') as f:
+            with open(resolve(valves_path), 'w') as f:
                 json.dump(valves, f, indent=2)
             st.sidebar.success(f"💾 Saved valves to {os.path.basename(valves_path)}")
         except Exception as e:
@@ -121,147 +63,57 @@ def save_system_data(system_name, valves, pipes):
     
     if pipes_path:
         try:
-            with open(pipes_path, 'w') as f:
+            with open(resolve(pipes_path), 'w') as f:
                 json.dump(pipes, f, indent=2)
             st.sidebar.success(f"💾 Saved pipes to {os.path.basename(pipes_path)}")
         except Exception as e:
             st.error(f"❌ Error saving pipes: {e}")
 
-# ==================== NAVIGATION ====================
-st.title("🏭 Rig Multi-P&ID Simulation")
-
-col1, col2, col3, col4, col5 = st.columns(5)
-
-with col1:
-    if st.button("🔧 Mixing", use_container_width=True):
-        st.session_state.current_system = "mixing"
-        st.session_state.selected_pipe = None
-        st.session_state.selected_valve = None
-        st.session_state.calibration_mode = False
-        st.session_state.edit_mode = False
-        st.rerun()
+def read_system_files(system_name):
+    """Raw text of the system's valves and pipes files, for a later ``restore_system_files``"""
+    texts = []
+    for path in get_system_files(system_name)[:2]:
+        with open(resolve(path), 'r') as f:
+            texts.append(f.read())
+    return tuple(texts)
 
-with col2:
-    if st.button("⚡ Supply", use_container_width=True):
-        st.session_state.current_system = "supply"
-        st.session_state.selected_pipe = None
-        st.session_state.selected_valve = None
-        st.session_state.calibration_mode = False
-        st.session_state.edit_mode = False
-        st.rerun()
-
-with col3:
-    if st.button("🎮 DGS", use_container_width=True):
-        st.session_state.current_system = "dgs"
-        st.session_state.selected_pipe = None
-        st.session_state.selected_valve = None
-        st.session_state.calibration_mode = False
-        st.session_state.edit_mode = False
-        st.rerun()
+def restore_system_files(system_name, texts):
+    for path, text in zip(get_system_files(system_name)[:2], texts):
+        with open(resolve(path), 'w') as f:
+            f.write(text)
 
-with col4:
-    if st.button("🔄 Return", use_container_width=True):
-        st.session_state.current_system = "return"
-        st.session_state.selected_pipe = None
-        st.session_state.selected_valve = None
-        st.session_state.calibration_mode = False
-        st.session_state.edit_mode = False
-        st.rerun()
+# ==================== NAVIGATION ====================
+st.title("🏭 Rig Multi-P&ID Simulation")
 
-with col5:
-    if st.button("🔒 Seal", use_container_width=True):
-        st.session_state.current_system = "seal"
-        st.session_state.selected_pipe = None
-        st.session_state.selected_valve = None
-        st.session_state.calibration_mode = False
-        st.session_state.edit_mode = False
-        st.rerun()
+# One button per registered system (data/systems.json), then the memory admin
+nav_targets = [(system, config.nav_label) for system, config in REGISTRY.items()] + [("admin", "🧠 Memory")]
+for col, (system, label) in zip(st.columns(len(nav_targets)), nav_targets):
+    with col:
+        if st.button(label, use_container_width=True):
+            st.session_state.current_system = system
+            st.session_state.selected_pipe = None
+            st.session_state.selected_valve = None
+            st.session_state.calibration_mode = False
+            st.session_state.edit_mode = False
+            st.rerun()
 
 st.markdown("---")
 
-# ==================== RENDERING ====================
-def render_pid_with_overlay(valves, pipes, png_path, system_name):
-    """Render P&ID with interactive overlays"""
-    try:
-        img = Image.open(png_path).convert("RGBA")
-    except Exception as e:
-        st.error(f"❌ Cannot load P&ID: {e}")
-        # Create placeholder
-        img = Image.new('RGBA', (800, 600), (40, 40, 60))
-        draw = ImageDraw.Draw(img)
-        draw.text((50, 50), f"P&ID Not Found", fill="white")
-        draw.text((50, 80), f"Path: {png_path}", fill="yellow")
-        return img.convert("RGB")
-    
-    draw = ImageDraw.Draw(img)
-    
-    # Draw pipes
-    for i, pipe in enumerate(pipes):
-        has_flow = any(st.session_state.valve_states.get(tag, False) for tag in valves)
-        
-        if i == st.session_state.selected_pipe:
-            color = (180, 0, 255)  # Purple for selected pipe
-            width = 8
-        elif has_flow:
-            color = (0, 255, 0)  # Green for flow
-            width = 6
-        else:
-            color = (100, 100, 255)  # Blue for no flow
-            width = 4
-            
-        draw.line([(pipe["x1"], pipe["y1"]), (pipe["x2"], pipe["y2"])], 
-                 fill=color, width=width)
-        
-        # Draw pipe endpoints if selected
-        if i == st.session_state.selected_pipe:
-            draw.ellipse([pipe["x1"]-6, pipe["y1"]-6, pipe["x1"]+6, pipe["y1"]+6], 
-                        fill=(255, 0, 0), outline="white", width=2)
-            draw.ellipse([pipe["x2"]-6, pipe["y2"]-6, pipe["x2"]+6, pipe["y2"]+6], 
-                        fill=(255, 0, 0), outline="white", width=2)
-    
-    # Draw valves
-    for tag, valve_data in valves.items():
-        is_open = st.session_state.valve_states.get(tag, False)
-        
-        if tag == st.session_state.selected_valve:
-            color = (180, 0, 255)  # Purple for selected valve
-            outline = "white"
-            outline_width = 2
-            radius = 4
-        elif is_open:
-            color = (0, 255, 0)  # Green for open
-            outline = "white"
-            outline_width = 2
-            radius = 4
-        else:
-            color = (255, 0, 0)  # Red for closed
-            outline = "white"
-            outline_width = 2
-            radius = 4
-        
-        x, y = valve_data["x"], valve_data["y"]
-        # Draw valve circle
-        draw.ellipse([x-radius, y-radius, x+radius, y+radius], 
-                    fill=color, outline=outline, width=outline_width)
-        # Text offset
-        draw.text((x+7, y-9), tag, fill="white", stroke_fill="black", stroke_width=1)
-    
-    return img.convert("RGB")
-
 def run_simulation(system_name):
     """Run simulation for selected system"""
-    display_names = {
-        "mixing": "Mixing Area",
-        "supply": "Pressure Supply", 
-        "dgs": "DGS Simulation",
-        "return": "Pressure Return", 
-        "seal": "Separation Seal"
-    }
+    display_names = DISPLAY_NAMES
     
     st.header(f"{display_names[system_name]} Simulation")
     
-    # Load data
-    valves, pipes, png_path = load_system_data(system_name)
+    # Phase timings for the developer panel (no-op while it is off)
+    timer = run_timer("run_simulation", system_name)
+    
+    # Load data (shared, read-only)
+    with timer.phase("load_system_data"):
+        compiled = load_system_data(system_name)
+        model, png_path = compiled.model, compiled.png_path
+        # Normalized JSON copies for the calibration editors
+        valves, pipes = model.to_json()
     
     if not valves or not pipes:
         st.error("❌ Cannot run - missing JSON data files")
@@ -271,21 +123,8 @@ def run_simulation(system_name):
         st.error(f"❌ P&ID image not found")
         return
     
-    # Initialize valve states
-    for tag in valves:
-        if tag not in st.session_state.valve_states:
-            st.session_state.valve_states[tag] = False
-    
-    # Sidebar controls
-    with st.sidebar:
-        st.header("🎛️ Valve Controls")
-        for tag in valves:
-            state = st.session_state.valve_states[tag]
-            label = f"{'🟢 OPEN' if state else '🔴 CLOSED'} {tag}"
-            if st.button(label, key=f"valve_{system_name}_{tag}"):
-                st.session_state.valve_states[tag] = not state
-                st.rerun()
-        
+    # Sidebar controls (calibration changes rerun the whole script)
+    with st.sidebar, timer.phase("calibration_sidebar"):
         st.header("📏 Calibration Tools")
         
         # Calibration mode toggle
@@ -318,23 +157,62 @@ def run_simulation(system_name):
                     new_valve_y = st.number_input("Y", value=300, key="new_valve_y")
                 
                 if st.button("➕ Add Valve", key="add_valve"):
+                    new_valve_id = canonical_tag(new_valve_id) if new_valve_id.strip() else ""
                     if new_valve_id and new_valve_id not in valves:
-                        valves[new_valve_id] = {"x": new_valve_x, "y": new_valve_y}
-                        st.session_state.valve_states[new_valve_id] = False
+                        valves[new_valve_id] = {"x": new_valve_x, "y": new_valve_y, "state": False}
                         save_system_data(system_name, valves, pipes)
                         st.success(f"✅ Added valve {new_valve_id}")
                         st.rerun()
                     else:
                         st.error("❌ Valve ID already exists or is empty")
                 
+                # Find valves like the selected one (template matching on the P&ID)
+                if st.session_state.selected_valve and compiled.image is not None:
+                    st.write("**Find Similar Valves:**")
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        symbol_size = st.number_input("Symbol size", 8, 200, 24, key="symbol_size")
+                    with col2:
+                        match_threshold = st.slider("Match", 0.3, 1.0, 0.6, 0.05, key="match_threshold")
+                    if st.button("🔍 Find Similar", key="find_valves"):
+                        # numpy-heavy; loaded on use so the home page stays light
+                        from utils.detection import find_symbols, new_positions
+                        example = valves[st.session_state.selected_valve]
+                        half = symbol_size // 2
+                        found = find_symbols(compiled.image, (example["x"] - half, example["y"] - half,
+                                                              example["x"] + half, example["y"] + half),
+                                             threshold=match_threshold)
+                        existing = [(v["x"], v["y"]) for v in valves.values()]
+                        st.session_state.valve_candidates = new_positions(found, existing, half)
+                    candidates = st.session_state.get("valve_candidates")
+                    if candidates:
+                        st.info(f"{len(candidates)} unmarked valve symbols found")
+                        prefix = st.text_input("Tag prefix", "V-NEW-", key="candidate_prefix")
+                        if st.button(f"➕ Add {len(candidates)} Valves", key="add_candidates"):
+                            number = 1
+                            for candidate in sorted(candidates, key=lambda c: (c["y"], c["x"])):
+                                while canonical_tag(f"{prefix}{number}") in valves:
+                                    number += 1
+                                valves[canonical_tag(f"{prefix}{number}")] = {
+                                    "x": candidate["x"], "y": candidate["y"], "state": False}
+                            st.session_state.valve_candidates = None
+                            save_system_data(system_name, valves, pipes)
+                            st.success(f"✅ Added {len(candidates)} valves")
+                            st.rerun()
+                    elif candidates is not None:
+                        st.info("No unmarked valve symbols found")
+                
                 # Rename selected valve
                 if st.session_state.selected_valve:
                     st.write("**Rename Selected Valve:**")
                     new_name = st.text_input("New Name", st.session_state.selected_valve, key="rename_valve")
                     if st.button("🔄 Rename Valve", key="rename_valve_btn"):
+                        new_name = canonical_tag(new_name) if new_name.strip() else ""
                         if new_name and new_name not in valves:
                             valves[new_name] = valves.pop(st.session_state.selected_valve)
-                            st.session_state.valve_states[new_name] = st.session_state.valve_states.pop(st.session_state.selected_valve, False)
+                            old_pos = TAGS.position(st.session_state.selected_valve)
+                            RIG.set_bits(1 << TAGS.position(new_name), st.session_state.valve_states.is_open(old_pos))
+                            RIG.set_bits(1 << old_pos, False)
                             st.session_state.selected_valve = new_name
                             save_system_data(system_name, valves, pipes)
                             st.success(f"✅ Renamed to {new_name}")
@@ -346,13 +224,56 @@ def run_simulation(system_name):
                 if st.session_state.selected_valve:
                     if st.button("🗑️ Delete Selected Valve", key="delete_valve"):
                         del valves[st.session_state.selected_valve]
-                        if st.session_state.selected_valve in st.session_state.valve_states:
-                            del st.session_state.valve_states[st.session_state.selected_valve]
+                        RIG.set_bits(1 << TAGS.position(st.session_state.selected_valve), False)
                         st.session_state.selected_valve = None
                         save_system_data(system_name, valves, pipes)
                         st.success("✅ Valve deleted")
                         st.rerun()
                 
+                # Snap every valve and pipe end onto the drawing's lines: preview, then confirm
+                if st.button("🧲 Preview Snap to Drawing", key="snap_drawing", use_container_width=True):
+                    from utils.snap import snap_system
+                    report = snap_system(system_name)
+                    if not report["errors"]:
+                        report["original"] = read_system_files(system_name)
+                    st.session_state.snap_report = report
+                    st.rerun()
+                report = st.session_state.get("snap_report")
+                if report and report["system"] == system_name:
+                    moves = report["corrections"]
+                    written = report.get("written")
+                    if report["errors"]:
+                        st.error(f"❌ Snap failed: {'; '.join(report['errors'])}")
+                    else:
+                        verb = "Moved" if written else "Would move"
+                        st.info(f"🧲 {verb} {len(moves)} of {report.get('items', 0)} points"
+                                + (f" (max {max(c['distance'] for c in moves):.0f} px)" if moves else ""))
+                    if report["unmatched"]:
+                        st.warning(f"No line within reach: {', '.join(report['unmatched'][:10])}"
+                                   + (" …" if len(report["unmatched"]) > 10 else ""))
+                    if moves and not written:
+                        st.dataframe([{"item": c["item"], "from": str(c["from"]), "to": str(c["to"]),
+                                       "px": c["distance"]} for c in moves], use_container_width=True)
+                        apply_col, cancel_col = st.columns(2)
+                        if apply_col.button("✅ Apply Snap", key="snap_apply", use_container_width=True):
+                            from utils.snap import snap_system
+                            if read_system_files(system_name) != report["original"]:
+                                st.session_state.snap_report = None
+                                st.error("❌ The data changed since the preview; preview again")
+                            else:
+                                written = snap_system(system_name, write=True)
+                                written["original"] = report["original"]
+                                st.session_state.snap_report = written
+                                st.rerun()
+                        if cancel_col.button("✖️ Cancel", key="snap_cancel", use_container_width=True):
+                            st.session_state.snap_report = None
+                            st.rerun()
+                    elif written:
+                        if st.button("↩️ Undo Snap", key="snap_undo", use_container_width=True):
+                            restore_system_files(system_name, report["original"])
+                            st.session_state.snap_report = None
+                            st.success("↩️ Restored the coordinates from before the snap")
+                
                 # Pipe management
                 st.subheader("🔧 Pipe Management")
                 
@@ -377,6 +298,34 @@ def run_simulation(system_name):
                     st.success("✅ Added new pipe")
                     st.rerun()
                 
+                # Bulk import from CAD line work
+                with st.expander("📥 Import from Drawing (SVG / DXF / CSV)"):
+                    drawing_file = st.file_uploader("Drawing", type=["svg", "dxf", "csv"], key="import_file")
+                    fit = st.checkbox("Fit drawing to the P&ID image", value=True, key="import_fit",
+                                      disabled=compiled.image is None)
+                    layers = st.text_input("Layers", key="import_layers", placeholder="e.g. PIPE*, VALVE* (blank: all)")
+                    append = st.checkbox("Keep existing pipes and valves", key="import_append")
+                    if drawing_file is not None and st.button("📥 Import", key="import_run"):
+                        from utils.importers import IMPORT_ERRORS, detect_format, import_drawing
+                        valves_path, pipes_path, _ = get_system_files(system_name)
+                        try:
+                            counts = import_drawing(
+                                drawing_file, detect_format(drawing_file.name), resolve(valves_path),
+                                resolve(pipes_path), append=append,
+                                size=compiled.image.size if compiled.image is not None else None,
+                                fit=fit and compiled.image is not None,
+                                layers=[p.strip() for p in layers.split(",") if p.strip()] or None)
+                        except IMPORT_ERRORS as e:
+                            st.error(f"❌ Import failed: {e}")
+                        else:
+                            st.session_state.selected_pipe = None
+                            st.session_state.import_counts = counts
+                            st.rerun()
+                    counts = st.session_state.get("import_counts")
+                    if counts:
+                        st.success(f"📥 Imported {counts['pipes']} pipes and {counts['valves']} valves"
+                                   + (f" ({counts['renamed']} duplicate tags renamed)" if counts["renamed"] else ""))
+
                 # Delete selected pipe
                 if st.session_state.selected_pipe is not None:
                     if st.button("🗑️ Delete Selected Pipe", key="delete_pipe"):
@@ -388,14 +337,18 @@ def run_simulation(system_name):
             
             # Valve selection for calibration
             st.subheader("Select Valve to Calibrate")
-            valve_list = list(valves.keys())
-            if not valve_list:
+            if not valves:
                 st.error("No valves found in data")
             else:
-                selected_valve = st.selectbox("Choose valve:", valve_list, 
-                                             key="valve_select")
+                valve_filter = st.text_input("🔎 Filter valves", key="valve_filter",
+                                             placeholder="Tag prefix, e.g. V-1")
+                valve_ids = filter_valves(compiled, valve_filter)
+                selected_valve_id = st.selectbox("Choose valve:", valve_ids, 
+                                                 format_func=lambda i: model.valves[i].tag,
+                                                 key="valve_select")
+                selected_valve = None if selected_valve_id is None else model.valves[selected_valve_id].tag
                 
-                if st.button("🎯 Select This Valve", key="select_valve_btn"):
+                if selected_valve and st.button("🎯 Select This Valve", key="select_valve_btn"):
                     st.session_state.selected_valve = selected_valve
                     st.session_state.selected_pipe = None
                     # Store current position in temp state
@@ -419,8 +372,7 @@ def run_simulation(system_name):
                 # Move valve to center
                 if st.button("🎯 Move to Center", key="center_valve"):
                     try:
-                        img = Image.open(png_path)
-                        width, height = img.size
+                        width, height = compiled.image.size
                         valves[st.session_state.selected_valve]["x"] = width // 2
                         valves[st.session_state.selected_valve]["y"] = height // 2
                         st.session_state.temp_valve_x = width // 2
@@ -453,12 +405,16 @@ def run_simulation(system_name):
             # Pipe selection for calibration
             st.subheader("Select Pipe to Calibrate")
             if pipes:
-                pipe_options = [f"Pipe {i+1}" for i in range(len(pipes))]
-                selected_pipe_name = st.selectbox("Choose pipe:", pipe_options,
+                pipe_filter = st.text_input("🔎 Filter pipes", key="pipe_filter",
+                                            placeholder="Pipe number prefix")
+                pipe_ids = filter_pipes(compiled, pipe_filter)
+                pipe_options = pipe_labels(len(pipes))
+                selected_pipe_id = st.selectbox("Choose pipe:", pipe_ids,
+                                                format_func=pipe_options.__getitem__,
                                                 key="pipe_select")
                 
-                if st.button("🎯 Select This Pipe", key="select_pipe_btn"):
-                    pipe_idx = pipe_options.index(selected_pipe_name)
+                if selected_pipe_id is not None and st.button("🎯 Select This Pipe", key="select_pipe_btn"):
+                    pipe_idx = selected_pipe_id
                     st.session_state.selected_pipe = pipe_idx
                     st.session_state.selected_valve = None
                     # Store current position in temp state
@@ -489,8 +445,7 @@ def run_simulation(system_name):
                 # Move pipe to center
                 if st.button("🎯 Move Pipe to Center", key="center_pipe"):
                     try:
-                        img = Image.open(png_path)
-                        width, height = img.size
+                        width, height = compiled.image.size
                         center_x, center_y = width // 2, height // 2
                         length = 100  # Default pipe length
                         
@@ -531,94 +486,81 @@ def run_simulation(system_name):
         else:
             st.info("🔧 Enable calibration to adjust positions")
         
-        st.header("📊 Status")
-        open_valves = sum(st.session_state.valve_states.values())
-        st.metric("Open Valves", open_valves)
-        st.metric("Total Valves", len(valves))
-        st.metric("Total Pipes", len(pipes))
-        
-        # Clear all valves button
-        if st.button("🔄 Clear All Valves", key="clear_valves"):
-            for tag in valves:
-                st.session_state.valve_states[tag] = False
-            st.rerun()
-    
-    # Main display
-    col1, col2 = st.columns([3, 1])
     
-    with col1:
-        image = render_pid_with_overlay(valves, pipes, png_path, display_names[system_name])
-        st.image(image, use_container_width=True, 
-                caption=f"{display_names[system_name]} - Purple=Selected | Green=Flow | Red=Closed")
+    timer.finish()
     
-    with col2:
-        st.header("🎯 Legend")
-        st.write("🟣 **Purple**: Selected for calibration")
-        st.write("🟢 **Green pipes/valves**: Flow/Open")
-        st.write("🔵 **Blue pipes**: No flow")
-        st.write("🔴 **Red valves**: Closed")
-        if st.session_state.edit_mode:
-            st.write("🗑️ **Edit Mode**: Can add/delete/rename")
-        st.write("---")
-        st.info("💡 **Enable Calibration** to adjust positions")
-        st.info("💡 **Enable Edit Mode** to manage items")
-        st.info("💡 **Select items** to make them purple")
+    # Diagram, valve controls and status re-run on their own on a valve click
+    live_view(system_name)
 
-# ==================== MAIN DISPLAY ====================
-if st.session_state.current_system == "home":
-    st.markdown("## 🏠 Welcome to Rig Simulation")
-    st.markdown("👆 **Select a system from the buttons above to view P&ID diagrams and control valves**")
-    
-    # File status
-    st.markdown("---")
-    st.subheader("📁 System Status")
-    
-    systems = [
-        ("mixing", "Mixing Area"),
-        ("supply", "Pressure Supply"), 
-        ("dgs", "DGS Simulation"),
-        ("return", "Pressure Return"), 
-        ("seal", "Separation Seal")
-    ]
+def show_system_status():
+    """Per-system file status from the warm-up manifest"""
+    # Precomputed once per process by the warm-up stage (utils/warmup.py)
+    manifest = get_manifest(timeout=0)
     
     all_systems_ready = True
     
-    for system, display_name in systems:
-        valves_path, pipes_path, png_path = get_system_files(system)
-        
-        valves_exists = valves_path and os.path.exists(valves_path)
-        pipes_exists = pipes_path and os.path.exists(pipes_path)
-        png_exists = png_path and os.path.exists(png_path)
+    for system, display_name in DISPLAY_NAMES.items():
+        entry = manifest.get(system)
+        if entry is None:
+            pending = "⏳ WARMING UP" if is_warming() else "⏸️ NOT WARMED (compiles on first use)"
+            st.write(f"**{display_name}**: {pending}")
+            all_systems_ready = False
+            continue
         
-        status = "✅ READY" if all([valves_exists, pipes_exists, png_exists]) else "❌ INCOMPLETE"
+        status = "✅ READY" if entry["ready"] else "❌ INCOMPLETE"
         
-        if not all([valves_exists, pipes_exists, png_exists]):
+        if not entry["ready"]:
             all_systems_ready = False
         
-        st.write(f"**{display_name}**: {status}")
+        st.write(f"**{display_name}**: {status} · {entry['valves']} valves, "
+                 f"{entry['pipes']} pipes · compiled in {entry['seconds'] * 1000:.0f} ms")
         
-        if valves_exists:
-            st.write(f"  - Valves: ✅ {os.path.basename(valves_path)}")
-        else:
-            st.write(f"  - Valves: ❌ {valves_path}")
-            
-        if pipes_exists:
-            st.write(f"  - Pipes: ✅ {os.path.basename(pipes_path)}")
-        else:
-            st.write(f"  - Pipes: ❌ {pipes_path}")
-            
-        if png_exists:
-            st.write(f"  - P&ID: ✅ {os.path.basename(png_path)}")
-        else:
-            st.write(f"  - P&ID: ❌ {png_path}")
+        for kind, label in (("valves", "Valves"), ("pipes", "Pipes"), ("png", "P&ID")):
+            file_status = entry["files"][kind]
+            if file_status["exists"]:
+                st.write(f"  - {label}: ✅ {os.path.basename(file_status['path'])}")
+            else:
+                st.write(f"  - {label}: ❌ {file_status['path']}")
+        for message in entry["errors"]:
+            st.write(f"  - ⚠️ {message}")
+        lint = entry.get("lint")
+        if lint and (lint["error"] or lint["warning"]):
+            st.write(f"  - 🔎 Data lint: {lint['error']} errors, {lint['warning']} warnings "
+                     f"in {entry.get('lint_seconds', 0) * 1000:.0f} ms (`python -m utils.lint {system}`)")
     
     if all_systems_ready:
         st.success("🎉 All systems are ready! Click any system above to start simulating.")
-    else:
+    elif not is_warming():
         st.warning("⚠️ Some systems are missing files. Check the file paths above.")
+    
+    if st.session_state.status_polling and not is_warming():
+        # Warm-up finished: one full rerun stops the polling timer
+        st.rerun()
+
+# ==================== MAIN DISPLAY ====================
+if st.session_state.current_system == "home":
+    st.markdown("## 🏠 Welcome to Rig Simulation")
+    st.markdown("👆 **Select a system from the buttons above to view P&ID diagrams and control valves**")
+    
+    # File status
+    st.markdown("---")
+    st.subheader("📁 System Status")
+    
+    # Paint straight away and fill the status in as warm-up finishes
+    polling = is_warming()
+    st.session_state.status_polling = polling
+    st.fragment(show_system_status, run_every=1 if polling else None)()
+
+elif st.session_state.current_system == "admin":
+    # This server process: its caches and every session it serves
+    st.markdown("## 🧠 Memory")
+    memory_admin()
 
 else:
     run_simulation(st.session_state.current_system)
 
+# Optional phase-timing panel (sidebar, off by default)
+dev_panel()
+
 st.markdown("---")
 st.success("🎯 **Interactive P&ID Simulation** - Now with full editing capabilities! 🎯")
@@ -0,0 +1,10 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("RIG_WARMUP", "0")  # tests compile what they use
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "slow: spawns fresh interpreters; skipped when RIG_SKIP_SLOW is set")
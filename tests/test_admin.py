@@ -0,0 +1,19 @@
+import os
+
+from streamlit.testing.v1 import AppTest
+
+from conftest import ROOT
+
+
+def test_memory_view_reports_the_dashboard_process():
+    at = AppTest.from_file(os.path.join(ROOT, "streamlit_app.py"), default_timeout=120).run()
+    next(b for b in at.button if b.label != "🧠 Memory").click().run()
+    assert not at.exception
+    next(b for b in at.button if b.label == "🧠 Memory").click().run()
+    assert not at.exception
+
+    metrics = {m.label: m.value for m in at.metric}
+    assert int(metrics["Sessions"]) >= 1
+    systems = at.table[1].value  # compiled systems, one row each
+    assert len(systems) >= 1
+    assert at.session_state.current_system == "admin"
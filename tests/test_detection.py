@@ -0,0 +1,62 @@
+import random
+
+from PIL import Image, ImageDraw
+
+from utils.detection import MAX_COARSE_PIXELS, find_symbols, suppress
+
+SYMBOL = (48, 32)  # valve symbol size (w, h): bigger than COARSE_SIDE, so the coarse pass downsamples
+
+
+def valve_symbol():
+    """A bow-tie valve with an actuator stem on top (not symmetric under a 90° turn)"""
+    w, h = SYMBOL
+    symbol = Image.new("L", (w, h + 12), 255)
+    draw = ImageDraw.Draw(symbol)
+    draw.polygon([(0, 12), (w // 2, 12 + h // 2), (0, h + 11)], fill=0)
+    draw.polygon([(w - 1, 12), (w // 2, 12 + h // 2), (w - 1, h + 11)], fill=0)
+    draw.line([(w // 2, 12 + h // 2), (w // 2, 4)], fill=0, width=3)
+    draw.rectangle([w // 2 - 8, 0, w // 2 + 8, 4], fill=0)
+    return symbol
+
+
+def drawing(count, size, seed):
+    """White sheet with ``count`` valves (every third turned 90°) and look-alike clutter; returns centres"""
+    rng = random.Random(seed)
+    sheet = Image.new("L", size, 255)
+    draw = ImageDraw.Draw(sheet)
+    symbol = valve_symbol()
+    centres, step = [], size[0] // 6
+    for i in range(count):
+        variant = symbol.transpose(Image.Transpose.ROTATE_90) if i % 3 == 2 else symbol
+        # One per grid cell, jittered, so symbols never overlap
+        x = (i % 6) * step + step // 2 + rng.randint(-step // 6, step // 6)
+        y = (i // 6) * step + step // 2 + rng.randint(-step // 6, step // 6)
+        left, top = x - variant.width // 2, y - variant.height // 2
+        sheet.paste(variant, (left, top))
+        centres.append((left + variant.width / 2, top + variant.height / 2))
+        # Clutter next to each valve: a circle and a pipe stub of similar size
+        draw.ellipse([x + 60, y - 16, x + 92, y + 16], outline=0, width=3)
+        draw.line([(x - 120, y + 50), (x - 60, y + 50)], fill=0, width=3)
+    return sheet, centres
+
+
+def test_suppress_keeps_the_best_of_close_candidates():
+    candidates = [{"x": 10, "y": 10, "score": 0.8}, {"x": 13, "y": 12, "score": 0.9},
+                  {"x": 40, "y": 10, "score": 0.7}]
+    assert suppress(candidates, 10) == [candidates[1], candidates[2]]
+
+
+def test_finds_every_symbol_on_a_downscaled_sheet():
+    size = (3600, 2000)
+    assert size[0] * size[1] > MAX_COARSE_PIXELS  # the sheet itself is shrunk too
+    sheet, centres = drawing(18, size, seed=2)
+    x, y = centres[0]
+    w, h = valve_symbol().size
+    found = find_symbols(sheet, (x - w / 2, y - h / 2, x + w / 2, y + h / 2))
+
+    assert len(found) == len(centres)
+    for i, (cx, cy) in enumerate(centres):
+        hit = min(found, key=lambda c: (c["x"] - cx) ** 2 + (c["y"] - cy) ** 2)
+        # Within a pixel: the coarse pass alone is off by up to 1 / scale factor (about 3 px here)
+        assert abs(hit["x"] - cx) <= 1 and abs(hit["y"] - cy) <= 1
+        assert hit["rotation"] == (90 if i % 3 == 2 else 0)
@@ -0,0 +1,44 @@
+import numpy as np
+from PIL import Image, ImageDraw
+
+from utils.extraction import collapse_strokes, extract_pipes, join_gaps, runs, split_at_tees
+
+
+def test_runs_keeps_long_runs_per_row():
+    mask = np.array([[0, 1, 1, 1, 0, 1],
+                     [1, 1, 0, 0, 0, 0],
+                     [1, 1, 1, 1, 1, 1]], dtype=bool)
+    assert runs(mask, 2).tolist() == [[0, 1, 3], [1, 0, 1], [2, 0, 5]]
+
+
+def test_join_gaps_stays_on_its_line():
+    segments = np.array([[1, 30, 40], [0, 0, 50], [1, 15, 20], [1, 10, 12]])
+    # Line 0 ends past every start on line 1, which must not pull them together
+    assert join_gaps(segments, 2).tolist() == [[0, 0, 50], [1, 10, 20], [1, 30, 40]]
+
+
+def test_collapse_strokes_centres_thick_strokes():
+    segments = np.array([[10, 5, 40], [11, 4, 41], [12, 5, 40], [13, 6, 39],  # one 4-row stroke
+                         [30, 5, 40]])  # a separate line further down
+    assert collapse_strokes(segments, 3, 2).tolist() == [[11, 4, 41], [30, 5, 40]]
+
+
+def test_split_at_tees_cuts_where_a_perpendicular_end_touches():
+    lines = np.array([[50, 0, 100]])
+    others = np.array([[40, 52, 90],  # ends 2 px below the line: a tee at 40
+                       [70, 10, 20]])  # nowhere near it
+    assert split_at_tees(lines, others, 3).tolist() == [[50, 0, 40], [50, 40, 100]]
+
+
+def test_extract_pipes_thick_stroke_gap_and_tee():
+    image = Image.new("RGB", (200, 150), "white")
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([20, 50, 160, 53], fill="black")  # 4 px thick header, centre row 51
+    draw.rectangle([80, 50, 83, 53], fill="white")  # a 4 px break (a valve symbol) to bridge
+    draw.rectangle([99, 50, 101, 130], fill="black")  # 3 px drop from the header: a tee at x 100
+    draw.rectangle([30, 100, 39, 101], fill="black")  # 10 px of text: shorter than min_length
+    assert extract_pipes(image) == [
+        {"x1": 100, "y1": 50, "x2": 100, "y2": 130},
+        {"x1": 20, "y1": 51, "x2": 100, "y2": 51},
+        {"x1": 100, "y1": 51, "x2": 160, "y2": 51},
+    ]
@@ -0,0 +1,17 @@
+import io
+
+from utils.importers import read_entities
+
+
+def svg(body):
+    return io.BytesIO(f'<svg xmlns="http://www.w3.org/2000/svg">{body}</svg>'.encode())
+
+
+def test_numbers_after_closepath_end_the_path():
+    entities = list(read_entities(svg('<path d="M0 0 L10 10 Z 5 5"/>'), "svg"))
+    assert entities == [("pipe", 0.0, 0.0, 10.0, 10.0), ("pipe", 10.0, 10.0, 0.0, 0.0)]
+
+
+def test_closepath_then_moveto_starts_a_new_subpath():
+    entities = list(read_entities(svg('<path d="M0 0 L10 0 Z M20 0 L30 0"/>'), "svg"))
+    assert ("pipe", 20.0, 0.0, 30.0, 0.0) in entities
@@ -0,0 +1,88 @@
+import random
+import statistics
+import time
+
+import pytest
+
+from utils.interlocks import InterlockState
+from utils.shared import compile_data, get_system
+from utils.solver import solve
+from utils.synthetic import generate
+from utils.systems import REGISTRY, SystemConfig
+from utils.valve_state import TAGS
+
+
+def synthetic_system(segments, rules, seed):
+    rig = generate(segments, seed=seed, name=f"ilk_{segments}")
+    entry = dict(rig.registry_entry(None, None, None), interlocks=rig.interlocks(rules, seed))
+    config = SystemConfig(rig.name, entry)
+    return compile_data(rig.name, rig.valves_json(), rig.pipes_json(), config=config)
+
+
+def holds(compiled, entry, bits):
+    """A registry rule evaluated from a full solve, without the compiled masks"""
+    solution = solve(compiled.topology, bits)
+    on = [bits >> TAGS.find(tag) & 1 for tag in entry.get("open", ())]
+    off = [bits >> TAGS.find(tag) & 1 for tag in entry.get("closed", ())]
+    return (all(on) and not any(off)
+            and all(solution.has_flow(n - 1) for n in entry.get("flowing", ()))
+            and not any(solution.has_flow(n - 1) for n in entry.get("not_flowing", ()))
+            and all(solution.has_pressure(n - 1) for n in entry.get("pressurized", ()))
+            and not any(solution.has_pressure(n - 1) for n in entry.get("depressurized", ())))
+
+
+def walk(compiled, steps, seed):
+    """Random valve moves (sometimes several at once) from all-closed"""
+    rng = random.Random(seed)
+    positions = list(compiled.positions)
+    bits = 0
+    for _ in range(steps):
+        for _ in range(rng.choice((1, 1, 1, 5))):
+            bits ^= 1 << rng.choice(positions)
+        yield bits
+
+
+@pytest.mark.parametrize("name", [name for name, config in REGISTRY.items() if config.interlocks])
+def test_shipped_rules_compile_and_start_open(name):
+    compiled = get_system(name)
+    assert not compiled.interlocks.errors
+    assert len(compiled.interlocks) == len(compiled.config.interlocks)
+    # Everything closed: no opening move of a shipped system is blocked
+    state = InterlockState(compiled.interlocks, 0)
+    assert not any(state.blocked(pos, True) for pos in compiled.positions)
+
+
+@pytest.mark.parametrize("name", [name for name, config in REGISTRY.items() if config.interlocks])
+def test_shipped_rules_incremental_matches_full(name):
+    compiled = get_system(name)
+    rules = compiled.interlocks
+    state = InterlockState(rules, 0)
+    for bits in walk(compiled, 200, seed=1):
+        state.update(bits)
+        assert state.failing == InterlockState(rules, bits).failing
+        for i, entry in enumerate(compiled.config.interlocks):
+            assert (i not in state.failing) == holds(compiled, entry, bits)
+
+
+def test_synthetic_rules_incremental_matches_full_and_solve():
+    compiled = synthetic_system(300, 400, seed=1)
+    rules, entries = compiled.interlocks, compiled.config.interlocks
+    assert len(rules) == len(entries) and not rules.errors
+    state = InterlockState(rules, 0)
+    for step, bits in enumerate(walk(compiled, 300, seed=2)):
+        state.update(bits)
+        assert state.failing == InterlockState(rules, bits).failing
+        if step % 20 == 0:
+            for i, entry in enumerate(entries):
+                assert (i not in state.failing) == holds(compiled, entry, bits), entry
+
+
+def test_update_is_sub_millisecond_with_thousands_of_rules():
+    compiled = synthetic_system(10_000, 5_000, seed=3)
+    state = InterlockState(compiled.interlocks, 0)
+    times = []
+    for bits in walk(compiled, 2_000, seed=4):
+        start = time.perf_counter()
+        state.update(bits)
+        times.append(time.perf_counter() - start)
+    assert statistics.median(times) < 0.001
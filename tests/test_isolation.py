@@ -0,0 +1,77 @@
+import random
+import statistics
+import time
+from itertools import combinations
+
+import pytest
+
+from utils.isolation import plan_isolation
+from utils.shared import compile_data, compile_system
+from utils.synthetic import generate
+from utils.systems import REGISTRY, SystemConfig
+
+
+def synthetic_system(segments, seed):
+    rig = generate(segments, seed=seed, name=f"iso_{segments}")
+    config = SystemConfig(rig.name, rig.registry_entry(None, None, None))
+    return compile_data(rig.name, rig.valves_json(), rig.pipes_json(), config=config)
+
+
+def brute_minimum(network, pipe_ids, limit):
+    """Fewest valves whose closing cuts ``pipe_ids`` off, trying every set of up to ``limit``; None if none does"""
+    bits = sorted(network.valve_node)
+    for k in range(limit + 1):
+        for combo in combinations(bits, k):
+            if network.section(pipe_ids, sum(1 << bit for bit in combo)) is not None:
+                return k
+    return None
+
+
+def check(compiled, pipe_ids):
+    network = compiled.isolation
+    result = plan_isolation(compiled, pipe_ids)
+    plans = result["plans"]
+    if plans:
+        assert all(plan["verified"] for plan in plans)
+        assert [plan["count"] for plan in plans] == sorted(plan["count"] for plan in plans)
+        assert brute_minimum(network, pipe_ids, plans[0]["count"]) == plans[0]["count"]
+        for plan in plans:
+            assert set(pipe_ids) <= set(plan["section"])
+    elif "not connected" in result["message"]:
+        assert brute_minimum(network, pipe_ids, 0) == 0
+    else:
+        # No valve cut at all: not even closing every valve cuts the pipes off
+        assert network.section(pipe_ids, sum(1 << bit for bit in network.valve_node)) is None
+    return result
+
+
+@pytest.mark.parametrize("name", list(REGISTRY))
+def test_shipped_plans_match_brute_force(name):
+    compiled = compile_system(name)
+    for pipe_id in range(len(compiled.model.pipes)):
+        check(compiled, [pipe_id])
+
+
+def test_synthetic_plans_match_brute_force():
+    compiled = synthetic_system(300, seed=5)
+    rng = random.Random(6)
+    pipes = len(compiled.model.pipes)
+    planned = 0
+    for _ in range(40):
+        # Pairs of pipes on different branches need cuts of two or more valves
+        selection = rng.sample(range(pipes), rng.choice((1, 2)))
+        planned += bool(check(compiled, selection)["plans"])
+    assert planned
+
+
+def test_planning_stays_interactive_on_thousands_of_valves():
+    compiled = synthetic_system(10_000, seed=7)
+    assert len(compiled.isolation.valve_node) > 2_000
+    rng = random.Random(1)
+    times = []
+    for _ in range(20):
+        pipe_id = rng.randrange(len(compiled.model.pipes))
+        start = time.perf_counter()
+        plan_isolation(compiled, [pipe_id])
+        times.append(time.perf_counter() - start)
+    assert statistics.median(times) < 0.25
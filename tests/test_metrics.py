@@ -0,0 +1,23 @@
+import logging
+
+from utils import metrics
+from utils.metrics import MetricsRegistry
+
+
+def test_counter_metadata_names_the_sample_family():
+    registry = MetricsRegistry()
+    registry.counter("rig_test_requests", "Requests", ("result",)).labels("hit").inc(3)
+    assert registry.render().splitlines() == [
+        "# HELP rig_test_requests_total Requests",
+        "# TYPE rig_test_requests_total counter",
+        'rig_test_requests_total{result="hit"} 3',
+    ]
+
+
+def test_bad_port_is_a_warning(monkeypatch, caplog):
+    monkeypatch.setenv("RIG_METRICS_PORT", "auto")
+    monkeypatch.delenv("RIG_METRICS_FILE", raising=False)
+    monkeypatch.setattr(metrics, "_started", False)
+    with caplog.at_level(logging.WARNING, logger="utils.metrics"):
+        metrics.start_exporter()
+    assert "not a port number" in caplog.text
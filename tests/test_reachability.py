@@ -0,0 +1,125 @@
+import random
+
+import pytest
+
+from utils.reachability import Reachability
+from utils.shared import compile_data, compile_system
+from utils.solver import Topology, solve
+from utils.synthetic import generate
+from utils.systems import REGISTRY, SystemConfig
+
+# Tuples of leaders whose order depends on the order they were added in
+UNORDERED = ("member_of", "valve_leaders")
+
+
+def assert_same(patched, built):
+    for field in Reachability.__slots__:
+        a, b = getattr(patched, field), getattr(built, field)
+        if field in UNORDERED:
+            a = {key: sorted(value) for key, value in a.items()}
+            b = {key: sorted(value) for key, value in b.items()}
+        assert a == b, field
+
+
+def edit(rng, valves, pipes, entry):
+    """One random calibration save: valves and pipe ends moved, added, removed or renamed, registry tweaks"""
+    valves, pipes, entry = dict(valves), [dict(p) for p in pipes], dict(entry)
+    for _ in range(rng.randint(1, 4)):
+        kind = rng.choice(("move", "move", "end", "add", "remove", "rename", "group", "bind", "source"))
+        tags = list(valves)
+        if kind == "move" and tags:
+            tag = rng.choice(tags)
+            valves[tag] = dict(valves[tag], x=valves[tag]["x"] + rng.randint(-80, 80),
+                               y=valves[tag]["y"] + rng.randint(-80, 80))
+        elif kind == "end":
+            pipe = rng.choice(pipes)
+            key = rng.choice(("x1", "y1", "x2", "y2"))
+            pipe[key] += rng.randint(-40, 40)
+        elif kind == "add":
+            pipe = rng.choice(pipes)
+            valves[f"V-T{rng.randrange(10_000)}"] = {"x": pipe["x1"] + rng.randint(-10, 10),
+                                                     "y": pipe["y1"] + rng.randint(-10, 10), "state": False}
+        elif kind == "remove" and tags:
+            del valves[rng.choice(tags)]
+        elif kind == "rename" and tags:
+            tag = rng.choice(tags)
+            valves[f"V-R{rng.randrange(10_000)}"] = valves.pop(tag)
+        elif kind == "group":
+            groups = dict(entry.get("groups", {}))
+            leader = str(rng.randint(1, len(pipes)))
+            if leader in groups and rng.random() < 0.5:
+                del groups[leader]
+            else:
+                groups[leader] = rng.sample(range(1, len(pipes) + 1), rng.randint(1, min(4, len(pipes))))
+            entry["groups"] = groups
+        elif kind == "bind" and tags:
+            entry["valve_bindings"] = dict(entry.get("valve_bindings", {}),
+                                           **{rng.choice(tags): rng.randint(1, len(pipes))})
+        elif kind == "source":
+            count = rng.randint(1, min(3, len(pipes)))
+            entry["pressure_sources"] = rng.sample(range(1, len(pipes) + 1), count)
+    return valves, pipes, entry
+
+
+def calibration_run(name, valves, pipes, entry, saves, seed):
+    rng = random.Random(seed)
+    previous = compile_data(name, valves, pipes, config=SystemConfig(name, entry))
+    reach = previous.reach
+    for _ in range(saves):
+        valves, pipes, entry = edit(rng, valves, pipes, entry)
+        compiled = compile_data(name, valves, pipes, config=SystemConfig(name, entry))
+        reach = reach.updated(compiled.topology)
+        assert_same(reach, Reachability(compiled.topology))
+
+
+@pytest.mark.parametrize("name", list(REGISTRY))
+def test_updated_matches_rebuild_after_calibration_saves(name):
+    compiled = compile_system(name)
+    valves, pipes = compiled.model.to_json()
+    entry = {"valves": None, "pipes": None, "png": None,
+             "pressure_sources": list(compiled.config.pressure_sources),
+             "leader_radius": compiled.config.leader_radius,
+             "groups": {str(k): list(v) for k, v in compiled.config.groups.items()},
+             "valve_bindings": dict(compiled.config.valve_bindings)}
+    calibration_run(name, valves, pipes, entry, saves=60, seed=len(name))
+
+
+def test_updated_matches_rebuild_on_a_synthetic_rig():
+    rig = generate(500, seed=11, name="reach_500")
+    calibration_run(rig.name, rig.valves_json(), rig.pipes_json(), rig.registry_entry(None, None, None),
+                    saves=60, seed=12)
+
+
+def test_updated_matches_rebuild_on_random_topologies():
+    rng = random.Random(3)
+
+    def topology(pipes):
+        leaders = [(p, rng.getrandbits(12)) for p in range(pipes) if rng.random() < 0.5]
+        groups = [(leader, rng.getrandbits(pipes))
+                  for leader in rng.sample(range(pipes), rng.randint(0, min(4, pipes)))]
+        sources = rng.getrandbits(pipes)
+        return Topology(pipes, [(p, mask) for p, mask in leaders if mask], groups, sources,
+                        sources & rng.getrandbits(pipes))
+
+    for _ in range(300):
+        pipes = rng.randint(1, 30)
+        before, after = topology(pipes), topology(pipes)
+        reach = Reachability(before)
+        assert_same(reach.updated(after), Reachability(after))
+        assert reach.updated(before) is reach
+        # And the index still answers what the solver does
+        for bits in (rng.getrandbits(12) for _ in range(5)):
+            live = solve(after, bits)
+            live = live.flow & live.pressure
+            patched = reach.updated(after)
+            assert all(patched.is_live(p, bits) == bool(live >> p & 1) for p in range(pipes))
+
+
+def test_updated_rebuilds_when_pipes_are_added():
+    rng = random.Random(4)
+    rig = generate(100, seed=4, name="reach_100")
+    valves, pipes, entry = rig.valves_json(), rig.pipes_json(), rig.registry_entry(None, None, None)
+    before = compile_data(rig.name, valves, pipes, config=SystemConfig(rig.name, entry))
+    pipes = pipes + [dict(rng.choice(pipes))]
+    after = compile_data(rig.name, valves, pipes, config=SystemConfig(rig.name, entry))
+    assert_same(before.reach.updated(after.topology), Reachability(after.topology))
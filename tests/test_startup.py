@@ -0,0 +1,42 @@
+import compileall
+import json
+import os
+import sys
+
+import pytest
+
+from conftest import ROOT
+
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+import bench_startup  # noqa: E402
+from utils.systems import REGISTRY  # noqa: E402
+
+
+def budget():
+    with open(bench_startup.BUDGET_PATH, 'r') as f:
+        return json.load(f)
+
+
+def test_check_reports_every_kind_of_overrun():
+    results = {
+        "home": {"paint_ms": 9999, "app_import_ms": 1, "errors": [], "heavy_modules": ["numpy"]},
+        "mixing": {"paint_ms": 10, "app_import_ms": 999, "errors": ["boom"], "heavy_modules": []},
+    }
+    failures = bench_startup.check(results, budget())
+    assert [f.split(":")[0] for f in failures] == ["home", "mixing", "mixing", "home"]
+
+
+@pytest.fixture(scope="module")
+def compiled_tree():
+    """Bytecode for the app, as a deployed server has it (PYTHONDONTWRITEBYTECODE would leave it stale)"""
+    for path in ("utils", "page"):
+        compileall.compile_dir(os.path.join(ROOT, path), quiet=1)
+    compileall.compile_file(os.path.join(ROOT, "streamlit_app.py"), quiet=1)
+
+
+@pytest.mark.slow
+@pytest.mark.skipif(bool(os.environ.get("RIG_SKIP_SLOW")), reason="RIG_SKIP_SLOW is set")
+@pytest.mark.parametrize("target", ["home", *REGISTRY])
+def test_cold_start_within_budget(target, compiled_tree):
+    results = {target: bench_startup.measure(target, repeat=3)}
+    assert bench_startup.check(results, budget()) == []
@@ -0,0 +1,95 @@
+"""Memory admin view: process RSS vs soft limit, shared caches, live sessions,
+tracemalloc snapshots and eviction (numbers from ``utils.memory``).
+
+It must run inside the dashboard's own server process to describe it, so
+the dashboard opens it from its navigation (``memory_admin()``) and
+``page/admin.py`` is only a thin standalone wrapper.
+"""
+import json
+import tracemalloc
+
+import streamlit as st
+
+from utils import memory
+
+
+def mb(size):
+    return f"{size / 2**20:.1f} MB" if size is not None else "-"
+
+
+def memory_admin():
+    """The whole admin view, drawn into the current page"""
+    report = memory.memory_report()
+    process = report["process"]
+
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Process RSS", mb(process["rss"]))
+    col2.metric("Soft limit", mb(process["soft_limit"]))
+    col3.metric("Shared caches", mb(sum(report["caches"].values())))
+    col4.metric("Sessions", len(report["sessions"]))
+    if process["soft_limit"]:
+        st.progress(min(1.0, process["rss"] / process["soft_limit"]),
+                    text=f"{100 * process['rss'] / process['soft_limit']:.0f}% of soft limit")
+    else:
+        st.caption("No soft limit: set RIG_MEMORY_SOFT_LIMIT_MB or run under a cgroup memory limit")
+
+    # ==================== CACHES ====================
+    st.header("Shared caches")
+    st.table([{"cache": name, "size": mb(size)} for name, size in report["caches"].items()])
+    if report["systems"]:
+        st.subheader("Compiled systems")
+        st.table([
+            {"system": name, "image": mb(parts["image"]), "model": mb(parts["model"]),
+             "index": mb(parts["index"]), "topology": mb(parts["topology"]), "reach": mb(parts["reach"]),
+             "isolation": mb(parts["isolation"]), "interlocks": mb(parts["interlocks"]),
+             "other": mb(parts["other"]), "total": mb(parts["total"]), "idle s": parts["idle_s"]}
+            for name, parts in report["systems"].items()
+        ])
+
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("🧹 Evict now", key="admin_evict", use_container_width=True):
+            dropped = memory.evict("manual")
+            st.success(f"Dropped: {', '.join(dropped)}")
+    with col2:
+        st.download_button("⬇️ JSON report", json.dumps(report, indent=2), file_name="rig_memory.json",
+                           mime="application/json", key="admin_export", use_container_width=True)
+
+    # ==================== SESSIONS ====================
+    st.header("Sessions")
+    st.caption(f"Sampled by each page every {memory.FOOTPRINT_INTERVAL:.0f} s of use; "
+               f"sessions over {memory.SESSION_SOFT_LIMIT // 1024} KB drop other systems' leftovers")
+    if report["sessions"]:
+        st.table([
+            {"session": row["session"], "system": row["system"], "seen s ago": row["age_s"],
+             "total": f"{row['total'] / 1024:.1f} KB",
+             "largest keys": ", ".join(f"{key} {size / 1024:.1f} KB" for key, size in row["top"].items())}
+            for row in report["sessions"]
+        ])
+    else:
+        st.info("No sessions have reported yet")
+
+    # ==================== TRACEMALLOC ====================
+    st.header("Allocation tracing")
+    if tracemalloc.is_tracing():
+        traced = report["tracemalloc"]
+        st.caption(f"Traced: {mb(traced['current'])} now, {mb(traced['peak'])} peak")
+        col1, col2, col3 = st.columns(3)
+        col1.button("📸 Set baseline", key="admin_baseline", on_click=memory.take_baseline,
+                    use_container_width=True)
+        col2.button("🔄 Refresh", key="admin_refresh", use_container_width=True)
+        col3.button("⏹️ Stop tracing", key="admin_stop", on_click=memory.stop_tracing,
+                    use_container_width=True)
+        st.table([
+            {"where": row["where"], "size": f"{row['size'] / 1024:.1f} KB", "blocks": row["count"],
+             "growth": "-" if row["growth"] is None else f"{row['growth'] / 1024:+.1f} KB"}
+            for row in traced["top"]
+        ])
+    else:
+        st.caption("Tracing slows every allocation; start it only while hunting a leak")
+        st.button("▶️ Start tracing", key="admin_start", on_click=memory.start_tracing)
+
+    # ==================== EVICTIONS ====================
+    if report["evictions"]:
+        st.header("Evictions")
+        st.table(report["evictions"][::-1])
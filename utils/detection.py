@@ -0,0 +1,193 @@
+"""Valve-symbol detection by template matching.
+
+The user points at one example symbol; ``find_symbols`` scores every
+position of the drawing with normalized cross-correlation (NCC) against
+that example at a few scales and both orientations (valves on horizontal
+and vertical pipes), and returns the peaks as candidate valve positions.
+
+NCC is computed in the frequency domain: the drawing's FFT is taken once
+and reused for every template variant, and the per-window mean and energy
+come from integral images, so each variant costs one inverse FFT.  Large
+scans are matched on a copy downscaled until the example is
+``COARSE_SIDE`` px across, then each hit is re-centred by matching at full
+resolution in a small window around it.
+"""
+import numpy as np
+
+from utils.extraction import to_gray
+
+COARSE_SIDE = 16  # template size (px) the coarse pass works at
+MAX_COARSE_PIXELS = 6_000_000
+
+
+def _fast_length(n):
+    """Smallest 2^a * 3^b * 5^c >= n (sizes numpy's FFT handles quickly)"""
+    best = 1 << (n - 1).bit_length()
+    p5 = 1
+    while p5 < best:
+        p35 = p5
+        while p35 < best:
+            p2 = p35
+            while p2 < n:
+                p2 *= 2
+            best = min(best, p2)
+            p35 *= 3
+        p5 *= 5
+    return best
+
+
+def _window_sums(values, h, w):
+    """Sum of ``values`` over every h x w window (valid positions only), via an integral image"""
+    integral = np.zeros((values.shape[0] + 1, values.shape[1] + 1))
+    integral[1:, 1:] = values.cumsum(0).cumsum(1)
+    return integral[h:, w:] - integral[:-h, w:] - integral[h:, :-w] + integral[:-h, :-w]
+
+
+class _Matcher:
+    """One drawing prepared for NCC against any number of templates"""
+
+    def __init__(self, gray, max_template):
+        self.gray = gray.astype(np.float64)
+        th, tw = max_template
+        self.shape = (_fast_length(gray.shape[0] + th), _fast_length(gray.shape[1] + tw))
+        self.spectrum = np.fft.rfft2(self.gray, self.shape)
+        self._sums = {}
+
+    def _stats(self, h, w):
+        if (h, w) not in self._sums:
+            n = h * w
+            total = _window_sums(self.gray, h, w)
+            energy = _window_sums(self.gray ** 2, h, w) - total ** 2 / n
+            self._sums[h, w] = np.sqrt(np.maximum(energy, 0))
+        return self._sums[h, w]
+
+    def ncc(self, template):
+        """NCC map (valid positions, top-left anchored) of ``template`` over the drawing"""
+        h, w = template.shape
+        t = template.astype(np.float64)
+        t -= t.mean()
+        norm = np.sqrt((t ** 2).sum())
+        if norm == 0:
+            return np.zeros((self.gray.shape[0] - h + 1, self.gray.shape[1] - w + 1))
+        # Correlation = convolution with the flipped template
+        kernel = np.fft.rfft2(t[::-1, ::-1], self.shape)
+        full = np.fft.irfft2(self.spectrum * kernel, self.shape)
+        corr = full[h - 1:self.gray.shape[0], w - 1:self.gray.shape[1]]
+        denom = self._stats(h, w) * norm
+        with np.errstate(divide="ignore", invalid="ignore"):
+            score = np.where(denom > 1e-6 * norm, corr / denom, 0)
+        return score
+
+
+def _resize(gray, factor):
+    from PIL import Image
+
+    h, w = gray.shape
+    size = (max(1, round(w * factor)), max(1, round(h * factor)))
+    return np.asarray(Image.fromarray(gray).resize(size, Image.BILINEAR))
+
+
+def _variants(template, scales, rotations):
+    for rotation in rotations:
+        rotated = np.rot90(template, rotation // 90)
+        for scale in scales:
+            yield rotation, scale, (rotated if scale == 1 else _resize(rotated, scale))
+
+
+def _peaks(score, threshold):
+    """``(ys, xs, scores)`` of 3x3 local maxima above ``threshold``"""
+    padded = np.pad(score, 1, constant_values=-np.inf)
+    center = padded[1:-1, 1:-1]
+    is_peak = center >= threshold
+    for dy in (-1, 0, 1):
+        for dx in (-1, 0, 1):
+            if dy or dx:
+                is_peak &= center >= padded[1 + dy:padded.shape[0] - 1 + dy, 1 + dx:padded.shape[1] - 1 + dx]
+    ys, xs = np.nonzero(is_peak)
+    return ys, xs, center[ys, xs]
+
+
+def suppress(candidates, radius):
+    """Greedy non-maximum suppression: keep the best candidate within ``radius`` of any other"""
+    kept, grid = [], {}
+    for candidate in sorted(candidates, key=lambda c: -c["score"]):
+        cx, cy = int(candidate["x"] // radius), int(candidate["y"] // radius)
+        close = any(
+            (other["x"] - candidate["x"]) ** 2 + (other["y"] - candidate["y"]) ** 2 < radius ** 2
+            for gx in (cx - 1, cx, cx + 1) for gy in (cy - 1, cy, cy + 1)
+            for other in grid.get((gx, gy), ()))
+        if not close:
+            kept.append(candidate)
+            grid.setdefault((cx, cy), []).append(candidate)
+    return kept
+
+
+def find_symbols(image, box, threshold=0.7, scales=(0.9, 1.0, 1.1), rotations=(0, 90), limit=500):
+    """Candidate ``[{"x", "y", "score", "scale", "rotation"}]`` centres of symbols like the one in ``box``
+
+    ``box`` is ``(x0, y0, x1, y1)`` around one example symbol in image
+    pixels.  Results are sorted by score, at most ``limit`` of them.
+    """
+    gray = to_gray(image)
+    x0, y0, x1, y1 = (int(round(v)) for v in box)
+    x0, x1 = sorted((max(0, x0), min(gray.shape[1], x1)))
+    y0, y1 = sorted((max(0, y0), min(gray.shape[0], y1)))
+    template = gray[y0:y1, x0:x1]
+    if template.shape[0] < 3 or template.shape[1] < 3:
+        raise ValueError("example box is too small")
+
+    # Coarse pass on a copy where the example is about COARSE_SIDE px across
+    factor = min(1.0, COARSE_SIDE / min(template.shape))
+    factor = min(factor, np.sqrt(MAX_COARSE_PIXELS / gray.size))
+    coarse = gray if factor >= 0.999 else _resize(gray, factor)
+    coarse_template = template if factor >= 0.999 else _resize(template, factor)
+    largest = max(round(max(coarse_template.shape) * max(scales)) + 1, 1)
+    matcher = _Matcher(coarse, (largest, largest))
+    # The coarse pass is blurrier than the example: accept a little less there
+    coarse_threshold = threshold if coarse is gray else threshold - 0.15
+
+    candidates = []
+    for rotation, scale, variant in _variants(coarse_template, scales, rotations):
+        h, w = variant.shape
+        if h > coarse.shape[0] or w > coarse.shape[1]:
+            continue
+        ys, xs, scores = _peaks(matcher.ncc(variant), coarse_threshold)
+        candidates += [{"x": (x + w / 2) / factor, "y": (y + h / 2) / factor, "score": float(s),
+                        "scale": scale, "rotation": rotation}
+                       for y, x, s in zip(ys.tolist(), xs.tolist(), scores.tolist())]
+    radius = 0.6 * min(template.shape)
+    candidates = suppress(candidates, radius)[:limit * 2]
+
+    if coarse is not gray:
+        variants = {(rotation, scale): variant for rotation, scale, variant in _variants(template, scales, rotations)}
+        candidates = [_refine(gray, variants[c["rotation"], c["scale"]], c) for c in candidates]
+    results = [c for c in suppress(candidates, radius) if c["score"] >= threshold][:limit]
+    for c in results:
+        c["x"], c["y"] = int(round(c["x"])), int(round(c["y"]))
+    return results
+
+
+def _refine(gray, variant, candidate):
+    """Re-centre a coarse hit by matching its template variant at full resolution nearby"""
+    h, w = variant.shape
+    margin = max(h, w) // 2 + 2
+    top = int(max(0, candidate["y"] - h / 2 - margin))
+    left = int(max(0, candidate["x"] - w / 2 - margin))
+    window = gray[top:int(candidate["y"] + h / 2 + margin) + 1, left:int(candidate["x"] + w / 2 + margin) + 1]
+    if window.shape[0] < h or window.shape[1] < w:
+        return dict(candidate, score=0.0)
+    score = _Matcher(window, (h, w)).ncc(variant)
+    y, x = np.unravel_index(np.argmax(score), score.shape)
+    return dict(candidate, x=left + x + w / 2, y=top + y + h / 2, score=float(score[y, x]))
+
+
+def new_positions(candidates, existing, radius):
+    """Candidates farther than ``radius`` from every ``(x, y)`` in ``existing``"""
+    existing = np.asarray(list(existing), dtype=np.float64).reshape(-1, 2)
+    if not len(existing):
+        return list(candidates)
+    fresh = []
+    for c in candidates:
+        if np.min(np.hypot(existing[:, 0] - c["x"], existing[:, 1] - c["y"])) > radius:
+            fresh.append(c)
+    return fresh
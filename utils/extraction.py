@@ -0,0 +1,157 @@
+"""Automatic pipe extraction from P&ID drawings.
+
+Pipes on the drawings are horizontal and vertical strokes, so extraction
+is run-length scanning rather than a general Hough transform:
+
+1. binarize (Otsu threshold on grayscale unless one is given)
+2. find every horizontal run of dark pixels per row, and every vertical
+   run per column, with numpy (one ``diff`` over the whole image)
+3. drop runs shorter than ``min_length`` (text, symbols, arrow heads)
+4. join runs on the same row/column separated by at most ``gap`` pixels
+   (a valve symbol or a label breaking the line)
+5. collapse the parallel runs a thick stroke leaves on neighbouring rows
+   into one centreline
+6. split lines where another line's end meets them (tees), since the
+   solver looks for a pipe's leader valves at its start point
+
+The result is ``pipes`` entries in the ``data/pipes_*.json`` schema, as
+proposals for review in the marker tool.
+"""
+import numpy as np
+
+
+def to_gray(image):
+    """``uint8`` (h, w) array from a PIL image; transparent pixels count as background"""
+    if image.mode in ("RGBA", "LA") or "transparency" in image.info:
+        rgba = np.asarray(image.convert("RGBA"), dtype=np.float32)
+        gray = rgba[..., :3] @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+        alpha = rgba[..., 3] / 255
+        return (gray * alpha + 255 * (1 - alpha)).astype(np.uint8)
+    return np.asarray(image.convert("L"))
+
+
+def otsu_threshold(gray):
+    """Grey level that best separates ink from background (Otsu's method)"""
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    levels = np.arange(256)
+    weight = np.cumsum(hist)
+    mean = np.cumsum(hist * levels)
+    total, total_mean = weight[-1], mean[-1]
+    background = total - weight
+    with np.errstate(divide="ignore", invalid="ignore"):
+        between = (total_mean * weight - mean * total) ** 2 / (weight * background)
+    return int(np.nanargmax(between[:-1]))
+
+
+def binarize(image, threshold=None):
+    """Boolean ink mask; ``threshold=None`` picks one with Otsu's method"""
+    gray = to_gray(image)
+    if threshold is None:
+        threshold = otsu_threshold(gray)
+    return gray <= threshold
+
+
+def runs(mask, min_length):
+    """``(line, start, end)`` rows of every run of True along axis 1 that is at least ``min_length`` long"""
+    padded = np.zeros((mask.shape[0], mask.shape[1] + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+    lines, starts = np.nonzero(edges == 1)
+    _, stops = np.nonzero(edges == -1)  # same row-major order, so pairs line up
+    ends = stops - 1
+    keep = ends - starts + 1 >= min_length
+    return np.stack([lines[keep], starts[keep], ends[keep]], axis=1)
+
+
+def join_gaps(segments, gap):
+    """Merge segments on the same line whose gap is at most ``gap`` pixels"""
+    if not len(segments):
+        return segments
+    segments = segments[np.lexsort((segments[:, 1], segments[:, 0]))]
+    line, start, end = segments.T
+    # Offsetting each line keeps the running maximum of ends from leaking across lines
+    offset = line * (int(end.max()) + gap + 2)
+    reach = np.maximum.accumulate(end + offset)
+    new = np.ones(len(segments), dtype=bool)
+    new[1:] = (line[1:] != line[:-1]) | (start[1:] + offset[1:] - reach[:-1] - 1 > gap)
+    groups = np.flatnonzero(new)
+    return np.stack([line[groups], np.minimum.reduceat(start, groups), np.maximum.reduceat(end, groups)], axis=1)
+
+
+def collapse_strokes(segments, tolerance, gap):
+    """One centreline per stroke: merge segments on lines within ``tolerance`` whose extents overlap"""
+    clusters = []  # [first line, last line, start, end]
+    by_line = {}
+    for line, start, end in segments[np.lexsort((segments[:, 1], segments[:, 0]))].tolist():
+        target = None
+        for near in range(line - tolerance, line + 1):
+            for index in by_line.get(near, ()):
+                cluster = clusters[index]
+                if start <= cluster[3] + gap and end >= cluster[2] - gap and line - cluster[0] <= tolerance:
+                    target = index
+                    break
+            if target is not None:
+                break
+        if target is None:
+            target = len(clusters)
+            clusters.append([line, line, start, end])
+        else:
+            cluster = clusters[target]
+            cluster[1], cluster[2], cluster[3] = line, min(cluster[2], start), max(cluster[3], end)
+        by_line.setdefault(line, []).append(target)
+    if not clusters:
+        return np.empty((0, 3), dtype=np.int64)
+    clusters = np.array(clusters)
+    return np.stack([(clusters[:, 0] + clusters[:, 1]) // 2, clusters[:, 2], clusters[:, 3]], axis=1)
+
+
+def split_at_tees(lines, others, tolerance):
+    """Split each ``(line, start, end)`` where an end point of a perpendicular line touches it"""
+    if not len(lines) or not len(others):
+        return lines
+    # Perpendicular end points as (position along our axis, position across it)
+    points = np.concatenate([others[:, [0, 1]], others[:, [0, 2]]])
+    points = points[np.argsort(points[:, 0])]
+    result = []
+    for line, start, end in lines.tolist():
+        lo, hi = np.searchsorted(points[:, 0], [start + tolerance, end - tolerance])
+        if hi > lo:
+            near = points[lo:hi]
+            cuts = np.unique(near[np.abs(near[:, 1] - line) <= tolerance, 0]).tolist()
+        else:
+            cuts = []
+        bounds = [start, *cuts, end]
+        result.extend((line, a, b) for a, b in zip(bounds, bounds[1:]) if b - a > tolerance)
+    return np.array(result, dtype=np.int64).reshape(-1, 3)
+
+
+def centrelines(mask, min_length=20, gap=6, tolerance=3):
+    """``(line, start, end)`` centrelines of the strokes along axis 1 (transpose for vertical)"""
+    segments = join_gaps(runs(mask, min_length), gap)
+    return collapse_strokes(segments, tolerance, gap)
+
+
+def extract_pipes(image, threshold=None, min_length=20, gap=6, tolerance=3, split=True, frame_ratio=0.9):
+    """Proposed ``[{"x1", "y1", "x2", "y2"}]`` pipes found on ``image`` (PIL)
+
+    ``min_length`` drops strokes shorter than that (text, symbols); ``gap``
+    bridges breaks along a line; ``tolerance`` is how far apart (px) the
+    rows of one thick stroke, or a tee's meeting ends, may be.  Lines longer
+    than ``frame_ratio`` of the image side are taken for the drawing frame
+    and dropped (``frame_ratio=None`` keeps them).
+    """
+    mask = binarize(image, threshold)
+    height, width = mask.shape
+    horizontal = centrelines(mask, min_length, gap, tolerance)
+    vertical = centrelines(mask.T, min_length, gap, tolerance)
+    if frame_ratio is not None:
+        horizontal = horizontal[horizontal[:, 2] - horizontal[:, 1] < frame_ratio * width]
+        vertical = vertical[vertical[:, 2] - vertical[:, 1] < frame_ratio * height]
+    if split:
+        horizontal, vertical = (split_at_tees(horizontal, vertical, tolerance),
+                                split_at_tees(vertical, horizontal, tolerance))
+
+    pipes = [{"x1": start, "y1": y, "x2": end, "y2": y} for y, start, end in horizontal.tolist()]
+    pipes += [{"x1": x, "y1": start, "x2": x, "y2": end} for x, start, end in vertical.tolist()]
+    pipes.sort(key=lambda p: (p["y1"], p["x1"]))
+    return pipes
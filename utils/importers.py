@@ -0,0 +1,557 @@
+"""Streaming import of CAD line work into system data.
+
+Reads line entities and valve symbols from SVG, ASCII DXF or CSV and
+writes ``data/pipes_*.json`` / ``data/valves_*.json`` records in one pass:
+each reader is a generator of ``("pipe", x1, y1, x2, y2)`` and
+``("valve", tag, x, y)`` entities in drawing units, a ``Transform`` maps
+them to raster pixels, and ``write_system`` streams both files entity by
+entity, so memory stays flat however large the drawing is.
+
+* SVG: ``line``, ``polyline``, ``polygon`` and ``path`` (M/L/H/V/Z; curves
+  become their chords) under nested ``transform``s; ``use`` elements whose
+  reference or id matches the valve pattern are valves, tagged from
+  ``data-tag``, ``id`` or ``inkscape:label``; geometry inside ``defs``,
+  ``symbol``, ``marker`` and the like is only drawn by reference and skipped
+* DXF: ``LINE``, ``LWPOLYLINE`` and ``POLYLINE`` in the ENTITIES section
+  (optionally only on some layers); ``INSERT`` of a block matching the
+  valve pattern is a valve, tagged from its ``TAG`` attribute (or the first
+  attribute)
+* CSV: rows with ``x1, y1, x2, y2`` are pipes, rows with ``tag, x, y`` are
+  valves
+
+``--fit`` scales the drawing's extent (SVG ``viewBox``, DXF
+``$EXTMIN``/``$EXTMAX``) onto the system's P&ID image:
+
+    python -m utils.importers plant.dxf --system mixing --fit --layers "PIPE*"
+    python -m utils.importers lines.csv --pipes data/pipes_new.json --valves data/valves_new.json
+"""
+import argparse
+import csv
+import io
+import json
+import math
+import os
+import re
+import sys
+import time
+from fnmatch import fnmatch
+from xml.etree.ElementTree import ParseError, iterparse
+
+from utils.model import canonical_tag
+from utils.systems import REGISTRY, get_system_files, resolve
+
+VALVE_PATTERN = r"valve|^#?v[-_]"
+FORMATS = ("svg", "dxf", "csv")
+
+
+# ==================== TRANSFORM ====================
+class Transform:
+    """Affine map from drawing units to raster pixels: ``x' = a x + c y + e``, ``y' = b x + d y + f``"""
+
+    __slots__ = ("matrix",)
+
+    def __init__(self, matrix=(1, 0, 0, 1, 0, 0)):
+        self.matrix = tuple(float(v) for v in matrix)
+
+    @classmethod
+    def from_options(cls, scale=1.0, offset=(0, 0), flip_height=None):
+        """Scale, then offset; ``flip_height`` mirrors y (CAD y points up, image y down)"""
+        if flip_height is None:
+            return cls((scale, 0, 0, scale, offset[0], offset[1]))
+        return cls((scale, 0, 0, -scale, offset[0], flip_height - offset[1]))
+
+    @classmethod
+    def fit(cls, extent, size, flip=False, margin=0.02):
+        """Scale ``extent`` (min x, min y, max x, max y) into ``size`` (w, h) pixels, centred"""
+        x0, y0, x1, y1 = extent
+        width, height = size
+        span_x, span_y = max(x1 - x0, 1e-9), max(y1 - y0, 1e-9)
+        scale = min(width / span_x, height / span_y) * (1 - 2 * margin)
+        left = (width - span_x * scale) / 2
+        top = (height - span_y * scale) / 2
+        if flip:
+            return cls((scale, 0, 0, -scale, left - x0 * scale, top + y1 * scale))
+        return cls((scale, 0, 0, scale, left - x0 * scale, top - y0 * scale))
+
+    def __call__(self, x, y):
+        a, b, c, d, e, f = self.matrix
+        return round(a * x + c * y + e), round(b * x + d * y + f)
+
+    def then(self, other):
+        """This transform followed by ``other``"""
+        a, b, c, d, e, f = self.matrix
+        A, B, C, D, E, F = other.matrix
+        return Transform((A * a + C * b, B * a + D * b, A * c + C * d, B * c + D * d,
+                          A * e + C * f + E, B * e + D * f + F))
+
+
+# ==================== SVG ====================
+_NUMBER = r"[-+]?(?:\d*\.\d+|\d+\.?)(?:[eE][-+]?\d+)?"
+_PATH_TOKEN = re.compile(rf"[MmLlHhVvZzCcSsQqTtAa]|{_NUMBER}")
+_TRANSFORM = re.compile(r"(matrix|translate|scale|rotate|skewX|skewY)\s*\(([^)]*)\)")
+# Numbers each path command consumes per repeat; curves are reduced to their end point
+_PATH_ARITY = {"M": 2, "L": 2, "H": 1, "V": 1, "Z": 0, "C": 6, "S": 4, "Q": 4, "T": 2, "A": 7}
+
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def _numbers(text):
+    return [float(v) for v in re.findall(_NUMBER, text or "")]
+
+
+def parse_svg_transform(text):
+    """``Transform`` for an SVG ``transform`` attribute"""
+    result = Transform()
+    for name, args in _TRANSFORM.findall(text or ""):
+        v = _numbers(args)
+        if name == "matrix" and len(v) == 6:
+            step = Transform(v)
+        elif name == "translate" and v:
+            step = Transform((1, 0, 0, 1, v[0], v[1] if len(v) > 1 else 0))
+        elif name == "scale" and v:
+            step = Transform((v[0], 0, 0, v[1] if len(v) > 1 else v[0], 0, 0))
+        elif name == "rotate" and v:
+            cos, sin = math.cos(math.radians(v[0])), math.sin(math.radians(v[0]))
+            cx, cy = (v[1], v[2]) if len(v) == 3 else (0, 0)
+            step = Transform((cos, sin, -sin, cos, cx - cos * cx + sin * cy, cy - sin * cx - cos * cy))
+        elif name == "skewX" and v:
+            step = Transform((1, 0, math.tan(math.radians(v[0])), 1, 0, 0))
+        elif name == "skewY" and v:
+            step = Transform((1, math.tan(math.radians(v[0])), 0, 1, 0, 0))
+        else:
+            continue
+        # Listed transforms apply right to left
+        result = step.then(result)
+    return result
+
+
+def _path_points(d):
+    """Lists of points, one per subpath, of an SVG path (curves reduced to their end points)"""
+    tokens = _PATH_TOKEN.findall(d or "")
+    x = y = start_x = start_y = 0.0
+    current, i, command = [], 0, None
+    while i < len(tokens):
+        if tokens[i].isalpha():
+            command = tokens[i]
+            i += 1
+            if command in "Zz":
+                if current:
+                    current.append((start_x, start_y))
+                    yield current
+                current, x, y = [], start_x, start_y
+                continue
+        if command is None:
+            break
+        upper = command.upper()
+        if upper == "Z":
+            break  # numbers after a closepath are an error: keep the path drawn so far
+        arity = _PATH_ARITY[upper]
+        args = tokens[i:i + arity]
+        if len(args) < arity or any(token.isalpha() for token in args):
+            break
+        i += arity
+        v = [float(a) for a in args]
+        relative = command.islower()
+        if upper == "H":
+            x = x + v[0] if relative else v[0]
+        elif upper == "V":
+            y = y + v[0] if relative else v[0]
+        else:
+            x, y = (x + v[-2], y + v[-1]) if relative else (v[-2], v[-1])
+        if upper == "M":
+            if len(current) > 1:
+                yield current
+            current, start_x, start_y = [(x, y)], x, y
+            command = "l" if relative else "L"  # further pairs are line-tos
+        else:
+            current.append((x, y))
+    if len(current) > 1:
+        yield current
+
+
+def _segments(points, transform):
+    for (x1, y1), (x2, y2) in zip(points, points[1:]):
+        a, b = transform(x1, y1), transform(x2, y2)
+        if a != b:
+            yield ("pipe", *a, *b)
+
+
+def read_svg(stream, transform=None, valve_pattern=VALVE_PATTERN, size=None, fit=False, layers=None):
+    """Entities of an SVG document (binary stream); ``fit`` maps its viewBox onto ``size``"""
+    pattern = re.compile(valve_pattern, re.I)
+    # (element, transform, on a wanted layer) of the open elements; None: not rendered
+    stack = []
+    for event, element in iterparse(stream, events=("start", "end")):
+        if event == "end":
+            stack.pop()
+            element.clear()
+            # Finished elements are not needed again: keep the parsed tree from growing
+            if stack and len(stack[-1][0]) > 1000:
+                del stack[-1][0][:]
+            continue
+        tag = _local(element.tag)
+        attrs = {_local(k): v for k, v in element.attrib.items()}
+        if not stack:
+            base = transform or Transform()
+            if fit and size:
+                box = _numbers(attrs.get("viewBox"))
+                if len(box) == 4:
+                    extent = (box[0], box[1], box[0] + box[2], box[1] + box[3])
+                else:
+                    width, height = (_numbers(attrs.get(k)) or [1.0] for k in ("width", "height"))
+                    extent = (0, 0, width[0], height[0])
+                base = Transform.fit(extent, size)
+            stack.append((element, base, not layers))
+            continue
+        _, parent, wanted = stack[-1]
+        if wanted is None or tag in NOT_RENDERED:
+            # Symbol and marker geometry is only drawn through a reference (a valve ``use``)
+            stack.append((element, parent, None))
+            continue
+        ctm = parse_svg_transform(attrs.get("transform")).then(parent)
+        # A group named like a wanted layer takes everything inside it
+        wanted = wanted or _on_svg_layer(attrs, layers)
+        stack.append((element, ctm, wanted))
+        if not wanted:
+            continue
+        if tag == "line":
+            v = [float(attrs.get(k, 0)) for k in ("x1", "y1", "x2", "y2")]
+            yield from _segments([(v[0], v[1]), (v[2], v[3])], ctm)
+        elif tag in ("polyline", "polygon"):
+            v = _numbers(attrs.get("points"))
+            points = list(zip(v[0::2], v[1::2]))
+            if tag == "polygon" and points:
+                points.append(points[0])
+            yield from _segments(points, ctm)
+        elif tag == "path":
+            for points in _path_points(attrs.get("d")):
+                yield from _segments(points, ctm)
+        elif tag == "use":
+            reference = attrs.get("href", "")
+            label = attrs.get("data-tag") or attrs.get("id") or attrs.get("label")
+            if pattern.search(reference) or (label and pattern.search(label)):
+                x, y = ctm(float(attrs.get("x", 0)), float(attrs.get("y", 0)))
+                yield ("valve", label, x, y)
+
+
+# Containers whose content is never drawn where it stands
+NOT_RENDERED = {"defs", "symbol", "marker", "clipPath", "mask", "pattern"}
+
+
+def _on_svg_layer(attrs, layers):
+    names = (attrs.get("class", ""), attrs.get("id", ""), attrs.get("label", ""))
+    return any(fnmatch(name, layer) for name in names if name for layer in layers)
+
+
+# ==================== DXF ====================
+def _dxf_pairs(stream):
+    """``(group code, value)`` pairs of an ASCII DXF text stream"""
+    readline = stream.readline
+    while True:
+        code = readline()
+        if not code:
+            return
+        value = readline()
+        try:
+            yield int(code), value.strip()
+        except ValueError:
+            continue
+
+
+def _dxf_entities(pairs):
+    """``(section, type, [(code, value)])`` for every entity / header variable, one at a time"""
+    section, kind, fields = None, None, []
+    for code, value in pairs:
+        if code == 0 or (section == "HEADER" and code == 9):
+            if kind is not None:
+                yield section, kind, fields
+            kind, fields = value, []
+            if value == "ENDSEC":
+                section, kind = None, None
+            continue
+        if code == 2 and kind == "SECTION":
+            section, kind = value, None
+            continue
+        fields.append((code, value))
+    if kind is not None:
+        yield section, kind, fields
+
+
+def _field(fields, code, default=None, cast=str):
+    for c, v in fields:
+        if c == code:
+            return cast(v)
+    return default
+
+
+def read_dxf(stream, transform=None, valve_pattern=VALVE_PATTERN, size=None, fit=False, layers=None):
+    """Entities of an ASCII DXF drawing (text stream); ``fit`` maps $EXTMIN/$EXTMAX onto ``size``"""
+    pattern = re.compile(valve_pattern, re.I)
+    transform = transform or Transform()
+    extent = {}
+    polyline = None  # (on a wanted layer, points, closed) while reading POLYLINE vertices
+    insert = None  # (block, x, y, attributes) while reading INSERT attributes
+    fitting = bool(fit and size)
+
+    def on_layer(fields):
+        return not layers or any(fnmatch(_field(fields, 8, "0"), layer) for layer in layers)
+
+    for section, kind, fields in _dxf_entities(_dxf_pairs(stream)):
+        if section == "HEADER":
+            if kind in ("$EXTMIN", "$EXTMAX"):
+                extent[kind] = (_field(fields, 10, 0.0, float), _field(fields, 20, 0.0, float))
+            continue
+        if section != "ENTITIES":
+            continue
+        if fitting:
+            if not (extent.get("$EXTMIN") and extent.get("$EXTMAX")):
+                raise ValueError("the DXF header has no $EXTMIN/$EXTMAX to fit; import without fitting "
+                                 "(with --scale/--offset/--flip-y)")
+            (x0, y0), (x1, y1) = extent["$EXTMIN"], extent["$EXTMAX"]
+            transform = Transform.fit((x0, y0, x1, y1), size, flip=True)
+            fitting = False
+        # Vertex / attribute runs belong to the entity before them
+        if kind == "VERTEX" and polyline is not None:
+            polyline[1].append((_field(fields, 10, 0.0, float), _field(fields, 20, 0.0, float)))
+            continue
+        if kind == "ATTRIB" and insert is not None:
+            insert[3].append((_field(fields, 2, ""), _field(fields, 1, "")))
+            continue
+        if polyline is not None:
+            ok, points, closed = polyline
+            if ok:
+                yield from _segments(points + points[:1] if closed else points, transform)
+            polyline = None
+        if insert is not None:
+            yield _valve_from_insert(insert, transform)
+            insert = None
+        if kind == "SEQEND":
+            continue
+
+        if kind == "LINE":
+            if on_layer(fields):
+                points = [(_field(fields, 10, 0.0, float), _field(fields, 20, 0.0, float)),
+                          (_field(fields, 11, 0.0, float), _field(fields, 21, 0.0, float))]
+                yield from _segments(points, transform)
+        elif kind == "LWPOLYLINE":
+            if on_layer(fields):
+                xs = [float(v) for c, v in fields if c == 10]
+                ys = [float(v) for c, v in fields if c == 20]
+                points = list(zip(xs, ys))
+                if _field(fields, 70, 0, int) & 1 and points:
+                    points.append(points[0])
+                yield from _segments(points, transform)
+        elif kind == "POLYLINE":
+            polyline = (on_layer(fields), [], bool(_field(fields, 70, 0, int) & 1))
+        elif kind == "INSERT":
+            block = _field(fields, 2, "")
+            if pattern.search(block) and on_layer(fields):
+                insert = (block, _field(fields, 10, 0.0, float),
+                          _field(fields, 20, 0.0, float), [])
+                if _field(fields, 66, 0, int) != 1:
+                    yield _valve_from_insert(insert, transform)
+                    insert = None
+    if polyline is not None and polyline[0]:
+        yield from _segments(polyline[1], transform)
+    if insert is not None:
+        yield _valve_from_insert(insert, transform)
+
+
+def _valve_from_insert(insert, transform):
+    block, x, y, attributes = insert
+    tag = next((value for name, value in attributes if name.upper() == "TAG" and value), None)
+    if tag is None:
+        tag = next((value for _, value in attributes if value), None)
+    return ("valve", tag, *transform(x, y))
+
+
+# ==================== CSV ====================
+def read_csv(stream, transform=None, valve_pattern=None, size=None, fit=False, layers=None):
+    """Entities of a CSV table (text stream) with a header row"""
+    transform = transform or Transform()
+    reader = csv.DictReader(stream)
+    if reader.fieldnames:
+        reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+    for row in reader:
+        if layers and not any(fnmatch(row.get("layer") or "", layer) for layer in layers):
+            continue
+        try:
+            if row.get("x1") not in (None, "") and row.get("x2") not in (None, ""):
+                a = transform(float(row["x1"]), float(row["y1"]))
+                b = transform(float(row["x2"]), float(row["y2"]))
+                if a != b:
+                    yield ("pipe", *a, *b)
+            elif row.get("x") not in (None, ""):
+                tag = row.get("tag") or row.get("id") or row.get("name")
+                yield ("valve", tag, *transform(float(row["x"]), float(row["y"])))
+        except (KeyError, TypeError, ValueError):
+            continue  # malformed row
+
+
+READERS = {"svg": read_svg, "dxf": read_dxf, "csv": read_csv}
+
+
+def detect_format(name):
+    extension = os.path.splitext(name)[1].lower().lstrip(".")
+    if extension not in READERS:
+        raise ValueError(f"unsupported drawing format {extension!r} (use {', '.join(FORMATS)})")
+    return extension
+
+
+def read_entities(stream, fmt, **options):
+    """Entities of ``stream`` (binary) in format ``fmt``"""
+    if fmt != "svg":
+        stream = io.TextIOWrapper(stream, encoding="utf-8", errors="replace", newline="")
+    return READERS[fmt](stream, **options)
+
+
+# What a bad drawing or target file raises (ParseError is a SyntaxError, not a ValueError)
+IMPORT_ERRORS = (OSError, ValueError, ParseError, csv.Error)
+
+
+# ==================== WRITING ====================
+def write_system(entities, valves_path, pipes_path, existing_valves=None, existing_pipes=None):
+    """Stream ``entities`` into the two JSON files (after any existing records); returns counts"""
+    counts = {"pipes": 0, "valves": 0, "renamed": 0}
+    tags = set()
+    suffixes = {}  # next free "-n" per duplicated tag
+    unnamed = 0
+    with open(pipes_path, 'w') as pipes_file, open(valves_path, 'w') as valves_file:
+        pipes_file.write("[")
+        valves_file.write("{")
+        first_pipe = first_valve = True
+
+        def write_pipe(pipe):
+            nonlocal first_pipe
+            pipes_file.write(("\n  " if first_pipe else ",\n  ") + json.dumps(pipe))
+            first_pipe = False
+
+        def write_valve(tag, valve):
+            nonlocal first_valve
+            tags.add(tag)
+            valves_file.write(("\n  " if first_valve else ",\n  ") + f"{json.dumps(tag)}: {json.dumps(valve)}")
+            first_valve = False
+
+        for pipe in existing_pipes or ():
+            write_pipe(pipe)
+        for tag, valve in (existing_valves or {}).items():
+            write_valve(tag, valve)
+            # Imported tags are canonical: clash-check against the canonical spelling
+            try:
+                tags.add(canonical_tag(tag))
+            except ValueError:
+                pass
+
+        for entity in entities:
+            if entity[0] == "pipe":
+                _, x1, y1, x2, y2 = entity
+                write_pipe({"x1": x1, "y1": y1, "x2": x2, "y2": y2})
+                counts["pipes"] += 1
+                continue
+            _, tag, x, y = entity
+            try:
+                tag = canonical_tag(tag)
+            except ValueError:
+                unnamed += 1
+                tag = f"V-IMP-{unnamed}"
+            if tag in tags:
+                base, n = tag, suffixes.get(tag, 2)
+                while f"{base}-{n}" in tags:
+                    n += 1
+                suffixes[base] = n + 1
+                tag = f"{base}-{n}"
+                counts["renamed"] += 1
+            write_valve(tag, {"x": x, "y": y, "state": False})
+            counts["valves"] += 1
+        pipes_file.write("\n]\n" if not first_pipe else "]\n")
+        valves_file.write("\n}\n" if not first_valve else "}\n")
+    return counts
+
+
+def import_drawing(stream, fmt, valves_path, pipes_path, append=False, **options):
+    """Import one drawing into the given JSON files (replacing them unless ``append``); returns counts"""
+    existing_valves, existing_pipes = {}, []
+    if append:
+        # Whatever cannot be read back would be lost in the swap below: refuse instead
+        for path, kind in ((valves_path, dict), (pipes_path, list)):
+            try:
+                with open(path, 'r') as f:
+                    loaded = json.load(f)
+            except FileNotFoundError:
+                loaded = kind()
+            except (OSError, ValueError) as e:
+                raise ValueError(f"cannot append to {path}: {e}") from e
+            if not isinstance(loaded, kind):
+                raise ValueError(f"cannot append to {path}: expected a JSON {'object' if kind is dict else 'list'}")
+            if kind is dict:
+                existing_valves = loaded
+            else:
+                existing_pipes = loaded
+    # Write next to the targets, then swap in, so a failed import leaves the old data intact
+    tmp_valves, tmp_pipes = f"{valves_path}.importing", f"{pipes_path}.importing"
+    try:
+        counts = write_system(read_entities(stream, fmt, **options), tmp_valves, tmp_pipes,
+                              existing_valves, existing_pipes)
+    except BaseException:
+        for path in (tmp_valves, tmp_pipes):
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+    os.replace(tmp_valves, valves_path)
+    os.replace(tmp_pipes, pipes_path)
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import pipes and valves from SVG, ASCII DXF or CSV")
+    parser.add_argument("drawing", help="input file (.svg, .dxf or .csv)")
+    parser.add_argument("--system", help="registry key: write that system's data files")
+    parser.add_argument("--pipes", help="pipes JSON to write (instead of --system)")
+    parser.add_argument("--valves", help="valves JSON to write (instead of --system)")
+    parser.add_argument("--append", action="store_true", help="keep the existing pipes and valves")
+    parser.add_argument("--fit", action="store_true", help="fit the drawing's extent onto the system's P&ID image")
+    parser.add_argument("--size", type=int, nargs=2, metavar=("W", "H"), help="raster size for --fit")
+    parser.add_argument("--scale", type=float, default=1.0, help="drawing units -> pixels")
+    parser.add_argument("--offset", type=float, nargs=2, default=(0, 0), metavar=("X", "Y"))
+    parser.add_argument("--flip-y", type=float, metavar="HEIGHT", help="mirror y (CAD y up) for this image height")
+    parser.add_argument("--layers", nargs="*", help="only these layers (glob patterns, e.g. 'PIPE*')")
+    parser.add_argument("--valve-pattern", default=VALVE_PATTERN,
+                        help="regex for valve block / symbol names (default %(default)r)")
+    args = parser.parse_args(argv)
+
+    fmt = detect_format(args.drawing)
+    size = tuple(args.size) if args.size else None
+    if args.system:
+        if args.system not in REGISTRY:
+            parser.error(f"unknown system {args.system!r}")
+        valves_path, pipes_path, png_path = (resolve(p) if p else p for p in get_system_files(args.system))
+        if args.fit and size is None and png_path and os.path.exists(png_path):
+            from PIL import Image
+            with Image.open(png_path) as image:
+                size = image.size
+    elif args.pipes and args.valves:
+        valves_path, pipes_path = args.valves, args.pipes
+    else:
+        parser.error("give --system, or both --pipes and --valves")
+    if args.fit and size is None:
+        parser.error("--fit needs --size or a system with a P&ID image")
+
+    transform = Transform.from_options(args.scale, args.offset, args.flip_y)
+    start = time.perf_counter()
+    try:
+        with open(args.drawing, 'rb') as stream:
+            counts = import_drawing(stream, fmt, valves_path, pipes_path, append=args.append, transform=transform,
+                                    valve_pattern=args.valve_pattern, size=size, fit=args.fit, layers=args.layers)
+    except IMPORT_ERRORS as e:
+        print(f"Import failed: {e}", file=sys.stderr)
+        return 1
+    print(f"Imported {counts['pipes']} pipes and {counts['valves']} valves in "
+          f"{time.perf_counter() - start:.2f} s -> {pipes_path}, {valves_path}"
+          + (f" ({counts['renamed']} duplicate tags renamed)" if counts["renamed"] else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+"""Interlocks and permissives: which valve moves the rig allows right now.
+
+A system's registry entry may carry an ``interlocks`` list.  Each rule guards
+one move of one valve and lists what must hold for it (valve tags as on the
+drawing, pipe numbers 1-based as in the rest of the registry):
+
+    {"valve": "V-102", "action": "open",
+     "closed": ["V-101"], "open": ["V-110"],
+     "flowing": [4], "not_flowing": [9], "pressurized": [7], "depressurized": [],
+     "reason": "Close drain V-101 before opening V-102"}
+
+``action`` is ``open`` (the default) or ``close``; every condition list is
+optional and all of them must hold.  A move is blocked while any of its
+rules fails, and the failing rules' reasons say why.
+
+``RuleSet`` compiles the rules of one system.  Pipe conditions become valve
+masks through the reachability index: a pipe flows when one of its feed
+valves is open, and is pressurized when it is a source or one of the
+pressure valves is open.  So every rule is a few bitmask tests on the valve
+bits, and the dependency index maps each valve bit to the rules that read
+it (a pipe is "affected" exactly when one of those valves moves).
+``InterlockState`` holds one session's rule results; on a valve change it
+re-evaluates only the rules indexed under the changed bits.
+
+A rule naming a valve or pipe the system does not have never holds, so it
+blocks its move instead of silently allowing it; ``python -m utils.lint``
+reports it.  Bulk closes (Clear All, closing an isolation plan) are
+emergency/lockout actions and are not checked.
+"""
+from utils.valve_state import TAGS, bits_of
+
+ACTIONS = ("open", "close")
+VALVE_CONDITIONS = ("closed", "open")
+PIPE_CONDITIONS = ("flowing", "not_flowing", "pressurized", "depressurized")
+
+
+def parse_rule(entry):
+    """``(tag, opening, conditions, reason)`` of one registry rule; ValueError if it is malformed
+
+    ``conditions`` maps each condition name to a tuple of tags or pipe numbers.
+    """
+    if not isinstance(entry, dict):
+        raise ValueError("a rule must be an object")
+    tag = entry.get("valve")
+    if not isinstance(tag, str) or not tag.strip():
+        raise ValueError("a rule needs the valve it guards")
+    action = entry.get("action", "open")
+    if action not in ACTIONS:
+        raise ValueError(f"action must be one of {', '.join(ACTIONS)}, not {action!r}")
+    unknown = set(entry) - {"valve", "action", "reason", *VALVE_CONDITIONS, *PIPE_CONDITIONS}
+    if unknown:
+        raise ValueError(f"unknown field(s): {', '.join(sorted(unknown))}")
+    conditions = {}
+    for name in VALVE_CONDITIONS + PIPE_CONDITIONS:
+        values = entry.get(name, ())
+        if not isinstance(values, (list, tuple)):
+            raise ValueError(f"{name} must be a list")
+        if name in VALVE_CONDITIONS:
+            if not all(isinstance(v, str) and v.strip() for v in values):
+                raise ValueError(f"{name} must list valve tags")
+            values = [v.strip() for v in values]
+        elif not all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+            raise ValueError(f"{name} must list pipe numbers")
+        conditions[name] = tuple(values)
+    if not any(conditions.values()):
+        raise ValueError("a rule needs at least one condition")
+    reason = entry.get("reason") or _describe(conditions)
+    return tag.strip(), action == "open", conditions, reason
+
+
+def _describe(conditions):
+    parts = []
+    for name, values in conditions.items():
+        if values:
+            noun = "pipe" if name in PIPE_CONDITIONS else "valve"
+            parts.append(f"{noun}{'s' if len(values) > 1 else ''} "
+                         f"{', '.join(map(str, values))} must be {name.replace('_', ' ')}")
+    return "; ".join(parts)
+
+
+class Rule:
+    """One compiled rule: holds when no ``closed`` bit and every ``opened`` bit is set,
+    and every ``anys`` mask has a set bit"""
+
+    __slots__ = ("bit", "opening", "closed", "opened", "anys", "never", "reads", "reason")
+
+    def __init__(self, bit, opening, reason):
+        self.bit, self.opening, self.reason = bit, opening, reason
+        self.closed = self.opened = self.reads = 0
+        self.anys = ()
+        self.never = False
+
+    def holds(self, bits):
+        return (not self.never and not bits & self.closed and bits & self.opened == self.opened
+                and all(bits & mask for mask in self.anys))
+
+
+class RuleSet:
+    """Compiled interlocks of one compiled system; read-only and shared"""
+
+    __slots__ = ("rules", "guards", "readers", "errors")
+
+    def __init__(self, compiled):
+        self.rules, self.errors = [], []
+        for i, entry in enumerate(compiled.config.interlocks):
+            try:
+                tag, opening, conditions, reason = parse_rule(entry)
+            except ValueError as e:
+                self.errors.append(f"interlocks[{i}]: {e}")
+                continue
+            bit = TAGS.find(tag)
+            if bit is None or not compiled.mask >> bit & 1:
+                self.errors.append(f"interlocks[{i}]: no valve {tag!r} in this system")
+                continue
+            self.rules.append(self._compile(compiled, bit, opening, conditions, reason, i))
+
+        guards, readers = {}, {}
+        for i, rule in enumerate(self.rules):
+            guards.setdefault((rule.bit, rule.opening), []).append(i)
+            for bit in bits_of(rule.reads):
+                readers.setdefault(bit, []).append(i)
+        self.guards = {key: tuple(ids) for key, ids in guards.items()}
+        self.readers = {bit: tuple(ids) for bit, ids in readers.items()}
+
+    def _compile(self, compiled, bit, opening, conditions, reason, i):
+        rule = Rule(bit, opening, reason)
+        reach, pipe_count = compiled.reach, len(compiled.model.pipes)
+        anys = []
+
+        def valve(tag):
+            pos = TAGS.find(tag)
+            if pos is None or not compiled.mask >> pos & 1:
+                self.errors.append(f"interlocks[{i}]: no valve {tag!r} in this system")
+                rule.never = True
+                return 0
+            return 1 << pos
+
+        for tag in conditions["closed"]:
+            rule.closed |= valve(tag)
+        for tag in conditions["open"]:
+            rule.opened |= valve(tag)
+        for name in PIPE_CONDITIONS:
+            for number in conditions[name]:
+                if not 1 <= number <= pipe_count:
+                    self.errors.append(f"interlocks[{i}]: no pipe {number} in this system")
+                    rule.never = True
+                    continue
+                feeds, pressure = reach.requirements(number - 1)
+                if name == "flowing":
+                    anys.append(feeds)
+                elif name == "not_flowing":
+                    rule.closed |= feeds
+                elif name == "pressurized" and pressure is not None:
+                    anys.append(pressure)
+                elif name == "depressurized":
+                    if pressure is None:
+                        rule.never = True  # a source is always pressurized
+                    else:
+                        rule.closed |= pressure
+        if 0 in anys:
+            rule.never = True  # no valve makes that pipe flow / pressurizes it
+        rule.anys = tuple(anys)
+        rule.reads = rule.closed | rule.opened
+        for mask in anys:
+            rule.reads |= mask
+        return rule
+
+    def __len__(self):
+        return len(self.rules)
+
+
+class InterlockState:
+    """One session's rule results, kept current by re-evaluating only the rules a change reads"""
+
+    __slots__ = ("rules", "bits", "failing")
+
+    def __init__(self, rules, bits):
+        self.rules = rules
+        self.bits = bits
+        self.failing = {i for i, rule in enumerate(rules.rules) if not rule.holds(bits)}
+
+    def update(self, bits):
+        """Bring the results up to ``bits``; returns how many rules were re-evaluated"""
+        xor = bits ^ self.bits
+        self.bits = bits
+        if not xor:
+            return 0
+        readers, rules, failing = self.rules.readers, self.rules.rules, self.failing
+        touched = set()
+        for bit in bits_of(xor):
+            touched.update(readers.get(bit, ()))
+        for i in touched:
+            if rules[i].holds(bits):
+                failing.discard(i)
+            else:
+                failing.add(i)
+        return len(touched)
+
+    def reasons(self, bit, opening):
+        """Reasons of the failing rules guarding this move (empty: the move is allowed)"""
+        rules = self.rules.rules
+        return [rules[i].reason for i in self.rules.guards.get((bit, opening), ()) if i in self.failing]
+
+    def blocked(self, bit, opening):
+        return any(i in self.failing for i in self.rules.guards.get((bit, opening), ()))
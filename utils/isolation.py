@@ -0,0 +1,280 @@
+"""Isolation planner for lockout/tagout: the fewest valves that cut a pipe off.
+
+The solver's pressure model is global (one open source valve pressurizes
+every pipe), so isolation is planned on the physical network instead:
+
+* pipes are nodes, joined where an end of one meets another pipe on the
+  drawing (within ``END_TOLERANCE``) and from each group leader to its
+  members (``groups`` in the registry);
+* the valves leading a pipe (``Topology.leaders``: near its start, or bound
+  to it) sit between that pipe and whatever meets its start: every valve is
+  a node of capacity 1, every pipe and joint is uncuttable;
+* the registry's ``pressure_sources`` pipes hang off a super source.
+
+The minimum valve cut between the sources and the selected pipe is a
+max-flow / min-cut (Dinic) on that network.  Alternatives come from cutting
+again with valves of earlier plans barred (Lawler-style), ranked by valve
+count, and every plan is verified by re-propagating pressure through the
+network with its valves closed and all other valves open; the pipes that
+propagation reaches are the section the plan isolates.
+
+That verification runs on this same network, not through
+``utils.solver.solve``: with its global pressure model any open source
+valve pressurizes every pipe, so the solver cannot tell an isolated
+section from a live one.  A plan is therefore only as right as the
+network's joints (drawn ends within ``END_TOLERANCE``, groups, leaders);
+``python -m utils.lint`` reports the dangling ends that would break one.
+
+Flow is pushed from the selection towards the sources and every search
+stops at the sources' depth, so a query only explores the neighbourhood
+of the selection and stays interactive on rigs with thousands of valves.
+"""
+from collections import deque
+
+from utils.lint import END_TOLERANCE
+from utils.spatial import SpatialIndex
+from utils.valve_state import TAGS, bits_of
+
+INF = 1 << 60
+PRESSURE = 0  # node joined to every pressure source pipe
+
+
+class IsolationNetwork:
+    """Pipe/valve flow network of one compiled system; read-only and shared"""
+
+    __slots__ = ("pipe_count", "sources", "to", "cap", "out", "valve_arc", "valve_node", "valve_at")
+
+    def __init__(self, compiled, tolerance=END_TOLERANCE):
+        model, topology, config = compiled.model, compiled.topology, compiled.config
+        pipes = model.pipes
+        self.pipe_count = len(pipes)
+        self.to, self.cap, self.out = [], [], []
+        self._node()  # PRESSURE
+        pipe_node = [self._node() for _ in pipes]
+        self.valve_arc, self.valve_node, self.valve_at = {}, {}, {}
+
+        # A led pipe gets a hub at its start; its valves connect hub and pipe
+        hub = {}
+        for pipe_id, mask in topology.leaders:
+            bits = list(bits_of(mask & compiled.mask))
+            if not bits:
+                continue  # bound only to valves this system does not have
+            hub[pipe_id] = self._node()
+            for bit in bits:
+                if bit not in self.valve_node:
+                    inside, outside = self._node(), self._node()
+                    self.valve_node[bit] = (inside, outside)
+                    self.valve_at[inside] = bit
+                    self.valve_arc[bit] = self._arc(inside, outside, 1)
+                self._join(hub[pipe_id], bit, pipe_node[pipe_id])
+
+        def side(pipe_id, x, y):
+            """The pipe's node, or its hub when (x, y) is at the start of a led pipe"""
+            pipe = pipes[pipe_id]
+            if pipe_id in hub and abs(pipe.x1 - x) <= tolerance and abs(pipe.y1 - y) <= tolerance:
+                return hub[pipe_id]
+            return pipe_node[pipe_id]
+
+        # Cells sized for the joint search (the shared index is tuned for click hit-tests)
+        index = SpatialIndex([], [(p.x1, p.y1, p.x2, p.y2) for p in pipes], cell=max(8, 2 * int(tolerance)))
+        joined = set()
+        for pipe in pipes:
+            for x, y in ((pipe.x1, pipe.y1), (pipe.x2, pipe.y2)):
+                for _, other in index.segments_within(x, y, tolerance):
+                    if other == pipe.id:
+                        continue
+                    a, b = side(pipe.id, x, y), side(other, x, y)
+                    if a != b and (a, b) not in joined:
+                        joined.update(((a, b), (b, a)))
+                        self._link(a, b)
+        for leader, members in topology.groups:
+            for member in bits_of(members):
+                if member != leader:
+                    self._link(pipe_node[leader], hub.get(member, pipe_node[member]))
+
+        self.sources = [n - 1 for n in config.pressure_sources if 1 <= n <= len(pipes)]
+        for pipe_id in self.sources:
+            self._link(PRESSURE, pipe_node[pipe_id])
+
+    # ---- construction ----
+    def _node(self):
+        self.out.append([])
+        return len(self.out) - 1
+
+    def _arc(self, a, b, capacity):
+        """Arc a -> b plus its residual twin (arc ids ``i`` and ``i ^ 1``)"""
+        arc = len(self.to)
+        self.to += [b, a]
+        self.cap += [capacity, 0]
+        self.out[a].append(arc)
+        self.out[b].append(arc + 1)
+        return arc
+
+    def _link(self, a, b):
+        self._arc(a, b, INF)
+        self._arc(b, a, INF)
+
+    def _join(self, a, bit, b):
+        """a and b connected through the valve ``bit`` in both directions"""
+        inside, outside = self.valve_node[bit]
+        for x, y in ((a, b), (b, a)):
+            self._arc(x, inside, INF)
+            self._arc(outside, y, INF)
+
+    # ---- max flow ----
+    # Flow runs from the selected pipes out to PRESSURE, with the residual
+    # network, levels and arc pointers in dicts: a search only touches the
+    # nodes around the selection, never the whole rig.
+    def _levels(self, residual, starts):
+        """Dinic levels from ``starts``, explored no deeper than PRESSURE; None if it is out of reach"""
+        level = dict.fromkeys(starts, 0)
+        queue = deque(starts)
+        to, out = self.to, self.out
+        depth = None
+        while queue:
+            u = queue.popleft()
+            if depth is not None and level[u] + 1 >= depth:
+                continue
+            for arc in out[u]:
+                v = to[arc]
+                if v not in level and residual(arc) > 0:
+                    level[v] = level[u] + 1
+                    if v == PRESSURE:
+                        depth = level[v]
+                    else:
+                        queue.append(v)
+        return level if depth is not None else None
+
+    def _augment(self, residual, flow, level, next_arc, start):
+        """Push one path of the level graph from ``start`` to PRESSURE; returns its flow (0 if none)"""
+        to, out = self.to, self.out
+        stack, path = [start], []
+        while stack:
+            u = stack[-1]
+            if u == PRESSURE:
+                pushed = min(residual(arc) for arc in path)
+                for arc in path:
+                    flow[arc] = flow.get(arc, 0) + pushed
+                    flow[arc ^ 1] = flow.get(arc ^ 1, 0) - pushed
+                return pushed
+            arcs = out[u]
+            i = next_arc.get(u, 0)
+            while i < len(arcs) and not (residual(arcs[i]) > 0 and level.get(to[arcs[i]], -1) == level[u] + 1):
+                i += 1
+            next_arc[u] = i
+            if i == len(arcs):
+                level[u] = -1  # dead end for this phase
+                stack.pop()
+                if path:
+                    path.pop()
+                continue
+            stack.append(to[arcs[i]])
+            path.append(arcs[i])
+        return 0
+
+    def min_cut(self, pipe_ids, barred=()):
+        """``(valve bits, flow)`` of a minimum cut between ``pipe_ids`` and the pressure sources
+
+        ``barred`` valves may not be closed.  ``flow >= INF`` means no valve
+        cut exists (a path with no valve, or only barred ones).
+        """
+        starts = [pipe_id + 1 for pipe_id in pipe_ids]
+        cap = self.cap
+        base = {self.valve_arc[bit]: INF for bit in barred if bit in self.valve_arc}
+        flow = {}
+
+        def residual(arc):
+            return base.get(arc, cap[arc]) - flow.get(arc, 0)
+
+        total = 0
+        while total < INF:
+            level = self._levels(residual, starts)
+            if level is None:
+                break
+            next_arc = {}
+            for start in starts:
+                while total < INF:
+                    pushed = self._augment(residual, flow, level, next_arc, start)
+                    if not pushed:
+                        break
+                    total += pushed
+        if total >= INF:
+            return [], total
+        # Valves whose inside the selection still reaches in the residual network, but not their outside
+        seen = self._spread(starts, lambda arc: residual(arc) > 0)
+        cut = [self.valve_at[node] for node in seen
+               if node in self.valve_at and self.valve_node[self.valve_at[node]][1] not in seen]
+        return sorted(cut), total
+
+    def _spread(self, starts, passable):
+        seen = set(starts)
+        queue = deque(starts)
+        to, out = self.to, self.out
+        while queue:
+            u = queue.popleft()
+            for arc in out[u]:
+                v = to[arc]
+                if v not in seen and passable(arc):
+                    seen.add(v)
+                    queue.append(v)
+        return seen
+
+    def section(self, pipe_ids, closed_mask):
+        """Pipe IDs cut off together with ``pipe_ids`` when the valves of ``closed_mask`` are closed
+        (and all others open), or None if pressure still reaches them"""
+        closed = {self.valve_arc[bit] for bit in bits_of(closed_mask) if bit in self.valve_arc}
+        cap = self.cap
+        seen = self._spread([pipe_id + 1 for pipe_id in pipe_ids],
+                            lambda arc: cap[arc] > 0 and arc not in closed)
+        if PRESSURE in seen:
+            return None
+        return sorted(node - 1 for node in seen if 1 <= node <= self.pipe_count)
+
+
+def plan_isolation(compiled, pipe_ids, alternatives=5, max_cuts=None):
+    """Isolation plans for the pipes ``pipe_ids`` (0-based IDs)
+
+    Returns ``{"plans": [{"valves", "mask", "count", "verified", "section"}], "message"}``
+    with the plans sorted by valve count (the first is a minimum cut);
+    ``message`` says why there is no plan, else it is None.
+    """
+    pipe_ids = sorted(set(pipe_ids))
+    network = compiled.isolation
+    numbers = ", ".join(str(pipe_id + 1) for pipe_id in pipe_ids)
+    if not network.sources:
+        return {"plans": [], "message": "The system has no pressure source pipes"}
+    sources = set(network.sources).intersection(pipe_ids)
+    if sources:
+        return {"plans": [], "message": f"Pipe {min(sources) + 1} is a pressure source and cannot be isolated"}
+
+    plans, tried, queue = [], set(), deque([frozenset()])
+    max_cuts = max_cuts or 4 * alternatives
+    found = set()
+    while queue and len(plans) < alternatives and len(tried) < max_cuts:
+        barred = queue.popleft()
+        if barred in tried:
+            continue
+        tried.add(barred)
+        cut, flow = network.min_cut(pipe_ids, barred)
+        if flow >= INF:
+            if not plans and not barred:
+                return {"plans": [], "message": f"Pipe {numbers} reaches a pressure source without passing a valve"}
+            continue
+        if not cut:
+            if not barred:
+                return {"plans": [], "message": f"Pipe {numbers} is not connected to a pressure source"}
+            continue
+        key = tuple(cut)
+        if key not in found:
+            found.add(key)
+            mask = 0
+            for bit in cut:
+                mask |= 1 << bit
+            # Re-propagate with this plan's valves closed and everything else open
+            section = network.section(pipe_ids, mask)
+            plans.append({"valves": [TAGS.tags[bit] for bit in cut], "mask": mask, "count": len(cut),
+                          "verified": section is not None, "section": section or []})
+        for bit in cut:
+            queue.append(barred | {bit})
+    plans.sort(key=lambda plan: (not plan["verified"], plan["count"]))
+    return {"plans": plans, "message": None}
@@ -0,0 +1,292 @@
+"""Topology linter for the system data.
+
+Bad data only shows up at runtime as wrong colours.  ``lint_system`` reads
+one system's raw JSON (before ``build_model`` normalizes or rejects it) and
+its registry entry, builds a ``SpatialIndex`` over the pipes, and checks
+every rule in one pass with O(1) average neighbourhood queries:
+
+================  ========  ==================================================
+rule              severity  finding
+================  ========  ==================================================
+missing-file      error     a registered valves / pipes / PNG / page file is absent
+invalid-data      error     unreadable JSON or a malformed valve or pipe record
+duplicate-tag     error     the same tag twice in the valves file
+case-variant-tag  error     tags that differ only in case (``v-101`` / ``V-101``)
+unknown-tag       error     a ``valve_bindings`` tag with no valve in the data
+tag-case          warning   a bound tag spelled in another case in the data
+bad-pipe-number   error     a source, group or binding names a pipe that does not exist
+bad-interlock     error     a malformed interlock rule, or one naming a missing valve or pipe
+off-image         error     a valve or pipe end outside the P&ID image
+zero-length-pipe  warning   a pipe whose ends coincide
+dangling-end      warning   a pipe end that meets no other pipe
+orphan-valve      warning   a valve farther than ``valve_reach`` from every pipe
+inert-valve       warning   a valve that leads no pipe and is bound to none
+================  ========  ==================================================
+
+Findings are plain dicts (``system, rule, severity, item, message`` and
+``x, y`` where there is a position), so they serialize as they are.  Warm-up
+lints every system next to compiling it; from the shell all systems are
+linted in parallel:
+
+    python -m utils.lint                  # text report, exit 1 on errors
+    python -m utils.lint return --json -  # findings as JSON on stdout
+"""
+import argparse
+import json
+import os
+import struct
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.interlocks import parse_rule
+from utils.model import canonical_tag
+from utils.spatial import SpatialIndex
+from utils.systems import REGISTRY, ROOT, get_config, resolve
+
+SEVERITY = {
+    "missing-file": "error",
+    "invalid-data": "error",
+    "duplicate-tag": "error",
+    "case-variant-tag": "error",
+    "unknown-tag": "error",
+    "tag-case": "warning",
+    "bad-pipe-number": "error",
+    "bad-interlock": "error",
+    "off-image": "error",
+    "zero-length-pipe": "warning",
+    "dangling-end": "warning",
+    "orphan-valve": "warning",
+    "inert-valve": "warning",
+}
+END_TOLERANCE = 6  # px between pipe ends (or an end and a pipe) that still meet
+VALVE_REACH = 60  # px from a valve to the nearest pipe
+
+
+def _finding(system, rule, item, message, x=None, y=None):
+    finding = {"system": system, "rule": rule, "severity": SEVERITY[rule], "item": item, "message": message}
+    if x is not None:
+        finding["x"], finding["y"] = x, y
+    return finding
+
+
+def png_size(path):
+    """``(width, height)`` from a PNG header, or None if the file is not a PNG"""
+    with open(path, 'rb') as f:
+        header = f.read(24)
+    if header[:8] != b"\x89PNG\r\n\x1a\n" or header[12:16] != b"IHDR":
+        return None
+    return struct.unpack(">II", header[16:24])
+
+
+def _number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _load_valves(path, emit):
+    """``[(raw tag, record)]`` in file order, duplicates kept"""
+    try:
+        with open(path, 'r') as f:
+            # Pairs, not a dict: json.load would silently keep only the last duplicate
+            pairs = json.load(f, object_pairs_hook=lambda pairs: pairs)
+    except ValueError as e:
+        emit("invalid-data", "valves", f"unreadable valves JSON: {e}")
+        return []
+    if not isinstance(pairs, list) or any(not isinstance(p, tuple) for p in pairs):
+        emit("invalid-data", "valves", "valves must be an object of tag -> {x, y}")
+        return []
+    valves = []
+    for tag, record in pairs:
+        if isinstance(record, list) and all(isinstance(p, tuple) for p in record):
+            record = dict(record)
+        if not isinstance(record, dict) or not (_number(record.get("x")) and _number(record.get("y"))):
+            emit("invalid-data", f"valve {tag}", f"valve {tag!r} needs numeric x and y")
+            continue
+        valves.append((tag, record))
+    return valves
+
+
+def _load_pipes(path, emit):
+    try:
+        with open(path, 'r') as f:
+            raw = json.load(f)
+    except ValueError as e:
+        emit("invalid-data", "pipes", f"unreadable pipes JSON: {e}")
+        return []
+    if not isinstance(raw, list):
+        emit("invalid-data", "pipes", "pipes must be a list of {x1, y1, x2, y2}")
+        return []
+    pipes = []
+    for i, record in enumerate(raw):
+        if isinstance(record, dict) and all(_number(record.get(k)) for k in ("x1", "y1", "x2", "y2")):
+            pipes.append((record["x1"], record["y1"], record["x2"], record["y2"]))
+        else:
+            emit("invalid-data", f"pipe {i + 1}", f"pipe {i + 1} needs numeric x1, y1, x2, y2")
+            pipes.append(None)  # keep the numbering the registry refers to
+    return pipes
+
+
+def lint_system(system_name, end_tolerance=END_TOLERANCE, valve_reach=VALVE_REACH):
+    """Findings for one registered system, errors first"""
+    config = get_config(system_name)
+    findings = []
+
+    def emit(rule, item, message, x=None, y=None):
+        findings.append(_finding(system_name, rule, item, message, x, y))
+
+    # Files
+    paths = {"valves": config.valves, "pipes": config.pipes, "png": config.png}
+    if config.page:
+        paths["page"] = os.path.join("page", config.page)
+    present = {}
+    for kind, path in paths.items():
+        present[kind] = bool(path) and os.path.exists(os.path.join(ROOT, path))
+        if not present[kind]:
+            emit("missing-file", kind, f"{kind} file not found: {path}")
+    valves = _load_valves(resolve(config.valves), emit) if present["valves"] else []
+    pipes = _load_pipes(resolve(config.pipes), emit) if present["pipes"] else []
+    size = png_size(resolve(config.png)) if present["png"] else None
+
+    # Tags
+    spellings = {}
+    for tag, _ in valves:
+        try:
+            spellings.setdefault(canonical_tag(tag), []).append(tag)
+        except ValueError:
+            emit("invalid-data", f"valve {tag!r}", f"invalid valve tag {tag!r}")
+    for canonical, raw in spellings.items():
+        exact = {t for t in raw if raw.count(t) > 1}
+        for tag in sorted(exact):
+            emit("duplicate-tag", f"valve {tag}", f"tag {tag!r} appears {raw.count(tag)} times")
+        if len(set(raw)) > 1:
+            emit("case-variant-tag", f"valve {canonical}",
+                 f"tags differ only in case: {', '.join(sorted(set(raw)))}")
+    bound = set()
+    for tag, number in config.valve_bindings.items():
+        try:
+            canonical = canonical_tag(tag)
+        except ValueError:
+            emit("invalid-data", f"binding {tag!r}", f"valve_bindings has an invalid tag {tag!r}")
+            continue
+        bound.add(canonical)
+        raw = spellings.get(canonical)
+        if raw is None:
+            emit("unknown-tag", f"binding {tag}", f"valve_bindings names {tag!r}, which is not in {config.valves}")
+        elif tag not in raw:
+            emit("tag-case", f"binding {tag}", f"valve_bindings names {tag!r}; the data spells it {raw[0]!r}")
+
+    # Pipe numbers in the registry
+    count = len(pipes)
+    references = [("pressure_sources", n) for n in config.pressure_sources]
+    for leader, members in config.groups.items():
+        references += [(f"groups[{leader}]", n) for n in (leader, *members)]
+    references += [(f"valve_bindings[{tag}]", n) for tag, n in config.valve_bindings.items()]
+    if present["pipes"]:
+        for where, n in references:
+            if not 1 <= n <= count:
+                emit("bad-pipe-number", where, f"{where} refers to pipe {n}; the system has {count} pipes")
+
+    # Interlock rules
+    for i, entry in enumerate(config.interlocks):
+        where = f"interlocks[{i}]"
+        try:
+            tag, _, conditions, _ = parse_rule(entry)
+        except ValueError as e:
+            emit("bad-interlock", where, f"{where}: {e}")
+            continue
+        for name in (tag, *conditions["closed"], *conditions["open"]):
+            if canonical_tag(name) not in spellings:
+                emit("bad-interlock", where, f"{where} names valve {name!r}, which is not in {config.valves}")
+        if present["pipes"]:
+            for name in ("flowing", "not_flowing", "pressurized", "depressurized"):
+                for n in conditions[name]:
+                    if not 1 <= n <= count:
+                        emit("bad-interlock", where, f"{where} {name} refers to pipe {n}; the system has {count} pipes")
+
+    # Geometry
+    segments = [p for p in pipes if p is not None]
+    numbers = [i + 1 for i, p in enumerate(pipes) if p is not None]
+    # Cells sized for the end check, the most frequent query; the wider ones stop at their first hit
+    index = SpatialIndex([(p[0], p[1]) for p in segments], segments, cell=max(8, 2 * int(end_tolerance)))
+    if size is not None:
+        width, height = size
+        for tag, record in valves:
+            if not (0 <= record["x"] < width and 0 <= record["y"] < height):
+                emit("off-image", f"valve {tag}", f"valve {tag} lies outside the {width}x{height} image",
+                     record["x"], record["y"])
+        for n, (x1, y1, x2, y2) in zip(numbers, segments):
+            if not all(0 <= x < width and 0 <= y < height for x, y in ((x1, y1), (x2, y2))):
+                emit("off-image", f"pipe {n}", f"pipe {n} runs outside the {width}x{height} image", x1, y1)
+
+    for i, (n, (x1, y1, x2, y2)) in enumerate(zip(numbers, segments)):
+        if (x1, y1) == (x2, y2):
+            emit("zero-length-pipe", f"pipe {n}", f"pipe {n} has zero length", x1, y1)
+            continue
+        for label, x, y in (("start", x1, y1), ("end", x2, y2)):
+            if not index.any_segment_within(x, y, end_tolerance, exclude=i):
+                emit("dangling-end", f"pipe {n} {label}",
+                     f"pipe {n} {label} meets no other pipe within {end_tolerance} px", x, y)
+
+    for tag, record in valves:
+        x, y = record["x"], record["y"]
+        if not index.any_segment_within(x, y, valve_reach):
+            emit("orphan-valve", f"valve {tag}", f"valve {tag} is more than {valve_reach:g} px from any pipe", x, y)
+        elif not index.any_point_within(x, y, config.leader_radius) and tag.strip().upper() not in bound:
+            emit("inert-valve", f"valve {tag}",
+                 f"valve {tag} is not within {config.leader_radius:g} px of a pipe start and is not bound", x, y)
+
+    findings.sort(key=lambda f: f["severity"] != "error")
+    return findings
+
+
+def lint_all(systems=None, **options):
+    """``{system: findings}`` for ``systems`` (default: all registered), linted in parallel"""
+    systems = list(REGISTRY) if systems is None else list(systems)
+    with ThreadPoolExecutor(max_workers=min(8, len(systems) or 1)) as pool:
+        return dict(zip(systems, pool.map(lambda name: lint_system(name, **options), systems)))
+
+
+def summary(findings):
+    """``{"error": n, "warning": n}``"""
+    counts = {"error": 0, "warning": 0}
+    for finding in findings:
+        counts[finding["severity"]] += 1
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Lint the valve and pipe data of every system")
+    parser.add_argument("systems", nargs="*", help="registry keys (default: all)")
+    parser.add_argument("--end-tolerance", type=float, default=END_TOLERANCE,
+                        help="gap (px) at which pipe ends still meet")
+    parser.add_argument("--valve-reach", type=float, default=VALVE_REACH,
+                        help="largest distance (px) from a valve to a pipe")
+    parser.add_argument("--json", metavar="PATH", help="write the findings as JSON ('-' for stdout)")
+    parser.add_argument("--errors-only", action="store_true", help="leave out warnings")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.systems if name not in REGISTRY]
+    if unknown:
+        parser.error(f"unknown system(s): {', '.join(unknown)}")
+
+    results = lint_all(args.systems or None, end_tolerance=args.end_tolerance, valve_reach=args.valve_reach)
+    if args.errors_only:
+        results = {name: [f for f in findings if f["severity"] == "error"] for name, findings in results.items()}
+    if args.json:
+        findings = [f for system_findings in results.values() for f in system_findings]
+        if args.json == "-":
+            json.dump(findings, sys.stdout, indent=2)
+            print()
+        else:
+            with open(args.json, 'w') as f:
+                json.dump(findings, f, indent=2)
+    if args.json != "-":
+        for name, findings in results.items():
+            counts = summary(findings)
+            print(f"{name:<8} {counts['error']:>4} errors {counts['warning']:>4} warnings")
+            for f in findings:
+                where = f" at ({f['x']}, {f['y']})" if "x" in f else ""
+                print(f"    {f['severity']:<7} {f['rule']:<16} {f['message']}{where}")
+    return 1 if any(f["severity"] == "error" for findings in results.values() for f in findings) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
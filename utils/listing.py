@@ -0,0 +1,164 @@
+"""Filterable, paginated valve and pipe lists for the control sidebars.
+
+Only the visible page of a list is turned into widgets.  The filtering by
+tag prefix and drawing region is cached per system and file stamp, so a rerun
+that does not change the filters does no list-building work; the open/closed
+filter is applied afterwards because it depends on live valve state.
+"""
+from functools import lru_cache
+
+from utils.metrics import METRICS
+
+PAGE_SIZE = 15
+STATES = ("All", "Open", "Closed")
+REGIONS = ("All", "Top left", "Top", "Top right", "Left", "Center", "Right",
+           "Bottom left", "Bottom", "Bottom right")
+
+
+def region_of(x, y, width, height):
+    """Name of the 3x3 drawing region that contains (x, y)"""
+    col = min(2, max(0, int(3 * x / width))) if width else 1
+    row = min(2, max(0, int(3 * y / height))) if height else 1
+    return REGIONS[1 + row * 3 + col]
+
+
+def _size(compiled):
+    return compiled.image.size if compiled.image is not None else (0, 0)
+
+
+class _SystemKey:
+    """Cache key for a compiled system, equal by ``(name, stamp)``
+
+    It lends the system to the cached function for one miss and then lets
+    go of it, so the caches never keep a recompiled or evicted system (and
+    its decoded drawing) alive.
+    """
+
+    __slots__ = ("key", "compiled")
+
+    def __init__(self, compiled):
+        self.key = (compiled.name, compiled.stamp)
+        self.compiled = compiled
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+    def take(self):
+        compiled, self.compiled = self.compiled, None
+        return compiled
+
+
+def filter_valves(compiled, prefix="", region="All"):
+    """Valve IDs whose tag starts with ``prefix`` (any case) and that lie in ``region``"""
+    return _filter_valves(_SystemKey(compiled), prefix, region)
+
+
+def filter_pipes(compiled, prefix="", region="All"):
+    """Pipe IDs whose label ("Pipe N") starts with ``prefix`` and whose midpoint lies in ``region``"""
+    return _filter_pipes(_SystemKey(compiled), prefix, region)
+
+
+@lru_cache(maxsize=256)
+def _filter_valves(key, prefix, region):
+    compiled = key.take()
+    prefix = prefix.strip().upper()
+    width, height = _size(compiled)
+    return tuple(
+        v.id for v in compiled.model.valves
+        if v.tag.startswith(prefix)
+        and (region == "All" or region_of(v.x, v.y, width, height) == region)
+    )
+
+
+@lru_cache(maxsize=256)
+def _filter_pipes(key, prefix, region):
+    compiled = key.take()
+    prefix = prefix.strip().lower()
+    labels = pipe_labels(len(compiled.model.pipes))
+    width, height = _size(compiled)
+    return tuple(
+        p.id for p in compiled.model.pipes
+        if (labels[p.id].lower().startswith(prefix) or str(p.id + 1).startswith(prefix))
+        and (region == "All" or region_of((p.x1 + p.x2) / 2, (p.y1 + p.y2) / 2, width, height) == region)
+    )
+
+
+def filter_state(ids, is_open, state="All"):
+    """Keep IDs whose ``is_open(id)`` matches ``state`` ("All", "Open", "Closed")"""
+    if state == "All":
+        return ids
+    want = state == "Open"
+    return tuple(i for i in ids if is_open(i) == want)
+
+
+@lru_cache(maxsize=64)
+def pipe_labels(count):
+    return tuple(f"Pipe {i+1}" for i in range(count))
+
+
+def page_slice(ids, page, page_size=PAGE_SIZE):
+    """``(visible_ids, page, pages)`` with ``page`` clamped to the valid range"""
+    pages = max(1, -(-len(ids) // page_size))
+    page = min(max(1, page), pages)
+    start = (page - 1) * page_size
+    return ids[start:start + page_size], page, pages
+
+
+CACHES = {"filter_valves": _filter_valves, "filter_pipes": _filter_pipes, "pipe_labels": pipe_labels}
+
+
+def cached_lists():
+    """Entries currently held by the list caches"""
+    return sum(fn.cache_info().currsize for fn in CACHES.values())
+
+
+def clear_filters():
+    _filter_valves.cache_clear()
+    _filter_pipes.cache_clear()
+
+
+def _cache_lookups():
+    lookups = {}
+    for name, fn in CACHES.items():
+        info = fn.cache_info()
+        lookups[(name, "hit")] = info.hits
+        lookups[(name, "miss")] = info.misses
+    return lookups
+
+
+# A gauge, not a counter: eviction (utils.memory) clears the caches and their stats
+METRICS.gauge("rig_list_cache_lookups", "List filter cache lookups since the cache was last cleared",
+              _cache_lookups, ("cache", "result"))
+
+
+# ==================== STREAMLIT WIDGETS ====================
+def list_filters(key, states=True):
+    """Prefix / state / region filter widgets; returns ``(prefix, state, region)``"""
+    import streamlit as st
+
+    prefix = st.text_input("🔎 Filter", key=f"{key}_prefix", placeholder="Tag or number prefix")
+    cols = st.columns(2 if states else 1)
+    state = "All"
+    if states:
+        with cols[0]:
+            state = st.selectbox("State", STATES, key=f"{key}_state")
+    with cols[-1]:
+        region = st.selectbox("Region", REGIONS, key=f"{key}_region")
+    return prefix, state, region
+
+
+def pager(ids, key, page_size=PAGE_SIZE):
+    """Show a page picker for ``ids`` and return only the visible slice"""
+    import streamlit as st
+
+    pages = max(1, -(-len(ids) // page_size))
+    page = 1
+    if pages > 1:
+        page = st.selectbox("Page", range(1, pages + 1), key=f"{key}_page",
+                            format_func=lambda p: f"{p} / {pages}")
+    visible, page, pages = page_slice(ids, page, page_size)
+    st.caption(f"Showing {len(visible)} of {len(ids)}")
+    return visible
@@ -0,0 +1,319 @@
+"""Memory accounting for sessions and the shared caches, with soft-limit eviction.
+
+``deep_sizeof`` estimates retained object sizes; pages sample each
+session's footprint (``sample_session``, at most every few seconds so a
+valve click does not walk the whole session) and the admin view
+(``utils/admin.py``, the dashboard's Memory button) combines them with the
+cache breakdown, the process RSS and optional tracemalloc snapshots into
+``memory_report()``.  When RSS passes the soft limit, ``enforce_limits``
+drops caches cheapest-first: list filters, encoded frames, the profiling
+ring, then the least recently used compiled systems (they recompile on
+next use) until RSS is back under the limit.
+"""
+import gc
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+from utils.metrics import METRICS
+
+
+def deep_sizeof(obj, seen=None, stop=()):
+    """Approximate retained size of ``obj`` in bytes, following containers and __slots__
+
+    Instances of the ``stop`` types count as 0 and are not followed.
+    """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen or (stop and isinstance(obj, stop)):
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None))):
+        return size
+    # Decoded images keep their pixel buffer outside the Python object
+    if hasattr(obj, "getbands") and hasattr(obj, "size"):
+        width, height = obj.size
+        return size + width * height * len(obj.getbands())
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen, stop) + deep_sizeof(v, seen, stop) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen, stop) for item in obj)
+    else:
+        for cls in type(obj).__mro__:
+            for slot in cls.__dict__.get("__slots__", ()):
+                if hasattr(obj, slot):
+                    size += deep_sizeof(getattr(obj, slot), seen, stop)
+        if hasattr(obj, "__dict__"):
+            size += deep_sizeof(vars(obj), seen, stop)
+    return size
+
+
+def _shared_types():
+    """Process-wide objects a session only refers to; the cache breakdown counts them"""
+    from utils.interlocks import RuleSet
+    from utils.isolation import IsolationNetwork
+    from utils.reachability import Reachability
+    from utils.rig_bus import RigStateService
+    from utils.shared import CompiledSystem
+    from utils.valve_state import TagRegistry
+
+    return RigStateService, CompiledSystem, RuleSet, Reachability, IsolationNetwork, TagRegistry
+
+
+def session_footprint(session_state):
+    """Bytes held by one session: ``{key: bytes}`` plus a ``"total"`` entry"""
+    sizes = {}
+    seen = set()
+    stop = _shared_types()
+    for key in list(session_state.keys()):
+        try:
+            sizes[str(key)] = deep_sizeof(session_state[key], seen, stop)
+        except Exception:
+            continue
+    sizes["total"] = sum(sizes.values())
+    return sizes
+
+
+# ==================== PROCESS-WIDE ACCOUNTING ====================
+# Pages report their session footprint here after each run, so the admin
+# page can list every live session without reaching into Streamlit's
+# runtime.  Entries not refreshed for SESSION_TTL seconds are dropped.
+SESSION_TTL = 3600
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+SESSION_SOFT_LIMIT = int(os.environ.get("RIG_SESSION_SOFT_LIMIT_KB", "1024")) * 1024
+FOOTPRINT_INTERVAL = 10.0  # seconds between footprint samples of one session
+
+_lock = threading.Lock()
+_sessions = {}  # session id -> (monotonic time, system, {key: bytes})
+EVICTIONS = deque(maxlen=100)  # (time, reason, what)
+EVICTION_PASSES = METRICS.counter("rig_evictions", "Memory eviction passes (soft limit or manual)")
+_last_check = 0.0
+
+
+def record_session(session_id, system_name, sizes):
+    with _lock:
+        _sessions[session_id] = (time.monotonic(), system_name, sizes)
+
+
+def sample_session(session_state, session_id, system_name, interval=FOOTPRINT_INTERVAL):
+    """This session's footprint, measured again only when the last sample is ``interval`` s old
+
+    Over ``SESSION_SOFT_LIMIT`` the leftovers of other systems are trimmed
+    first.  Between samples the recorded sizes are returned as they are.
+    """
+    with _lock:
+        entry = _sessions.get(session_id)
+    if entry is not None and entry[1] == system_name and time.monotonic() - entry[0] < interval:
+        return entry[2]
+    sizes = session_footprint(session_state)
+    if sizes["total"] > SESSION_SOFT_LIMIT and trim_session(session_state, system_name):
+        sizes = session_footprint(session_state)
+    record_session(session_id, system_name, sizes)
+    return sizes
+
+
+def session_table():
+    """``[{"session", "system", "age_s", "total", "top"}]`` for recently seen sessions, biggest first"""
+    now = time.monotonic()
+    with _lock:
+        for session_id in [s for s, (seen, _, _) in _sessions.items() if now - seen > SESSION_TTL]:
+            del _sessions[session_id]
+        entries = list(_sessions.items())
+    rows = []
+    for session_id, (seen, system_name, sizes) in entries:
+        top = sorted(((k, v) for k, v in sizes.items() if k != "total"), key=lambda kv: -kv[1])[:3]
+        rows.append({"session": session_id[:8], "system": system_name, "age_s": round(now - seen),
+                     "total": sizes.get("total", 0), "top": dict(top)})
+    rows.sort(key=lambda row: -row["total"])
+    return rows
+
+
+def trim_session(session_state, current_system):
+    """Drop what a session keeps for systems other than ``current_system``; returns the dropped keys
+
+    That is the live view's per-system state (``utils.page_engine.SYSTEM_KEYS``:
+    interlock results, isolation plans, trace queries, list filters, the last
+    diagram click), click timings and a snap preview of another system.
+    """
+    from utils.page_engine import SYSTEM_KEYS
+    from utils.systems import REGISTRY
+
+    dropped = []
+    timings = session_state.get("click_timings")
+    if timings:
+        for name in [name for name in timings if name != current_system]:
+            del timings[name]
+            dropped.append(f"click_timings[{name}]")
+    for name in REGISTRY:
+        if name == current_system:
+            continue
+        for key in (pattern.format(name) for pattern in SYSTEM_KEYS):
+            if key in session_state:
+                del session_state[key]
+                dropped.append(key)
+    report = session_state.get("snap_report")
+    if report and report.get("system") != current_system:
+        session_state["snap_report"] = None
+        dropped.append("snap_report")
+    return dropped
+
+
+def process_rss():
+    """Resident set size of this process in bytes (Linux /proc; 0 elsewhere)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except OSError:
+        return 0
+
+
+def _cgroup_limit():
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit() and int(value) < 1 << 60:
+            return int(value)
+    return None
+
+
+def soft_limit():
+    """Process soft limit in bytes: RIG_MEMORY_SOFT_LIMIT_MB, else 80% of the container limit, else None"""
+    configured = os.environ.get("RIG_MEMORY_SOFT_LIMIT_MB")
+    if configured:
+        return int(float(configured) * 2**20)
+    container = _cgroup_limit()
+    return int(container * 0.8) if container else None
+
+
+def cache_breakdown():
+    """Bytes per shared cache and, for compiled systems, per system and part"""
+    from utils.listing import cached_lists
+    from utils.pid_click import FRAMES
+    from utils.profiling import RING
+    from utils.rig_bus import RIG
+    from utils.shared import cache_entries
+    from utils.valve_state import TAGS
+
+    systems = {}
+    for name, (compiled, idle) in cache_entries().items():
+        systems[name] = dict(compiled.sizes(), idle_s=round(idle))
+    caches = {
+        "systems": sum(entry["total"] for entry in systems.values()),
+        "frames": FRAMES.nbytes,
+        "tag_registry": deep_sizeof(TAGS.tags) + deep_sizeof(TAGS.index),
+        "rig_log": deep_sizeof(RIG.history()),
+        "profiling_ring": deep_sizeof(RING.rows()),
+        "list_filters": cached_lists(),
+    }
+    return {"caches": caches, "systems": systems}
+
+
+def evict(reason, keep=(), limit=None):
+    """One eviction pass, cheapest first; returns what was dropped
+
+    Compiled systems not in ``keep`` go least recently used first until RSS
+    is under ``limit``; without a limit (a manual pass) all of them go.
+    """
+    from utils.listing import clear_filters
+    from utils.pid_click import FRAMES
+    from utils.profiling import RING
+    from utils.shared import evict_idle
+
+    dropped = []
+    clear_filters()
+    dropped.append("list filter caches")
+    if len(FRAMES):
+        FRAMES.clear()
+        dropped.append("frame cache")
+    if len(RING):
+        RING.clear()
+        dropped.append("profiling ring")
+    gc.collect()
+    while limit is None or process_rss() > limit:
+        names = evict_idle(keep=keep)
+        if not names:
+            break
+        dropped += [f"system {name}" for name in names]
+        gc.collect()
+    EVICTIONS.append((time.strftime("%H:%M:%S"), reason, dropped))
+    EVICTION_PASSES.inc()
+    return dropped
+
+
+def enforce_limits(current_system=None, interval=5.0):
+    """Evict if RSS is over the soft limit; checks at most every ``interval`` seconds"""
+    global _last_check
+    now = time.monotonic()
+    if now - _last_check < interval:
+        return None
+    _last_check = now
+    limit = soft_limit()
+    if not limit:
+        return None
+    rss = process_rss()
+    if rss <= limit:
+        return None
+    return evict(f"RSS {rss / 2**20:.0f} MB > soft limit {limit / 2**20:.0f} MB",
+                 keep=(current_system,) if current_system else (), limit=limit)
+
+
+METRICS.gauge("rig_process_resident_bytes", "Resident set size of the server process", process_rss)
+METRICS.gauge("rig_active_sessions", "Sessions that ran a system page within the session TTL",
+              lambda: len(session_table()))
+
+
+# ==================== TRACEMALLOC ====================
+_baseline = None
+
+
+def start_tracing(frames=1):
+    tracemalloc.start(frames)
+
+
+def stop_tracing():
+    global _baseline
+    tracemalloc.stop()
+    _baseline = None
+
+
+def take_baseline():
+    """Remember the current allocations; later ``top_allocations`` show growth since then"""
+    global _baseline
+    _baseline = tracemalloc.take_snapshot()
+
+
+def top_allocations(limit=15):
+    """``[{"where", "size", "count", "growth"}]`` by source line (growth since the baseline, if any)"""
+    if not tracemalloc.is_tracing():
+        return []
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen *>")))
+    if _baseline is not None:
+        stats = snapshot.compare_to(_baseline, "lineno")
+        return [{"where": str(s.traceback[0]), "size": s.size, "count": s.count, "growth": s.size_diff}
+                for s in stats[:limit]]
+    return [{"where": str(s.traceback[0]), "size": s.size, "count": s.count, "growth": None}
+            for s in snapshot.statistics("lineno")[:limit]]
+
+
+def memory_report():
+    """Everything the admin page shows, as one JSON-serializable dict"""
+    traced = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else None
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "process": {"rss": process_rss(), "soft_limit": soft_limit(),
+                    "session_soft_limit": SESSION_SOFT_LIMIT},
+        **cache_breakdown(),
+        "sessions": session_table(),
+        "tracemalloc": None if traced is None else {
+            "current": traced[0], "peak": traced[1], "top": top_allocations()},
+        "evictions": [{"time": t, "reason": r, "dropped": d} for t, r, d in EVICTIONS],
+    }
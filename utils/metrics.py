@@ -0,0 +1,308 @@
+"""In-process metrics: counters, histograms and gauges in Prometheus text format.
+
+Hot paths update module-level metrics from ``METRICS`` (a counter ``inc``
+or histogram ``observe`` is a dict lookup, a bisect and a lock).  Nothing is
+exported unless asked for, once per server process:
+
+    RIG_METRICS_PORT=9464 python -m utils.warmup run streamlit_app.py
+        -> http://127.0.0.1:9464/metrics
+    RIG_METRICS_FILE=/var/lib/node_exporter/rig.prom RIG_METRICS_INTERVAL=15 ...
+        -> file rewritten every 15 s (node_exporter textfile collector)
+
+Gauges are callbacks evaluated at scrape time, so live values (sessions,
+cache sizes) cost nothing between scrapes.
+"""
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+log = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+BYTE_BUCKETS = (16e3, 64e3, 256e3, 512e3, 1e6, 2e6, 4e6, 8e6, 16e6)
+
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _CounterSeries:
+    __slots__ = ("_lock", "value")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class _HistogramSeries:
+    __slots__ = ("_lock", "buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot: above the largest bucket
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        slot = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[slot] += 1
+            self.sum += value
+            self.count += 1
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """Series for one label combination (created on first use); keep it for hot paths"""
+        series = self._series.get(values)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(values, self._new_series())
+        return series
+
+    @property
+    def family(self):
+        """Name the samples and their HELP/TYPE lines use"""
+        return self.name
+
+    def _new_series(self):
+        raise NotImplementedError
+
+    def samples(self):
+        """``[(suffix, label text, value)]`` for the exposition format"""
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """Monotonic count, e.g. cache hits; ``inc`` on an unlabelled counter or on ``labels(...)``"""
+
+    kind = "counter"
+
+    @property
+    def family(self):
+        return self.name + "_total"
+
+    def _new_series(self):
+        return _CounterSeries()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def samples(self):
+        return [("", _format_labels(self.label_names, values), series.value)
+                for values, series in list(self._series.items())]
+
+
+class Histogram(_Metric):
+    """Distribution over fixed buckets (seconds by default)"""
+
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_series(self):
+        return _HistogramSeries(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def samples(self):
+        rows = []
+        for values, series in list(self._series.items()):
+            with series._lock:
+                counts, total, count = list(series.counts), series.sum, series.count
+            cumulative = 0
+            for bound, n in zip((*self.buckets, float("inf")), counts):
+                cumulative += n
+                rows.append(("_bucket", _format_labels(self.label_names, values, f'le="{_number(bound)}"'),
+                             cumulative))
+            labels = _format_labels(self.label_names, values)
+            rows.append(("_sum", labels, total))
+            rows.append(("_count", labels, count))
+        return rows
+
+
+class Gauge(_Metric):
+    """Value read at scrape time from ``fn()``: a number, or ``{label values tuple: number}``"""
+
+    kind = "gauge"
+
+    def __init__(self, name, help, fn, labels=()):
+        super().__init__(name, help, labels)
+        self.fn = fn
+
+    def samples(self):
+        value = self.fn()
+        if not isinstance(value, dict):
+            return [("", "", value)]
+        return [("", _format_labels(self.label_names, values), v) for values, v in value.items()]
+
+
+class MetricsRegistry:
+    """Named metrics of this process, rendered together"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+        if not metric.label_names and not isinstance(metric, Gauge):
+            metric.labels()  # scraped as 0 before the first update
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name, help, fn, labels=()):
+        return self._register(Gauge(name, help, fn, labels))
+
+    def render(self):
+        """Everything in Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            try:
+                samples = metric.samples()
+            except Exception as e:  # one broken gauge must not break the scrape
+                log.warning("metric %s failed: %s", metric.name, e)
+                continue
+            family = metric.family
+            lines.append(f"# HELP {family} {metric.help}")
+            lines.append(f"# TYPE {family} {metric.kind}")
+            lines.extend(f"{family}{suffix}{labels} {_number(value)}" for suffix, labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+# Hot-path metrics shared by the loaders, solver, renderer and pages
+PHASE_SECONDS = METRICS.histogram(
+    "rig_phase_seconds", "Time per phase of a page or fragment run", ("run", "phase"))
+SYSTEM_LOADS = METRICS.histogram(
+    "rig_system_load_seconds", "Compiling one system (JSON, model, index, solver tables, PNG decode)",
+    ("system",))
+SYSTEM_CACHE = METRICS.counter(
+    "rig_system_cache_requests", "Compiled-system cache lookups", ("result",))
+FRAME_CACHE = METRICS.counter(
+    "rig_frame_cache_requests", "Encoded-frame cache lookups", ("result",))
+FRAME_BYTES = METRICS.histogram(
+    "rig_frame_bytes", "PNG size of each diagram frame sent to the browser", buckets=BYTE_BUCKETS)
+
+
+# ==================== EXPORT ====================
+_started = False
+_start_lock = threading.Lock()
+
+
+def enabled():
+    """True once an exporter runs: pages then time phases even with the developer panel off"""
+    return _started
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = METRICS.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port, host="127.0.0.1"):
+    """Serve ``/metrics`` from a daemon thread; returns the server"""
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="rig-metrics-http", daemon=True).start()
+    return server
+
+
+def write_file(path):
+    """Write the exposition atomically (readers never see a half-written file)"""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w') as f:
+        f.write(METRICS.render())
+    os.replace(tmp, path)
+
+
+def write_periodically(path, interval):
+    def loop():
+        while True:
+            try:
+                write_file(path)
+            except OSError as e:
+                log.warning("cannot write metrics to %s: %s", path, e)
+            time.sleep(interval)
+    threading.Thread(target=loop, name="rig-metrics-file", daemon=True).start()
+
+
+def start_exporter():
+    """Start the exporters configured by RIG_METRICS_PORT / RIG_METRICS_FILE, once per process"""
+    global _started
+    port = os.environ.get("RIG_METRICS_PORT")
+    path = os.environ.get("RIG_METRICS_FILE")
+    if not (port or path):
+        return
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+    if port:
+        try:
+            serve(int(port), os.environ.get("RIG_METRICS_HOST", "127.0.0.1"))
+            log.info("metrics on http://127.0.0.1:%s/metrics", port)
+        except ValueError:
+            log.warning("RIG_METRICS_PORT=%r is not a port number; no metrics endpoint", port)
+        except OSError as e:  # e.g. a second server on the same machine
+            log.warning("metrics port %s unavailable: %s", port, e)
+    if path:
+        interval = os.environ.get("RIG_METRICS_INTERVAL", "15")
+        try:
+            write_periodically(path, float(interval))
+        except ValueError:
+            log.warning("RIG_METRICS_INTERVAL=%r is not a number of seconds; no metrics file", interval)
@@ -0,0 +1,133 @@
+"""Compact domain model for P&ID systems.
+
+The JSON files are loose: valve states show up as ``"Closed"``, ``true`` or
+``false`` and tags differ in case (``v-101`` vs ``V-302``).  ``build_model``
+validates and normalizes everything once at load and hands out ``__slots__``
+records with dense integer IDs, so the solve and render loops index lists
+instead of doing string-keyed dict lookups.
+"""
+
+OPEN_WORDS = {"open", "opened", "on", "true", "1"}
+CLOSED_WORDS = {"closed", "close", "off", "false", "0", ""}
+
+
+def canonical_tag(tag):
+    """Canonical form of a valve tag: stripped and upper-case (``v-101`` -> ``V-101``)"""
+    if not isinstance(tag, str) or not tag.strip():
+        raise ValueError(f"invalid valve tag {tag!r}")
+    return tag.strip().upper()
+
+
+def parse_state(value):
+    """Normalize a stored valve state (bool, 0/1, "Open"/"Closed", missing) to a bool"""
+    if value is None:
+        return False
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)) and value in (0, 1):
+        return bool(value)
+    if isinstance(value, str):
+        word = value.strip().lower()
+        if word in OPEN_WORDS:
+            return True
+        if word in CLOSED_WORDS:
+            return False
+    raise ValueError(f"invalid valve state {value!r}")
+
+
+def _coord(record, key, what):
+    value = record.get(key) if isinstance(record, dict) else None
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"{what}: '{key}' must be a number, got {value!r}")
+    return int(value) if float(value).is_integer() else float(value)
+
+
+class Valve:
+    __slots__ = ("id", "tag", "x", "y", "state")
+
+    def __init__(self, id, tag, x, y, state=False):
+        self.id = id
+        self.tag = tag
+        self.x = x
+        self.y = y
+        self.state = state
+
+    def to_json(self):
+        return {"x": self.x, "y": self.y, "state": self.state}
+
+    def __repr__(self):
+        return f"Valve({self.id}, {self.tag!r}, x={self.x}, y={self.y})"
+
+
+class Pipe:
+    __slots__ = ("id", "x1", "y1", "x2", "y2")
+
+    def __init__(self, id, x1, y1, x2, y2):
+        self.id = id
+        self.x1 = x1
+        self.y1 = y1
+        self.x2 = x2
+        self.y2 = y2
+
+    def to_json(self):
+        return {"x1": self.x1, "y1": self.y1, "x2": self.x2, "y2": self.y2}
+
+    def __repr__(self):
+        return f"Pipe({self.id}, ({self.x1}, {self.y1}) -> ({self.x2}, {self.y2}))"
+
+
+class SystemModel:
+    """Valves and pipes of one system; ``valves[i].id == i`` and ``pipes[i].id == i``"""
+
+    __slots__ = ("name", "valves", "pipes", "index")
+
+    def __init__(self, name, valves, pipes):
+        self.name = name
+        self.valves = valves
+        self.pipes = pipes
+        self.index = {v.tag: v.id for v in valves}
+
+    @property
+    def tags(self):
+        return [v.tag for v in self.valves]
+
+    def valve(self, tag):
+        """Look up a valve by tag in any case; None if the system has no such valve"""
+        idx = self.index.get(canonical_tag(tag))
+        return None if idx is None else self.valves[idx]
+
+    def to_json(self):
+        """Normalized ``(valves, pipes)`` in the on-disk schema, ready for editing and saving"""
+        valves = {v.tag: v.to_json() for v in self.valves}
+        pipes = [p.to_json() for p in self.pipes]
+        return valves, pipes
+
+
+def build_model(name, valves, pipes):
+    """Validate raw JSON data and build a SystemModel; raises ValueError on bad records"""
+    if not isinstance(valves, dict):
+        raise ValueError(f"valves must be an object of tag -> {{x, y}}, got {type(valves).__name__}")
+    if not isinstance(pipes, list):
+        raise ValueError(f"pipes must be a list of {{x1, y1, x2, y2}}, got {type(pipes).__name__}")
+
+    valve_list = []
+    seen = {}
+    for raw_tag, record in valves.items():
+        tag = canonical_tag(raw_tag)
+        if tag in seen:
+            raise ValueError(f"duplicate valve tag {raw_tag!r} (same as {seen[tag]!r})")
+        seen[tag] = raw_tag
+        what = f"valve {raw_tag}"
+        x, y = _coord(record, "x", what), _coord(record, "y", what)
+        try:
+            state = parse_state(record.get("state"))
+        except ValueError as e:
+            raise ValueError(f"{what}: {e}") from None
+        valve_list.append(Valve(len(valve_list), tag, x, y, state))
+
+    pipe_list = []
+    for i, record in enumerate(pipes):
+        what = f"pipe {i + 1}"
+        pipe_list.append(Pipe(i, *(_coord(record, k, what) for k in ("x1", "y1", "x2", "y2"))))
+
+    return SystemModel(name, valve_list, pipe_list)
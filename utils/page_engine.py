@@ -0,0 +1,437 @@
+"""Generic system page: one engine for every system in the registry.
+
+The dashboard (``streamlit_app.py``) and the standalone pages under
+``page/`` both draw a system through ``live_view``; a standalone page is
+just ``run_page(key)``.  Everything system-specific comes from the registry
+entry and the shared compiled cache, so the pages hold no data or logic.
+"""
+import time
+import uuid
+from itertools import islice
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from utils import metrics
+from utils.listing import filter_pipes, filter_state, filter_valves, list_filters, pager
+from utils.memory import enforce_limits, sample_session
+from utils.metrics import FRAME_BYTES
+from utils.pid_click import FRAMES, data_url, new_click, pid_click, png_bytes
+from utils.profiling import NULL_TIMER, RING, MetricsTimer, RunTimer, summarize
+from utils.interlocks import InterlockState
+from utils.isolation import plan_isolation
+from utils.rig_bus import RIG
+from utils.shared import cache_footprint, get_system
+from utils.solver import solve
+from utils.systems import get_config
+from utils.valve_state import TAGS, ValveStates, bits_of, mask_of
+
+
+# ==================== SESSION ====================
+# Session keys the live view keeps per system ({} is the system key);
+# ``utils.memory.trim_session`` drops those of systems not on screen
+SYSTEM_KEYS = ("pid_click_{}", "interlocks_{}", "interlock_notice_{}", "isolation_{}", "isolation_pick_{}",
+               "trace_valve_{}", "valves_{}_prefix", "valves_{}_state", "valves_{}_region", "valves_{}_page")
+
+
+def init_session():
+    """Per-session defaults used by every system view"""
+    if 'valve_states' not in st.session_state:
+        st.session_state.valve_states = ValveStates()
+    elif not isinstance(st.session_state.valve_states, ValveStates):
+        # Session started on an old page with a plain tag -> bool dict:
+        # publish its open valves and start from the shared state
+        opened = [tag for tag, state in st.session_state.valve_states.items() if state]
+        RIG.set_bits(mask_of(TAGS.positions(opened)), True)
+        st.session_state.valve_states = ValveStates()
+    if 'rig_subscription' not in st.session_state:
+        st.session_state.rig_subscription = RIG.subscribe()
+    if 'selected_pipe' not in st.session_state:
+        st.session_state.selected_pipe = None
+    if 'selected_valve' not in st.session_state:
+        st.session_state.selected_valve = None
+    if 'calibration_mode' not in st.session_state:
+        st.session_state.calibration_mode = False
+    if 'edit_mode' not in st.session_state:
+        st.session_state.edit_mode = False
+    if 'click_timings' not in st.session_state:
+        st.session_state.click_timings = {}
+    metrics.start_exporter()
+
+
+def sync_valve_states():
+    """Apply valve moves published on the shared rig since this session last looked"""
+    # Valve moves go through the shared rig (utils.rig_bus) and reach every
+    # session as diffs; only the changed bits are applied
+    valve_states = st.session_state.valve_states
+    valve_states.apply(st.session_state.rig_subscription.poll(valve_states.bits))
+
+
+def interlock_state(compiled, system_name):
+    """This session's interlock results for the system, brought up to its valve bits"""
+    key = f"interlocks_{system_name}"
+    state = st.session_state.get(key)
+    bits = st.session_state.valve_states.bits
+    if state is None or state.rules is not compiled.interlocks:
+        state = st.session_state[key] = InterlockState(compiled.interlocks, bits)
+    else:
+        state.update(bits)
+    return state
+
+
+def operate_valve(system_name, pos):
+    """Toggle a valve on the shared rig unless an interlock blocks the move"""
+    sync_valve_states()
+    state = interlock_state(get_system(system_name), system_name)
+    opening = not st.session_state.valve_states.is_open(pos)
+
+    def check(bits):
+        # Against the rig's own bits, under its lock: the move checked is the move applied
+        state.update(bits)
+        return state.reasons(pos, opening)
+
+    reasons = RIG.set_checked(pos, opening, check)
+    if reasons:
+        # Shown once, above the valve list, on the next draw
+        st.session_state[f"interlock_notice_{system_name}"] = (TAGS.tags[pos], opening, reasons)
+        return
+    st.session_state.pop(f"interlock_notice_{system_name}", None)
+
+
+# ==================== DIAGRAM ====================
+def handle_diagram_click(compiled, click):
+    """Resolve a click on the diagram to the nearest valve or pipe and operate it"""
+    hit = compiled.index.nearest(click["x"], click["y"])
+    if hit is None:
+        return
+    kind, item = hit
+    if kind == "valve":
+        valve = compiled.model.valves[item]
+        if not st.session_state.calibration_mode:
+            operate_valve(compiled.name, compiled.positions[item])
+            sync_valve_states()
+            return
+        st.session_state.selected_valve = valve.tag
+        st.session_state.selected_pipe = None
+        st.session_state.temp_valve_x = valve.x
+        st.session_state.temp_valve_y = valve.y
+    else:
+        pipe = compiled.model.pipes[item]
+        st.session_state.selected_pipe = None if st.session_state.selected_pipe == item else item
+        st.session_state.selected_valve = None
+        st.session_state.temp_pipe_x1, st.session_state.temp_pipe_y1 = pipe.x1, pipe.y1
+        st.session_state.temp_pipe_x2, st.session_state.temp_pipe_y2 = pipe.x2, pipe.y2
+    if st.session_state.calibration_mode:
+        # The calibration sidebar shows the selection; rebuild it too
+        st.rerun()
+
+
+def _tag_list(mask, limit=8):
+    tags = [TAGS.tags[bit] for bit in islice(bits_of(mask), limit)]
+    return ", ".join(tags) + (" …" if mask.bit_count() > limit else "")
+
+
+def trace_query(compiled, bits, selected_pipe, valve_tag):
+    """``(pipe mask, valve mask, lines)``: what opens the selected pipe, what the named valve feeds"""
+    reach = compiled.reach
+    pipes = valves = 0
+    lines = []
+    if selected_pipe is not None and selected_pipe < len(compiled.model.pipes):
+        feeds, pressure = reach.requirements(selected_pipe)
+        number = selected_pipe + 1
+        lines.append(f"**Pipe {number}** flows when any of {_tag_list(feeds)} is open" if feeds
+                     else f"**Pipe {number}**: no valve makes it flow")
+        if pressure is None:
+            lines.append("It is a pressure source")
+        elif pressure:
+            lines.append(f"It is pressurized once any of {_tag_list(pressure)} is open")
+        else:
+            lines.append("No valve pressurizes this system")
+        lines.append("✅ Live now" if reach.is_live(selected_pipe, bits) else "⚪ Not live with the current valves")
+        pipes |= 1 << selected_pipe
+        valves |= feeds | (pressure or 0)
+    if valve_tag and valve_tag.strip():
+        pos = TAGS.find(valve_tag)
+        if pos is None or not compiled.mask >> pos & 1:
+            lines.append(f"No valve {valve_tag.strip()!r} in this system")
+        else:
+            fed = reach.pipes_fed_by(pos)
+            numbers = [str(pipe_id + 1) for pipe_id in islice(bits_of(fed), 12)]
+            count = fed.bit_count()
+            lines.append(f"**{TAGS.tags[pos]}** makes {count} pipe{'' if count == 1 else 's'} flow"
+                         + (f": {', '.join(numbers)}" + (" …" if count > 12 else "") if fed else ""))
+            if reach.pressurizes(pos):
+                lines.append("and pressurizes the whole system")
+            pipes |= fed
+            valves |= 1 << pos
+    return pipes, valves, lines
+
+
+def plan_pipe_isolation(system_name, pipe_id):
+    """Button callback: isolation plans for ``pipe_id``, kept until the selection or data changes"""
+    compiled = get_system(system_name)
+    st.session_state[f"isolation_{system_name}"] = {
+        "pipe": pipe_id, "stamp": compiled.stamp, **plan_isolation(compiled, [pipe_id])}
+    st.session_state.pop(f"isolation_pick_{system_name}", None)
+
+
+def current_isolation(compiled, system_name):
+    """``(result, chosen plan)`` of the last isolation planned for the selected pipe, if still valid"""
+    key, pick_key = f"isolation_{system_name}", f"isolation_pick_{system_name}"
+    result = st.session_state.get(key)
+    if result is None:
+        return None, None
+    if result["pipe"] != st.session_state.selected_pipe or result["stamp"] != compiled.stamp:
+        del st.session_state[key]
+        st.session_state.pop(pick_key, None)
+        return None, None
+    plans = result["plans"]
+    if not plans:
+        return result, None
+    return result, plans[min(st.session_state.get(pick_key, 0), len(plans) - 1)]
+
+
+@st.fragment
+def live_view(system_name):
+    """Solve-and-render fragment: a valve toggle re-runs only this function"""
+    # Imaging is loaded on first draw, not at import: the home page never needs it
+    from utils.render import render_pid_with_overlay
+
+    start = time.perf_counter()
+    timer = run_timer("live_view", system_name)
+    with timer.phase("sync"):
+        sync_valve_states()
+
+    with timer.phase("load"):
+        compiled = get_system(system_name)
+    click_key = f"pid_click_{system_name}"
+    # Apply a click on the diagram before drawing the next frame
+    with timer.phase("click"):
+        click = new_click(click_key, "pid_click_handled")
+        if click:
+            handle_diagram_click(compiled, click)
+    model = compiled.model
+    display_name = compiled.config.display_name
+    # Valve states: one bit per valve, positions indexed by valve ID
+    valve_states = st.session_state.valve_states
+    positions = compiled.positions
+    with timer.phase("solve"):
+        solution = solve(compiled.topology, valve_states.bits)
+    with timer.phase("interlocks"):
+        interlocks = interlock_state(compiled, system_name)
+    trace_key = f"trace_valve_{system_name}"
+    with timer.phase("trace"):
+        trace_pipes, trace_valves, trace_lines = trace_query(
+            compiled, valve_states.bits, st.session_state.selected_pipe, st.session_state.get(trace_key, ""))
+        isolation, plan = current_isolation(compiled, system_name)
+        if plan:
+            # The chosen plan's valves and the section they cut off share the trace halo
+            trace_pipes |= mask_of(plan["section"])
+            trace_valves |= plan["mask"]
+
+    # Main display
+    col1, col2 = st.columns([3, 1])
+
+    with col1:
+        # Everything the frame depends on; other systems' valve bits do not change it
+        frame_key = (system_name, compiled.stamp, valve_states.bits & compiled.mask,
+                     st.session_state.selected_pipe, st.session_state.selected_valve, trace_pipes, trace_valves)
+        png = FRAMES.get(frame_key)
+        if png is None:
+            with timer.phase("render"):
+                image = render_pid_with_overlay(compiled, valve_states.bits, solution,
+                                                st.session_state.selected_pipe, st.session_state.selected_valve,
+                                                trace_pipes, trace_valves)
+        with timer.phase("encode"):
+            if png is None:
+                png = png_bytes(image)
+                FRAMES.put(frame_key, png)
+            image = data_url(png)
+        # The PNG itself, not its base64 data URL (~4/3 of it)
+        FRAME_BYTES.observe(len(png))
+        with timer.phase("send"):
+            pid_click(image, key=click_key, caption="Click a valve to operate it, a pipe to select it")
+        st.caption(f"{display_name} - Green=Flowing | Light Blue=Pressurized | Dark=Empty | "
+                   "Purple=Selected | 🖱️ Click a valve to toggle it, a pipe to select it")
+
+    with col2:
+        st.header("🎛️ Valve Controls")
+        notice = st.session_state.pop(f"interlock_notice_{system_name}", None)
+        if notice:
+            tag, opening, reasons = notice
+            st.warning(f"🔒 {tag} cannot {'open' if opening else 'close'}: " + "; ".join(reasons))
+        with timer.phase("controls"):
+            # Only the visible page of the (filtered) valve list becomes widgets
+            list_key = f"valves_{system_name}"
+            prefix, state_filter, region = list_filters(list_key)
+            valve_ids = filter_state(filter_valves(compiled, prefix, region),
+                                     lambda i: valve_states.is_open(positions[i]), state_filter)
+            for valve_id in pager(valve_ids, list_key):
+                valve = model.valves[valve_id]
+                pos = positions[valve.id]
+                state = valve_states.is_open(pos)
+                reasons = interlocks.reasons(pos, not state)
+                label = f"{'🔒 ' if reasons else ''}{'🟢 OPEN' if state else '🔴 CLOSED'} {valve.tag}"
+                st.button(label, key=f"valve_{system_name}_{valve.tag}",
+                          help="Blocked: " + "; ".join(reasons) if reasons else None,
+                          on_click=operate_valve, args=(system_name, pos), use_container_width=True)
+
+        st.header("📊 Status")
+        st.metric("Open Valves", valve_states.count_open(compiled.mask))
+        st.metric("Flowing Pipes", solution.flowing)
+        st.metric("Pressurized Pipes", solution.pressurized)
+        st.metric("Total Valves", len(model.valves))
+        st.metric("Total Pipes", len(model.pipes))
+        rules = interlocks.rules
+        if len(rules) or rules.errors:
+            st.caption(f"🔒 Interlocks: {len(rules)} rules, {len(interlocks.failing)} not satisfied"
+                       + (f" · ⚠️ {len(rules.errors)} invalid (python -m utils.lint)" if rules.errors else ""))
+        with timer.phase("footprint"):
+            # Sampled, not measured on every click: a full walk of session_state is not cheap
+            sizes = sample_session(st.session_state, session_id(), system_name)
+            enforce_limits(system_name)
+            session_kb = sizes["total"] / 1024
+            shared_kb = cache_footprint()["total"] / 1024
+        st.caption(f"💾 Session: {session_kb:.1f} KB · Shared cache: {shared_kb:.0f} KB")
+
+        # What opens the selected pipe / what a valve feeds, highlighted in orange
+        st.header("🔎 Trace")
+        st.text_input("Pipes fed by valve", key=trace_key, placeholder="Valve tag, e.g. V-101")
+        if trace_lines:
+            for line in trace_lines:
+                st.write(line)
+        else:
+            st.caption("Select a pipe or enter a valve tag")
+
+        # Fewest valves to close (lockout/tagout) that cut the selected pipe off from pressure
+        st.header("🔒 Isolation")
+        selected = st.session_state.selected_pipe
+        if selected is None or selected >= len(model.pipes):
+            st.caption("Select a pipe to plan its isolation")
+        else:
+            st.button(f"Plan isolation of pipe {selected + 1}", key=f"isolate_{system_name}",
+                      on_click=plan_pipe_isolation, args=(system_name, selected), use_container_width=True)
+            if isolation and isolation["message"]:
+                st.warning(isolation["message"])
+            elif isolation:
+                plans = isolation["plans"]
+                st.radio("Plans (fewest valves first)", range(len(plans)), key=f"isolation_pick_{system_name}",
+                         format_func=lambda i: (f"{plans[i]['count']} valve{'' if plans[i]['count'] == 1 else 's'}: "
+                                                f"{_tag_list(plans[i]['mask'])}"
+                                                + ("" if plans[i]["verified"] else " ⚠️ not verified")))
+                if plan["verified"]:
+                    st.caption(f"Closing these isolates {len(plan['section'])} pipe"
+                               f"{'' if len(plan['section']) == 1 else 's'} (orange)")
+                st.button("🔒 Close these valves", key=f"isolation_apply_{system_name}",
+                          on_click=RIG.set_bits, args=(plan["mask"], False), use_container_width=True)
+
+        # Clear all valves button
+        st.button("🔄 Clear All Valves", key="clear_valves",
+                  on_click=RIG.set_bits, args=(compiled.mask, False))
+
+        st.header("🎯 Legend")
+        st.write("🟣 **Purple**: Selected for calibration")
+        st.write("🟢 **Green pipes**: Flowing · **Green valves**: Open")
+        st.write("🔵 **Light blue pipes**: Pressurized, no flow")
+        st.write("⚫ **Dark pipes**: Empty")
+        st.write("🔴 **Red valves**: Closed")
+        st.write("🔒 **Lock**: Interlock blocks this move")
+        st.write("🟠 **Orange halo**: Trace result · Isolation plan")
+        if st.session_state.edit_mode:
+            st.write("🗑️ **Edit Mode**: Can add/delete/rename")
+
+        # Server time of this fragment run (a valve click costs only this)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        st.session_state.click_timings[system_name] = elapsed_ms
+        st.caption(f"⏱️ Last update: {elapsed_ms:.0f} ms server time")
+        phases = timer.finish()
+        if phases:
+            # The sidebar panel is not redrawn on fragment reruns; show this run here
+            st.caption("🛠️ " + " · ".join(f"{name} {ms:.1f}" for name, ms in phases) + " ms")
+
+
+def session_id():
+    """Streamlit's id for this browser session (stable across reruns)"""
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx is not None else "local"
+
+
+# ==================== PROFILING ====================
+def run_timer(run, system_name):
+    """Phase timer for this run: panel timings, exporter-only timings, or the no-op timer"""
+    if not st.session_state.get("dev_panel"):
+        return MetricsTimer(run) if metrics.enabled() else NULL_TIMER
+    if "profile_session" not in st.session_state:
+        st.session_state.profile_session = uuid.uuid4().hex[:6]
+    return RunTimer(run, system_name, st.session_state.profile_session)
+
+
+def dev_panel():
+    """Optional sidebar panel: phase timings of recent runs and CSV export"""
+    with st.sidebar:
+        st.markdown("---")
+        st.checkbox("🛠️ Developer panel", key="dev_panel",
+                    help="Time each phase of every rerun (load, solve, render, encode, ...)")
+        if not st.session_state.dev_panel:
+            return
+        rows = RING.rows()
+        st.caption(f"{len(rows)} timings buffered (last {RING.capacity} kept, all sessions)")
+        if not rows:
+            st.info("Interact with a system to collect timings")
+            return
+        st.table([
+            {"run": run, "phase": phase, "n": count, "mean ms": f"{mean:.2f}", "max ms": f"{peak:.2f}"}
+            for run, phase, count, mean, peak in summarize(rows)
+        ])
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("⬇️ CSV", RING.to_csv(), file_name="rig_timings.csv",
+                               mime="text/csv", use_container_width=True)
+        with col2:
+            st.button("🧹 Clear", on_click=RING.clear, use_container_width=True)
+
+
+# ==================== STANDALONE PAGE ====================
+def pipe_selector(compiled):
+    """Sidebar pipe list (filtered, paged) that selects a pipe for highlighting"""
+    st.header("Pipe Selection")
+    if st.button("Unselect Pipe", use_container_width=True):
+        st.session_state.selected_pipe = None
+    if not compiled.model.pipes:
+        st.warning("No pipes data loaded")
+        return
+    prefix, _, region = list_filters("pipes", states=False)
+    for i in pager(filter_pipes(compiled, prefix, region), "pipes"):
+        icon = "Selected" if i == st.session_state.selected_pipe else "Pipe"
+        if st.button(f"{icon} {i+1}", key=f"p{i}", use_container_width=True):
+            st.session_state.selected_pipe = i
+            st.rerun()
+
+
+def run_page(system_name):
+    """Whole standalone page for one registered system"""
+    config = get_config(system_name)
+    st.set_page_config(layout="wide", page_title=f"Rig Simulation – {config.display_name}")
+    init_session()
+
+    compiled = get_system(system_name)
+    st.title(f"Rig Simulation – {config.display_name}")
+
+    with st.sidebar:
+        st.header("File Status")
+        if compiled.errors:
+            for message in compiled.errors:
+                st.write(f"❌ {message}")
+        else:
+            st.write("✅ P&ID, valves and pipes loaded")
+        st.markdown("---")
+        pipe_selector(compiled)
+        st.markdown("---")
+        if st.button("Back to Home"):
+            st.switch_page("home.py")
+
+    if compiled.image is None or not compiled.model.valves:
+        st.error("❌ Missing required files! Check the sidebar for status.")
+    else:
+        live_view(system_name)
+    dev_panel()
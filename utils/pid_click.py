@@ -0,0 +1,106 @@
+"""Clickable P&ID image: a local, build-free Streamlit component.
+
+``pid_click(image, key)`` shows a PIL image and returns the last click as
+``{"x", "y", "n"}`` in the image's own pixel coordinates (``n`` is unique per
+click), or None before the first click.  The value is also readable from
+``st.session_state[key]`` before the component is drawn, which lets a page
+apply a click before it renders the next frame.
+
+``FRAMES`` keeps recently encoded frames by drawing state: sessions on the
+shared rig mostly show the same state, so after one session draws a valve
+move the others send its PNG without rendering or encoding it again.
+"""
+import base64
+import io
+import os
+import threading
+from collections import OrderedDict
+
+from utils.metrics import FRAME_CACHE
+from utils.systems import ROOT
+
+_component = None
+
+
+def _declare():
+    global _component
+    if _component is None:
+        import streamlit.components.v1 as components
+        _component = components.declare_component(
+            "pid_click", path=os.path.join(ROOT, "components", "pid_click"))
+    return _component
+
+
+def png_bytes(image):
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def data_url(png):
+    return "data:image/png;base64," + base64.b64encode(png).decode("ascii")
+
+
+def encode_png(image):
+    return data_url(png_bytes(image))
+
+
+class FrameCache:
+    """Encoded PNG frames by key, least recently used dropped beyond ``max_bytes``"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._frames = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits, self._misses = FRAME_CACHE.labels("hit"), FRAME_CACHE.labels("miss")
+
+    def get(self, key):
+        with self._lock:
+            png = self._frames.get(key)
+            if png is not None:
+                self._frames.move_to_end(key)
+        (self._misses if png is None else self._hits).inc()
+        return png
+
+    def put(self, key, png):
+        if len(png) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._frames.pop(key, None)
+            if old is not None:
+                self.nbytes -= len(old)
+            self._frames[key] = png
+            self.nbytes += len(png)
+            while self.nbytes > self.max_bytes:
+                _, dropped = self._frames.popitem(last=False)
+                self.nbytes -= len(dropped)
+
+    def clear(self):
+        with self._lock:
+            self._frames.clear()
+            self.nbytes = 0
+
+    def __len__(self):
+        return len(self._frames)
+
+
+FRAMES = FrameCache(int(float(os.environ.get("RIG_FRAME_CACHE_MB", "32")) * 2**20))
+
+
+def pid_click(image, key, caption=None):
+    """Render ``image`` (PIL image or ``encode_png`` data URL) and return the last click in image pixels (or None)"""
+    if not isinstance(image, str):
+        image = encode_png(image)
+    return _declare()(image=image, caption=caption, key=key, default=None)
+
+
+def new_click(key, handled_key):
+    """The click stored under ``key`` if it has not been handled yet, else None"""
+    import streamlit as st
+
+    click = st.session_state.get(key)
+    if not click or click.get("n") == st.session_state.get(handled_key):
+        return None
+    st.session_state[handled_key] = click["n"]
+    return click
@@ -0,0 +1,165 @@
+"""Per-rerun phase timings and a process-wide ring buffer of recent runs.
+
+A page starts a ``RunTimer`` per script or fragment run and wraps each
+phase (load, solve, render, encode, ...) in ``timer.phase(name)``.  When
+profiling is off the page gets ``NULL_TIMER`` instead, whose ``phase()``
+hands back one shared no-op context manager, so the instrumentation costs
+an attribute lookup and a call per phase.
+
+Finished runs are appended to ``RING``, a bounded in-memory buffer shared by
+all sessions, which can be exported as CSV.  While a metrics exporter runs
+(``utils.metrics``), phases also go to the ``rig_phase_seconds`` histogram;
+with the panel off, ``MetricsTimer`` records them there and nowhere else.
+"""
+import csv
+import io
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+from utils import metrics
+from utils.metrics import PHASE_SECONDS
+
+CAPACITY = 2000
+FIELDS = ("time", "session", "system", "run", "phase", "ms")
+
+
+class RingBuffer:
+    """Bounded, thread-safe buffer of timing rows (oldest dropped first)"""
+
+    def __init__(self, capacity=CAPACITY):
+        self._lock = threading.Lock()
+        self._rows = deque(maxlen=capacity)
+
+    def extend(self, rows):
+        with self._lock:
+            self._rows.extend(rows)
+
+    def rows(self):
+        with self._lock:
+            return list(self._rows)
+
+    def clear(self):
+        with self._lock:
+            self._rows.clear()
+
+    def __len__(self):
+        return len(self._rows)
+
+    @property
+    def capacity(self):
+        return self._rows.maxlen
+
+    def to_csv(self):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(FIELDS)
+        writer.writerows(self.rows())
+        return buffer.getvalue()
+
+
+RING = RingBuffer()
+
+
+class _Phase:
+    __slots__ = ("timer", "name", "start")
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timer.phases.append((self.name, (time.perf_counter() - self.start) * 1000))
+        return False
+
+
+class RunTimer:
+    """Phase timings of one script or fragment run"""
+
+    __slots__ = ("run", "system", "session", "start", "phases")
+
+    def __init__(self, run, system, session):
+        self.run = run
+        self.system = system
+        self.session = session
+        self.start = time.perf_counter()
+        self.phases = []
+
+    def phase(self, name):
+        return _Phase(self, name)
+
+    def finish(self, ring=RING):
+        """Record the run (phases plus a ``total`` row) and return ``[(phase, ms)]``"""
+        self.phases.append(("total", (time.perf_counter() - self.start) * 1000))
+        if metrics.enabled():
+            for name, ms in self.phases:
+                PHASE_SECONDS.labels(self.run, name).observe(ms / 1000)
+        stamp = time.strftime("%H:%M:%S")
+        ring.extend((stamp, self.session, self.system, self.run, name, round(ms, 3))
+                    for name, ms in self.phases)
+        return self.phases
+
+
+class _MetricsPhase:
+    __slots__ = ("series", "start")
+
+    def __init__(self, series):
+        self.series = series
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.series.observe(time.perf_counter() - self.start)
+        return False
+
+
+class MetricsTimer:
+    """Phase timings of one run straight into ``rig_phase_seconds`` (no ring buffer)"""
+
+    __slots__ = ("run", "start")
+    phases = ()
+
+    def __init__(self, run):
+        self.run = run
+        self.start = time.perf_counter()
+
+    def phase(self, name):
+        return _MetricsPhase(PHASE_SECONDS.labels(self.run, name))
+
+    def finish(self, ring=RING):
+        PHASE_SECONDS.labels(self.run, "total").observe(time.perf_counter() - self.start)
+        return ()
+
+
+class _NullTimer:
+    __slots__ = ()
+    phases = ()
+    _phase = nullcontext()
+
+    def phase(self, name):
+        return self._phase
+
+    def finish(self, ring=RING):
+        return ()
+
+
+NULL_TIMER = _NullTimer()
+
+
+def summarize(rows):
+    """``[(run, phase, count, mean_ms, max_ms)]`` over ring-buffer rows"""
+    stats = {}
+    for _, _, _, run, phase, ms in rows:
+        entry = stats.setdefault((run, phase), [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += ms
+        entry[2] = max(entry[2], ms)
+    return [(run, phase, count, total / count, peak)
+            for (run, phase), (count, total, peak) in stats.items()]
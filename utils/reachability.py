@@ -0,0 +1,169 @@
+"""Reachability index: which valves open a pipe, which pipes a valve feeds.
+
+Derived from the solver tables (``utils.solver.Topology``), so it answers
+exactly what ``solve`` would do:
+
+* a pipe flows when a valve of its own leader mask is open, or one of a
+  group leader it belongs to: its *routes* are those ``(leader pipe,
+  valve mask)`` pairs and its *feeds* their union;
+* every pipe except the sources needs pressure, which any valve leading a
+  pressure leader provides (``pressure_valves``);
+* a valve's *influence* is the pipes it makes flow on its own: each leader
+  it is near, plus that leader's group.
+
+Everything is a bitset (valve masks over ``TAGS`` positions, pipe masks over
+pipe IDs) in dicts keyed by pipe ID or valve bit, so a query is a dict
+lookup and an AND.  ``updated`` patches a copy for a new topology, touching
+only the leaders and groups whose masks changed, so a calibration save does
+not rebuild the index of a large system.
+"""
+from utils.valve_state import bits_of
+
+
+class Reachability:
+    """Per-pipe feed valves and per-valve influenced pipes of one topology; read-only and shared"""
+
+    __slots__ = ("pipe_count", "sources_mask", "pressure_leaders", "near", "members", "member_of",
+                 "valve_leaders", "feeds", "influence", "pressure_valves")
+
+    def __init__(self, topology):
+        self.pipe_count = topology.pipe_count
+        self.sources_mask = topology.sources_mask
+        self.pressure_leaders = topology.pressure_leaders
+        self.near = dict(topology.leaders)  # leader pipe -> valve mask
+        self.members = dict(topology.groups)  # group leader pipe -> member pipe mask
+        member_of = {}
+        for leader, members in self.members.items():
+            for pipe_id in bits_of(members):
+                member_of[pipe_id] = member_of.get(pipe_id, ()) + (leader,)
+        self.member_of = member_of
+        valve_leaders = {}
+        for leader, mask in self.near.items():
+            for bit in bits_of(mask):
+                valve_leaders[bit] = valve_leaders.get(bit, ()) + (leader,)
+        self.valve_leaders = valve_leaders
+        self.feeds = {}
+        for pipe_id in self.near.keys() | member_of.keys():
+            self._refeed(pipe_id)
+        self.influence = {}
+        for bit in valve_leaders:
+            self._reinfluence(bit)
+        self.pressure_valves = self._pressure_valves()
+
+    def _refeed(self, pipe_id):
+        mask = self.near.get(pipe_id, 0)
+        for leader in self.member_of.get(pipe_id, ()):
+            mask |= self.near.get(leader, 0)
+        if mask:
+            self.feeds[pipe_id] = mask
+        else:
+            self.feeds.pop(pipe_id, None)
+
+    def _reinfluence(self, bit):
+        reach = 0
+        for leader in self.valve_leaders.get(bit, ()):
+            reach |= 1 << leader | self.members.get(leader, 0)
+        if reach:
+            self.influence[bit] = reach
+        else:
+            self.influence.pop(bit, None)
+
+    def _pressure_valves(self):
+        mask = 0
+        for leader in bits_of(self.pressure_leaders):
+            mask |= self.near.get(leader, 0)
+        return mask
+
+    # ---- queries ----
+    def feeds_of(self, pipe_id):
+        """Valve mask: opening any one of these makes the pipe flow"""
+        return self.feeds.get(pipe_id, 0)
+
+    def routes(self, pipe_id):
+        """``[(leader pipe, valve mask)]``: the pipe flows when a valve of any route is open"""
+        found = [(pipe_id, self.near[pipe_id])] if pipe_id in self.near else []
+        found += [(leader, self.near[leader]) for leader in self.member_of.get(pipe_id, ()) if leader in self.near]
+        return found
+
+    def needs_pressure(self, pipe_id):
+        return not self.sources_mask >> pipe_id & 1
+
+    def requirements(self, pipe_id):
+        """``(feed valves, pressure valves)``: the pipe is live with one open from each
+
+        The pressure mask is None for a source pipe, which needs none.
+        """
+        return self.feeds.get(pipe_id, 0), self.pressure_valves if self.needs_pressure(pipe_id) else None
+
+    def is_live(self, pipe_id, bits):
+        """True when ``bits`` makes the pipe flow and pressurized (drawn green)"""
+        feeds, pressure = self.requirements(pipe_id)
+        return bool(bits & feeds) and (pressure is None or bool(bits & pressure))
+
+    def pipes_fed_by(self, bit):
+        """Pipe mask that flows when this valve alone is open"""
+        return self.influence.get(bit, 0)
+
+    def pressurizes(self, bit):
+        """True when opening this valve pressurizes the whole system"""
+        return bool(self.pressure_valves >> bit & 1)
+
+    # ---- incremental update ----
+    def updated(self, topology):
+        """Index for ``topology`` built from this one, recomputing only what changed
+
+        Pipe IDs must mean the same pipes: when the pipe count differs the
+        index is rebuilt from scratch.
+        """
+        if topology.pipe_count != self.pipe_count:
+            return Reachability(topology)
+        near, members = dict(topology.leaders), dict(topology.groups)
+        changed_leaders = {p for p in self.near.keys() | near.keys() if self.near.get(p) != near.get(p)}
+        changed_groups = {p for p in self.members.keys() | members.keys() if self.members.get(p) != members.get(p)}
+        if (not changed_leaders and not changed_groups and topology.sources_mask == self.sources_mask
+                and topology.pressure_leaders == self.pressure_leaders):
+            return self
+
+        new = object.__new__(Reachability)
+        new.pipe_count = self.pipe_count
+        new.sources_mask = topology.sources_mask
+        new.pressure_leaders = topology.pressure_leaders
+        new.near, new.members = near, members
+        new.member_of = dict(self.member_of)
+        new.valve_leaders = dict(self.valve_leaders)
+        new.feeds = dict(self.feeds)
+        new.influence = dict(self.influence)
+
+        for leader in changed_groups:
+            old, now = self.members.get(leader, 0), members.get(leader, 0)
+            for pipe_id in bits_of(old & ~now):
+                rest = tuple(p for p in new.member_of[pipe_id] if p != leader)
+                if rest:
+                    new.member_of[pipe_id] = rest
+                else:
+                    del new.member_of[pipe_id]
+            for pipe_id in bits_of(now & ~old):
+                new.member_of[pipe_id] = new.member_of.get(pipe_id, ()) + (leader,)
+        for leader in changed_leaders:
+            old, now = self.near.get(leader, 0), near.get(leader, 0)
+            for bit in bits_of(old & ~now):
+                rest = tuple(p for p in new.valve_leaders[bit] if p != leader)
+                if rest:
+                    new.valve_leaders[bit] = rest
+                else:
+                    del new.valve_leaders[bit]
+            for bit in bits_of(now & ~old):
+                new.valve_leaders[bit] = new.valve_leaders.get(bit, ()) + (leader,)
+
+        # A leader's change reaches its own feeds, its group members and its valves
+        pipes, valves = set(), set()
+        for leader in changed_leaders | changed_groups:
+            pipes.add(leader)
+            pipes.update(bits_of(self.members.get(leader, 0) | members.get(leader, 0)))
+            valves.update(bits_of(self.near.get(leader, 0) | near.get(leader, 0)))
+        for pipe_id in pipes:
+            new._refeed(pipe_id)
+        for bit in valves:
+            new._reinfluence(bit)
+        new.pressure_valves = new._pressure_valves()
+        return new
@@ -0,0 +1,111 @@
+"""Shared rig state with diff publishing.
+
+``RIG`` is the authoritative valve-state bitmask for every session in the
+server process (bit positions come from ``utils.valve_state.TAGS``).  Each
+change is published as one XOR diff with a version number.  A session holds
+a ``Subscription`` and, on its next refresh, folds the diffs it has not seen
+into one mask and applies only those bits to its local ``ValveStates`` -
+no whole-state snapshots are copied around unless a subscriber has fallen
+further behind than the diff history.
+"""
+import threading
+from collections import deque
+
+from utils.metrics import METRICS
+
+
+class RigStateService:
+    """Authoritative valve bits plus a bounded log of ``(version, xor)`` diffs"""
+
+    def __init__(self, history=4096):
+        self._cond = threading.Condition()
+        self._log = deque(maxlen=history)
+        self.bits = 0
+        self.version = 0
+
+    def publish(self, xor):
+        """Flip the bits in ``xor``; returns the new version (unchanged if ``xor`` is 0)"""
+        if not xor:
+            return self.version
+        with self._cond:
+            self.bits ^= xor
+            self.version += 1
+            self._log.append((self.version, xor))
+            self._cond.notify_all()
+            return self.version
+
+    def toggle(self, pos):
+        return self.publish(1 << pos)
+
+    def set_bits(self, mask, value):
+        """Open (``value=True``) or close every valve in ``mask``"""
+        with self._cond:
+            xor = ~self.bits & mask if value else self.bits & mask
+            return self.publish(xor)
+
+    def set_checked(self, pos, value, check):
+        """Open or close valve ``pos`` unless ``check(bits)`` objects to the move in the current state
+
+        The check and the write run under the service lock, so no other
+        session's move lands between them.  Returns ``check``'s objections
+        (empty when the move was applied).
+        """
+        with self._cond:
+            objections = check(self.bits)
+            if not objections:
+                self.set_bits(1 << pos, value)
+            return objections
+
+    def changes_since(self, version, local_bits):
+        """``(version, xor)`` folding every diff after ``version`` into one mask
+
+        If the log no longer reaches back to ``version`` the subscriber is
+        resynced against the snapshot instead (``xor = bits ^ local_bits``).
+        """
+        with self._cond:
+            current = self.version
+            if version == current:
+                return current, 0
+            if not self._log or self._log[0][0] > version + 1:
+                return current, self.bits ^ local_bits
+            xor = 0
+            for v, diff in reversed(self._log):
+                if v <= version:
+                    break
+                xor ^= diff
+            return current, xor
+
+    def wait(self, version, timeout=None):
+        """Block until the state moves past ``version``; returns the current version"""
+        with self._cond:
+            self._cond.wait_for(lambda: self.version != version, timeout)
+            return self.version
+
+    def subscribe(self):
+        return Subscription(self)
+
+    def history(self):
+        """Copy of the diff log, oldest first"""
+        with self._cond:
+            return list(self._log)
+
+
+class Subscription:
+    """One session's cursor into the diff log"""
+
+    __slots__ = ("service", "version")
+
+    def __init__(self, service):
+        self.service = service
+        self.version = 0
+
+    def poll(self, local_bits):
+        """XOR mask to apply to ``local_bits`` to catch up; 0 when nothing changed"""
+        version, xor = self.service.changes_since(self.version, local_bits)
+        self.version = version
+        return xor
+
+
+# One authoritative rig per server process
+RIG = RigStateService()
+METRICS.gauge("rig_state_version", "Valve moves published on the shared rig since start", lambda: RIG.version)
@@ -0,0 +1,226 @@
+"""Process-wide read-only cache of compiled systems.
+
+Geometry and drawings are identical for every operator, so they are parsed,
+normalized and decoded once per server process and shared by all sessions.
+Sessions keep only their valve-state bitmask and selection.  Entries are
+keyed on the source files' modification times, so a calibration save is
+picked up on the next access without an explicit invalidation.
+
+Everything handed out here is shared: callers must treat it as read-only
+(``image.copy()`` before drawing on it, ``model.to_json()`` before editing).
+"""
+import json
+import os
+import threading
+import time
+
+from utils.memory import deep_sizeof
+from utils.metrics import METRICS, SYSTEM_CACHE, SYSTEM_LOADS
+from utils.interlocks import RuleSet
+from utils.isolation import IsolationNetwork
+from utils.model import build_model
+from utils.reachability import Reachability
+from utils.solver import compile_topology
+from utils.spatial import SpatialIndex
+from utils.systems import get_config, get_system_files, resolve
+from utils.valve_state import TAGS, mask_of
+
+
+class CompiledSystem:
+    """Normalized model, decoded drawing, valve bit layout, spatial index and solver tables of one system"""
+
+    __slots__ = ("name", "config", "model", "png_path", "image", "positions", "mask", "index",
+                 "topology", "errors", "stamp", "seconds", "_sizes", "_reach", "_isolation", "_interlocks")
+
+    def __init__(self, name, model, png_path, image, errors, stamp, config=None):
+        self.name = name
+        self.config = get_config(name) if config is None else config
+        self.model = model
+        self.png_path = png_path
+        self.image = image
+        self.positions = TAGS.positions(model.tags)
+        self.mask = mask_of(self.positions)
+        self.index = SpatialIndex.from_model(model)
+        self.topology = compile_topology(model, self.config, self.positions, self.index)
+        self.errors = errors
+        self.stamp = stamp
+        self.seconds = 0.0  # compile time, set by get_system
+        self._sizes = None
+        self._reach = None
+        self._isolation = None
+        self._interlocks = None
+
+    @property
+    def reach(self):
+        """Reachability index over the solver tables (``utils.reachability``), built on first use"""
+        if self._reach is None:
+            self._reach = Reachability(self.topology)
+            self._sizes = None  # measured again with the new part
+        return self._reach
+
+    @property
+    def isolation(self):
+        """Pipe/valve flow network for isolation planning (``utils.isolation``), built on first use"""
+        if self._isolation is None:
+            self._isolation = IsolationNetwork(self)
+            self._sizes = None
+        return self._isolation
+
+    @property
+    def interlocks(self):
+        """Compiled interlock rules with their dependency index (``utils.interlocks``), built on first use"""
+        if self._interlocks is None:
+            self._interlocks = RuleSet(self)
+            self._sizes = None
+        return self._interlocks
+
+    def sizes(self):
+        """Retained bytes by part (image, model, index, topology, the lazy indexes, other)
+
+        Computed once, and again after a lazy index has been built; a part
+        not built yet counts 0.
+        """
+        if self._sizes is None:
+            seen = set()
+            sizes = {part: deep_sizeof(getattr(self, part), seen)
+                     for part in ("image", "model", "index", "topology")}
+            for part, value in (("reach", self._reach), ("isolation", self._isolation),
+                                ("interlocks", self._interlocks)):
+                sizes[part] = deep_sizeof(value, seen) if value is not None else 0
+            sizes["other"] = deep_sizeof((self.positions, self.errors, self.config), seen)
+            sizes["total"] = sum(sizes.values())
+            self._sizes = sizes
+        return self._sizes
+
+
+_lock = threading.Lock()
+_compile_locks = {}
+_systems = {}
+_last_used = {}
+_HITS = SYSTEM_CACHE.labels("hit")
+_MISSES = SYSTEM_CACHE.labels("miss")
+
+
+def _stamp(paths):
+    stamp = []
+    for path in paths:
+        try:
+            stamp.append(os.stat(resolve(path)).st_mtime_ns if path else None)
+        except OSError:
+            stamp.append(None)
+    return tuple(stamp)
+
+
+def _read_json(path, default, label, errors):
+    if not path or not os.path.exists(resolve(path)):
+        errors.append(f"Missing: {path}")
+        return default
+    try:
+        with open(resolve(path), 'r') as f:
+            return json.load(f)
+    except Exception as e:
+        errors.append(f"Error loading {label}: {e}")
+        return default
+
+
+def compile_system(system_name):
+    """Load, validate and decode one system (uncached)"""
+    from PIL import Image
+
+    valves_path, pipes_path, png_path = get_system_files(system_name)
+    stamp = _stamp((valves_path, pipes_path, png_path))
+    errors = []
+
+    valves = _read_json(valves_path, {}, "valves", errors)
+    pipes = _read_json(pipes_path, [], "pipes", errors)
+
+    image = None
+    if not png_path or not os.path.exists(resolve(png_path)):
+        errors.append(f"Missing: {png_path}")
+        png_path = None
+    else:
+        try:
+            image = Image.open(resolve(png_path)).convert("RGBA")
+        except Exception as e:
+            errors.append(f"Cannot load P&ID: {e}")
+
+    return compile_data(system_name, valves, pipes, image, png_path, errors, stamp)
+
+
+def compile_data(system_name, valves, pipes, image=None, png_path=None, errors=None, stamp=(), config=None):
+    """Compile in-memory valves/pipes JSON (not cached); ``config`` defaults to the registry entry"""
+    errors = [] if errors is None else errors
+    try:
+        model = build_model(system_name, valves, pipes)
+    except ValueError as e:
+        errors.append(f"Invalid system data: {e}")
+        model = build_model(system_name, {}, [])
+    return CompiledSystem(system_name, model, png_path, image, errors, stamp, config)
+
+
+def get_system(system_name):
+    """Shared CompiledSystem for ``system_name``, recompiled when its files change"""
+    stamp = _stamp(get_system_files(system_name))
+    _last_used[system_name] = time.monotonic()
+    compiled = _systems.get(system_name)
+    if compiled is not None and compiled.stamp == stamp:
+        _HITS.inc()
+        return compiled
+    # One lock per system: a slow compile never holds up a cache miss on another system
+    with _lock:
+        system_lock = _compile_locks.setdefault(system_name, threading.Lock())
+    with system_lock:
+        compiled = _systems.get(system_name)
+        if compiled is None or compiled.stamp != stamp:
+            _MISSES.inc()
+            previous = compiled
+            start = time.perf_counter()
+            compiled = compile_system(system_name)
+            if previous is not None and previous._reach is not None:
+                # A calibration save moves a few items: patch the old index instead of rebuilding it
+                compiled._reach = previous._reach.updated(compiled.topology)
+            compiled.seconds = time.perf_counter() - start
+            SYSTEM_LOADS.labels(system_name).observe(compiled.seconds)
+            with _lock:
+                _systems[system_name] = compiled
+        else:
+            _HITS.inc()
+    return compiled
+
+
+def invalidate(system_name=None):
+    """Drop one system (or all) from the cache"""
+    with _lock:
+        if system_name is None:
+            _systems.clear()
+        else:
+            _systems.pop(system_name, None)
+
+
+def evict_idle(keep=(), count=1):
+    """Drop up to ``count`` least recently used systems not in ``keep``; returns their names"""
+    with _lock:
+        idle = sorted((name for name in _systems if name not in keep),
+                      key=lambda name: _last_used.get(name, 0))[:count]
+        for name in idle:
+            del _systems[name]
+    return idle
+
+
+def cache_entries():
+    """``{name: (compiled, seconds since last use)}`` for everything currently cached"""
+    now = time.monotonic()
+    return {name: (compiled, now - _last_used.get(name, now)) for name, compiled in list(_systems.items())}
+
+
+def cache_footprint():
+    """Bytes held by the shared cache per system, plus a ``"total"`` entry"""
+    sizes = {name: compiled.sizes()["total"] for name, compiled in list(_systems.items())}
+    sizes["total"] = sum(sizes.values())
+    return sizes
+
+
+METRICS.gauge("rig_cached_systems", "Compiled systems held in the shared cache", lambda: len(_systems))
+METRICS.gauge("rig_system_cache_bytes", "Retained bytes per cached system",
+              lambda: {(name,): size for name, size in cache_footprint().items() if name != "total"},
+              ("system",))
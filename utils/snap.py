@@ -0,0 +1,258 @@
+"""Snap stored coordinates to the drawing.
+
+Hand-placed coordinates drift a few pixels off the lines they belong to
+(pipe ends at ``(87, 401)`` and ``(87, 399)`` that should meet), which the
+solver papers over with its 50-60 px leader radius.  This pass moves every
+valve and pipe end onto the drawing:
+
+* the line layer is the centrelines of the drawing's long horizontal and
+  vertical strokes (``utils.extraction``), so text and symbols do not
+  attract points; junctions are where a horizontal and a vertical
+  centreline meet
+* a truncated nearest-feature transform of each layer is computed once per
+  drawing (``NearestField``), after which every lookup is O(1)
+* a valve moves sideways onto the pipe it sits on, never along it (the
+  stroke is broken by the valve symbol, so the nearest ink along the pipe
+  is the end of the stroke, not the valve)
+* a pipe keeps its orientation: its shared coordinate is the median of
+  the nearest parallel centreline at points along it (robust to symbols
+  breaking the stroke), and each end moves onto a junction within
+  ``junction_radius``, if there is one
+
+Anything with no line within ``radius`` is left alone and reported.  Run it
+for every system in parallel from the command line:
+
+    python -m utils.snap                  # report only
+    python -m utils.snap mixing --write   # apply to data/*_mixing.json
+    python -m utils.snap --json snap.json
+"""
+import argparse
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from utils.extraction import binarize, centrelines
+from utils.systems import REGISTRY, get_system_files, resolve
+
+RADIUS = 12
+JUNCTION_RADIUS = 8
+
+
+class NearestField:
+    """Offset to the nearest set pixel of a mask, for every pixel within ``radius`` of one"""
+
+    __slots__ = ("radius", "dist2", "dy", "dx")
+
+    def __init__(self, mask, radius):
+        if radius > 127:
+            raise ValueError("radius must be at most 127 px")
+        self.radius = radius
+        height, width = mask.shape
+        # Nearest set pixel in the same column, above and below (vectorized over all columns)
+        rows = np.arange(height)[:, None]
+        far = height + radius + 1
+        above = np.maximum.accumulate(np.where(mask, rows, -far), axis=0)
+        below = np.minimum.accumulate(np.where(mask, rows, 2 * far)[::-1], axis=0)[::-1]
+        up, down = rows - above, below - rows
+        column_dy = np.where(up <= down, -up, down).clip(-radius - 1, radius + 1)
+        column_d2 = column_dy.astype(np.int32) ** 2
+
+        # Best over the columns within the radius: one shifted pass per column offset
+        sentinel = 2 * (radius + 1) ** 2
+        best = np.full(mask.shape, sentinel, dtype=np.int32)
+        best_dy = np.zeros(mask.shape, dtype=np.int8)
+        best_dx = np.zeros(mask.shape, dtype=np.int8)
+        for d in range(-radius, radius + 1):
+            if abs(d) >= width:
+                continue
+            target = slice(max(0, -d), width - max(0, d))
+            source = slice(max(0, d), width - max(0, -d))
+            cost = column_d2[:, source] + d * d
+            better = cost < best[:, target]
+            best[:, target] = np.where(better, cost, best[:, target])
+            best_dy[:, target] = np.where(better, column_dy[:, source], best_dy[:, target])
+            best_dx[:, target] = np.where(better, d, best_dx[:, target])
+        best[best > radius * radius] = sentinel
+        self.dist2, self.dy, self.dx = best, best_dy, best_dx
+
+    def nearest(self, x, y):
+        """``(x, y, distance)`` of the nearest set pixel, or None if none is within the radius"""
+        height, width = self.dist2.shape
+        xi, yi = int(round(x)), int(round(y))
+        if not (0 <= xi < width and 0 <= yi < height):
+            return None
+        d2 = int(self.dist2[yi, xi])
+        if d2 > self.radius * self.radius:
+            return None
+        return xi + int(self.dx[yi, xi]), yi + int(self.dy[yi, xi]), d2 ** 0.5
+
+
+class DrawingLayers:
+    """Horizontal-centreline, vertical-centreline and junction fields of one drawing"""
+
+    __slots__ = ("size", "horizontal", "vertical", "junctions")
+
+    def __init__(self, image, radius=RADIUS, junction_radius=JUNCTION_RADIUS, min_length=20, gap=6, tolerance=3):
+        mask = binarize(image)
+        height, width = mask.shape
+        self.size = (width, height)
+        horizontal = np.zeros(mask.shape, dtype=bool)
+        vertical = np.zeros(mask.shape, dtype=bool)
+        # Ends are drawn `tolerance` px long so a tee's stem reaches the header's centreline
+        for y, start, end in centrelines(mask, min_length, gap, tolerance).tolist():
+            horizontal[y, max(0, start - tolerance):end + tolerance + 1] = True
+        for x, start, end in centrelines(mask.T, min_length, gap, tolerance).tolist():
+            vertical[max(0, start - tolerance):end + tolerance + 1, x] = True
+        self.horizontal = NearestField(horizontal, radius)
+        self.vertical = NearestField(vertical, radius)
+        self.junctions = NearestField(horizontal & vertical, junction_radius)
+
+    def onto_line(self, x, y, reach=None):
+        """``(x, y)`` moved sideways onto the closest horizontal or vertical centreline, or None
+
+        The line may start up to ``reach`` px (default twice the radius) away
+        along its own direction, e.g. beyond the valve symbol sitting on it.
+        """
+        reach = 2 * self.horizontal.radius if reach is None else reach
+        best = None
+        for t in range(-reach, reach + 1, 2):
+            for hit, moved in ((self.horizontal.nearest(x + t, y), "y"), (self.vertical.nearest(x, y + t), "x")):
+                if hit is None:
+                    continue
+                # Rank by the sideways move, then by how far along the line had to be searched
+                side = abs(hit[1] - y) if moved == "y" else abs(hit[0] - x)
+                if best is None or (side, abs(t)) < best[0]:
+                    best = ((side, abs(t)), (x, hit[1]) if moved == "y" else (hit[0], y))
+        return best[1] if best else None
+
+    def line_coordinate(self, x1, y1, x2, y2, horizontal, samples=7):
+        """Median y (horizontal pipe) or x (vertical pipe) of the parallel centreline along a pipe, or None"""
+        field = self.horizontal if horizontal else self.vertical
+        found = []
+        for t in np.linspace(0.1, 0.9, samples):
+            hit = field.nearest(x1 + (x2 - x1) * t, y1 + (y2 - y1) * t)
+            if hit is not None:
+                found.append(hit[1] if horizontal else hit[0])
+        return int(np.median(found)) if found else None
+
+
+def _move(report, item, old, new, target):
+    if new is None:
+        report["unmatched"].append(item)
+        return old
+    x, y = new[0], new[1]
+    if (x, y) != tuple(old):
+        report["corrections"].append({"item": item, "from": list(old), "to": [x, y], "target": target,
+                                      "distance": round(float(np.hypot(x - old[0], y - old[1])), 1)})
+    return x, y
+
+
+def snap_pipe(layers, pipe, number, report):
+    """Snapped copy of one pipe dict; corrections go to ``report``"""
+    x1, y1, x2, y2 = pipe["x1"], pipe["y1"], pipe["x2"], pipe["y2"]
+    ends = [(x1, y1), (x2, y2)]
+    horizontal, vertical = abs(y2 - y1) <= 3 and x1 != x2, abs(x2 - x1) <= 3 and y1 != y2
+    if horizontal or vertical:
+        line = layers.line_coordinate(x1, y1, x2, y2, horizontal)
+        if line is None:
+            report["unmatched"].append(f"pipe {number}")
+            return dict(pipe)
+        # Keep the pipe straight: both ends take the line's coordinate
+        ends = [(x, line) if horizontal else (line, y) for x, y in ends]
+    snapped = []
+    for (x, y), (ox, oy), label in zip(ends, [(x1, y1), (x2, y2)], ("start", "end")):
+        item = f"pipe {number} {label}"
+        junction = layers.junctions.nearest(x, y)
+        if junction is not None:
+            snapped.append(_move(report, item, (ox, oy), junction, "junction"))
+        elif horizontal or vertical:
+            snapped.append(_move(report, item, (ox, oy), (x, y), "line"))
+        else:
+            snapped.append(_move(report, item, (ox, oy), layers.onto_line(x, y), "line"))
+    (nx1, ny1), (nx2, ny2) = snapped
+    return dict(pipe, x1=nx1, y1=ny1, x2=nx2, y2=ny2)
+
+
+def snap_valves(layers, valves, report):
+    result = {}
+    for tag, valve in valves.items():
+        old = (valve["x"], valve["y"])
+        x, y = _move(report, f"valve {tag}", old, layers.onto_line(*old), "line")
+        result[tag] = dict(valve, x=x, y=y)
+    return result
+
+
+def snap_system(system_name, radius=RADIUS, junction_radius=JUNCTION_RADIUS, write=False):
+    """Snap one system's valves and pipes; returns the report (and writes the files if ``write``)"""
+    from PIL import Image
+
+    valves_path, pipes_path, png_path = get_system_files(system_name)
+    report = {"system": system_name, "corrections": [], "unmatched": [], "errors": []}
+    try:
+        with open(resolve(valves_path), 'r') as f:
+            valves = json.load(f)
+        with open(resolve(pipes_path), 'r') as f:
+            pipes = json.load(f)
+        image = Image.open(resolve(png_path))
+    except (OSError, ValueError, TypeError) as e:
+        report["errors"].append(str(e))
+        return report
+
+    layers = DrawingLayers(image, radius, junction_radius)
+    snapped_valves = snap_valves(layers, valves, report)
+    snapped_pipes = [snap_pipe(layers, pipe, i + 1, report) for i, pipe in enumerate(pipes)]
+    report["items"] = len(valves) + 2 * len(pipes)
+    if write and report["corrections"]:
+        with open(resolve(valves_path), 'w') as f:
+            json.dump(snapped_valves, f, indent=2)
+        with open(resolve(pipes_path), 'w') as f:
+            json.dump(snapped_pipes, f, indent=2)
+        report["written"] = [valves_path, pipes_path]
+    return report
+
+
+def snap_all(systems=None, write=False, **options):
+    """``{system: report}`` for ``systems`` (default: all registered), snapped in parallel"""
+    systems = list(REGISTRY) if systems is None else list(systems)
+    with ThreadPoolExecutor(max_workers=min(8, len(systems) or 1)) as pool:
+        reports = pool.map(lambda name: snap_system(name, write=write, **options), systems)
+        return {report["system"]: report for report in reports}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Snap valve and pipe coordinates to the P&ID drawings")
+    parser.add_argument("systems", nargs="*", help="registry keys (default: all)")
+    parser.add_argument("--radius", type=int, default=RADIUS, help="largest move onto a line (px)")
+    parser.add_argument("--junction-radius", type=int, default=JUNCTION_RADIUS,
+                        help="largest move of a pipe end onto a junction (px)")
+    parser.add_argument("--write", action="store_true", help="save the snapped coordinates")
+    parser.add_argument("--json", help="write the full report to this file")
+    parser.add_argument("--verbose", "-v", action="store_true", help="list every correction")
+    args = parser.parse_args(argv)
+
+    reports = snap_all(args.systems or None, write=args.write, radius=args.radius,
+                       junction_radius=args.junction_radius)
+    for name, report in reports.items():
+        if report["errors"]:
+            print(f"{name:<8} error: {'; '.join(report['errors'])}")
+            continue
+        moves = [c["distance"] for c in report["corrections"]]
+        print(f"{name:<8} {len(moves):>4} of {report['items']} points moved"
+              + (f" (mean {np.mean(moves):.1f} px, max {max(moves):.1f} px)" if moves else "")
+              + (f", {len(report['unmatched'])} with no line within {args.radius} px" if report["unmatched"] else "")
+              + (" - written" if report.get("written") else ""))
+        if args.verbose:
+            for c in report["corrections"]:
+                print(f"    {c['item']:<16} {tuple(c['from'])} -> {tuple(c['to'])}  {c['target']}")
+            for item in report["unmatched"]:
+                print(f"    {item:<16} no line nearby")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(reports, f, indent=2)
+    return 1 if any(r["errors"] for r in reports.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
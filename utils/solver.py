@@ -0,0 +1,99 @@
+"""Flow and pressure solver shared by every system.
+
+The per-system rules from the old page scripts are compiled once into
+bitmasks over pipe IDs and valve bit positions (``utils.valve_state``):
+
+* a pipe is an *active leader* when an open valve is within the system's
+  ``leader_radius`` of its start point, or when a valve hard-wired to it in
+  ``valve_bindings`` is open;
+* a pipe flows when it is an active leader or belongs to the group of one;
+* source pipes are always pressurized, and every pipe is pressurized once a
+  source leader is active (with groups, only group leaders count).
+
+Solving a valve state is then one AND per leader pipe, with no geometry.
+"""
+
+
+class Topology:
+    """Compiled solver tables of one system; read-only and shared"""
+
+    __slots__ = ("pipe_count", "all_mask", "leaders", "groups", "sources_mask", "pressure_leaders")
+
+    def __init__(self, pipe_count, leaders, groups, sources_mask, pressure_leaders):
+        self.pipe_count = pipe_count
+        self.all_mask = (1 << pipe_count) - 1
+        self.leaders = leaders  # [(pipe_id, valve_bit_mask)]
+        self.groups = groups  # [(leader_pipe_id, member_pipe_mask)]
+        self.sources_mask = sources_mask & self.all_mask
+        self.pressure_leaders = pressure_leaders & self.all_mask
+
+
+class Solution:
+    """Flowing and pressurized pipes as bitmasks over pipe IDs"""
+
+    __slots__ = ("flow", "pressure")
+
+    def __init__(self, flow, pressure):
+        self.flow = flow
+        self.pressure = pressure
+
+    def has_flow(self, pipe_id):
+        return bool(self.flow >> pipe_id & 1)
+
+    def has_pressure(self, pipe_id):
+        return bool(self.pressure >> pipe_id & 1)
+
+    @property
+    def flowing(self):
+        """Pipes that are both flowing and pressurized (drawn green)"""
+        return (self.flow & self.pressure).bit_count()
+
+    @property
+    def pressurized(self):
+        return self.pressure.bit_count()
+
+
+def _pipe_mask(numbers, pipe_count):
+    mask = 0
+    for n in numbers:
+        if 1 <= n <= pipe_count:
+            mask |= 1 << (n - 1)
+    return mask
+
+
+def compile_topology(model, config, positions, index):
+    """Build the solver tables for ``model`` from its registry ``config``"""
+    from utils.valve_state import TAGS
+
+    pipe_count = len(model.pipes)
+    near = [0] * pipe_count
+    for pipe in model.pipes:
+        for _, valve_id in index.points_within(pipe.x1, pipe.y1, config.leader_radius):
+            near[pipe.id] |= 1 << positions[valve_id]
+    for tag, number in config.valve_bindings.items():
+        if 1 <= number <= pipe_count:
+            near[number - 1] |= 1 << TAGS.position(tag)
+    leaders = [(pipe_id, mask) for pipe_id, mask in enumerate(near) if mask]
+
+    groups = [(leader - 1, _pipe_mask(members, pipe_count))
+              for leader, members in config.groups.items() if 1 <= leader <= pipe_count]
+    sources_mask = _pipe_mask(config.pressure_sources, pipe_count)
+    if config.groups:
+        pressure_leaders = _pipe_mask(config.groups, pipe_count) & sources_mask
+    else:
+        pressure_leaders = sources_mask
+    return Topology(pipe_count, leaders, groups, sources_mask, pressure_leaders)
+
+
+def solve(topology, bits):
+    """Flow/pressure ``Solution`` for the valve-state bitmask ``bits``"""
+    active = 0
+    for pipe_id, mask in topology.leaders:
+        if bits & mask:
+            active |= 1 << pipe_id
+    flow = active
+    for leader, members in topology.groups:
+        if active >> leader & 1:
+            flow |= members
+    pressure = topology.all_mask if active & topology.pressure_leaders else topology.sources_mask
+    return Solution(flow, pressure)
@@ -0,0 +1,100 @@
+"""Uniform-grid spatial index over valve points and pipe segments.
+
+Each valve is bucketed by the grid cell it falls in and each pipe segment
+by every cell its bounding box covers (P&ID pipes are nearly all horizontal
+or vertical runs, so the boxes are tight).  A radius query then only looks
+at the handful of cells around the query point, so hit-testing and
+proximity checks stay O(1) on average regardless of rig size.
+"""
+import math
+
+
+def point_segment_distance(px, py, x1, y1, x2, y2):
+    dx, dy = x2 - x1, y2 - y1
+    length_sq = dx * dx + dy * dy
+    if length_sq == 0:
+        return math.hypot(px - x1, py - y1)
+    t = max(0.0, min(1.0, ((px - x1) * dx + (py - y1) * dy) / length_sq))
+    return math.hypot(px - (x1 + t * dx), py - (y1 + t * dy))
+
+
+class SpatialIndex:
+    __slots__ = ("cell", "points", "segments", "_point_cells", "_segment_cells")
+
+    def __init__(self, points, segments, cell=32):
+        """``points``: [(x, y)], ``segments``: [(x1, y1, x2, y2)]; IDs are list positions"""
+        self.cell = cell
+        self.points = points
+        self.segments = segments
+        self._point_cells = {}
+        self._segment_cells = {}
+        for i, (x, y) in enumerate(points):
+            self._point_cells.setdefault((int(x // cell), int(y // cell)), []).append(i)
+        for i, (x1, y1, x2, y2) in enumerate(segments):
+            for key in self._cells(min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)):
+                self._segment_cells.setdefault(key, []).append(i)
+
+    @classmethod
+    def from_model(cls, model, cell=32):
+        return cls([(v.x, v.y) for v in model.valves],
+                   [(p.x1, p.y1, p.x2, p.y2) for p in model.pipes], cell)
+
+    def _cells(self, x0, y0, x1, y1):
+        c = self.cell
+        for cx in range(int(x0 // c), int(x1 // c) + 1):
+            for cy in range(int(y0 // c), int(y1 // c) + 1):
+                yield cx, cy
+
+    def points_within(self, x, y, radius):
+        """``[(distance, id)]`` of points within ``radius`` of (x, y), nearest first"""
+        hits = []
+        for key in self._cells(x - radius, y - radius, x + radius, y + radius):
+            for i in self._point_cells.get(key, ()):
+                px, py = self.points[i]
+                d = math.hypot(px - x, py - y)
+                if d <= radius:
+                    hits.append((d, i))
+        hits.sort()
+        return hits
+
+    def segments_within(self, x, y, radius):
+        """``[(distance, id)]`` of segments passing within ``radius`` of (x, y), nearest first"""
+        seen = set()
+        hits = []
+        for key in self._cells(x - radius, y - radius, x + radius, y + radius):
+            for i in self._segment_cells.get(key, ()):
+                if i in seen:
+                    continue
+                seen.add(i)
+                d = point_segment_distance(x, y, *self.segments[i])
+                if d <= radius:
+                    hits.append((d, i))
+        hits.sort()
+        return hits
+
+    def any_point_within(self, x, y, radius):
+        """True if some point lies within ``radius`` of (x, y); stops at the first"""
+        for key in self._cells(x - radius, y - radius, x + radius, y + radius):
+            for i in self._point_cells.get(key, ()):
+                px, py = self.points[i]
+                if math.hypot(px - x, py - y) <= radius:
+                    return True
+        return False
+
+    def any_segment_within(self, x, y, radius, exclude=None):
+        """True if a segment other than ``exclude`` passes within ``radius`` of (x, y); stops at the first"""
+        for key in self._cells(x - radius, y - radius, x + radius, y + radius):
+            for i in self._segment_cells.get(key, ()):
+                if i != exclude and point_segment_distance(x, y, *self.segments[i]) <= radius:
+                    return True
+        return False
+
+    def nearest(self, x, y, radius=15):
+        """Hit-test a click: ``("valve", id)``, ``("pipe", id)`` or None; valves win ties"""
+        valves = self.points_within(x, y, radius)
+        if valves:
+            return "valve", valves[0][1]
+        pipes = self.segments_within(x, y, radius)
+        if pipes:
+            return "pipe", pipes[0][1]
+        return None
@@ -0,0 +1,261 @@
+"""Seeded synthetic rigs for scale and stress testing.
+
+Layouts look like the shipped P&IDs: horizontal headers fed from a source
+on the left, vertical branch drops tapped off them (alternating up and
+down), a short outlet stub at the end of each branch, an isolation valve
+next to every tap, block valves along the headers and valves on some
+stubs.  Every segment is orthogonal and on a pixel grid.
+
+Geometry is built with numpy in one pass (no per-segment Python), and the
+drawing is rasterized the same way, so a 100k-segment rig is produced in
+seconds.  Output uses the ``data/pipes_*.json`` / ``data/valves_*.json``
+schema plus a PNG, and can be added to the system registry:
+
+    python -m utils.synthetic 100000 --seed 7 --name synth_100k --register
+"""
+import argparse
+import json
+import math
+import os
+import sys
+
+import numpy as np
+
+from utils.systems import REGISTRY_PATH, ROOT
+
+MIN_DEPTH, MAX_DEPTH = 2, 6  # vertical segments per branch
+BLOCK_VALVE_EVERY = 8  # a block valve on every Nth header segment
+STUB_VALVE_RATE = 0.3
+
+
+class SyntheticRig:
+    """Generated geometry: ``pipes`` is an (n, 4) array of x1, y1, x2, y2"""
+
+    __slots__ = ("name", "seed", "pipes", "valve_xy", "tags", "sources", "size", "pitch")
+
+    def __init__(self, name, seed, pipes, valve_xy, sources, size, pitch):
+        self.name = name
+        self.seed = seed
+        self.pipes = pipes
+        self.valve_xy = valve_xy
+        width = len(str(len(valve_xy)))
+        self.tags = [f"SV-{i:0{width}d}" for i in range(1, len(valve_xy) + 1)]
+        self.sources = sources  # 1-based pipe numbers, as in the registry
+        self.size = size
+        self.pitch = pitch
+
+    def pipes_json(self):
+        return [{"x1": x1, "y1": y1, "x2": x2, "y2": y2} for x1, y1, x2, y2 in self.pipes.tolist()]
+
+    def valves_json(self):
+        return {tag: {"x": x, "y": y, "state": False}
+                for tag, (x, y) in zip(self.tags, self.valve_xy.tolist())}
+
+    def image(self, labels=None):
+        """Grayscale drawing of the rig (PIL image); tags are drawn for small rigs"""
+        return draw(self, labels)
+
+    def interlocks(self, count, seed=None):
+        """``count`` random interlock rules (``utils.interlocks`` schema) over this rig's valves and pipes"""
+        rng = np.random.default_rng(self.seed if seed is None else seed)
+        rules = []
+        for _ in range(count):
+            rule = {"valve": self.tags[rng.integers(len(self.tags))], "action": ("open", "close")[rng.integers(2)]}
+            for name in ("closed", "open"):
+                if rng.random() < 0.5:
+                    rule[name] = [self.tags[i] for i in rng.choice(len(self.tags), rng.integers(1, 4))]
+            for name in ("flowing", "not_flowing", "pressurized", "depressurized"):
+                if rng.random() < 0.25:
+                    rule[name] = (rng.integers(len(self.pipes), size=rng.integers(1, 3)) + 1).tolist()
+            if len(rule) == 2:
+                rule["closed"] = [self.tags[rng.integers(len(self.tags))]]
+            rules.append(rule)
+        return rules
+
+    def registry_entry(self, valves_path, pipes_path, png_path):
+        return {
+            "display_name": f"Synthetic {len(self.pipes):,} ({self.name})",
+            "nav_label": f"🧪 {self.name}",
+            "valves": valves_path,
+            "pipes": pipes_path,
+            "png": png_path,
+            "pressure_sources": self.sources,
+            "leader_radius": max(2 * self.pitch, 8),
+            "groups": {},
+            "valve_bindings": {},
+        }
+
+
+def _ragged(counts):
+    """(owner, offset) for ``counts[i]`` items per owner, e.g. [2, 1] -> [0, 0, 1], [0, 1, 0]"""
+    owner = np.repeat(np.arange(len(counts)), counts)
+    starts = np.cumsum(counts) - counts
+    return owner, np.arange(counts.sum()) - starts[owner]
+
+
+def generate(segments, seed=0, max_side=4096, name=None):
+    """Rig with exactly ``segments`` pipe segments (at least 3)"""
+    if segments < 3:
+        raise ValueError("a synthetic rig needs at least 3 segments")
+    rng = np.random.default_rng(seed)
+
+    # Each branch costs one header segment, `depth` drops and one stub
+    depth = rng.integers(MIN_DEPTH, MAX_DEPTH + 1, size=segments // (MIN_DEPTH + 2) + 1)
+    total = np.cumsum(depth + 2)
+    branches = int(np.searchsorted(total, segments)) + 1
+    depth = depth[:branches].copy()
+    depth[-1] -= int(total[branches - 1]) - segments  # trim the last branch to hit the target
+    if depth[-1] < 1:  # too short to keep a drop: fold its segments into the previous branch
+        depth[-2] += depth[-1] + 2
+        depth, branches = depth[:-1], branches - 1
+
+    # Roughly 4:3 sheet: branch columns 3 pitches apart, header rows 2 * (MAX_DEPTH + 2) apart
+    headers = max(1, round(math.sqrt(branches * 3 * 3 / (4 * 2 * (MAX_DEPTH + 2)))))
+    per_header = math.ceil(branches / headers)
+    width_units, height_units = 3 * per_header + 4, 2 * (MAX_DEPTH + 2) * headers + 2
+    pitch = max(3, min(16, max_side // max(width_units, height_units)))
+    margin = 2 * pitch
+
+    branch = np.arange(branches)
+    header, column = np.divmod(branch, per_header)
+    header_y = margin + pitch * (MAX_DEPTH + 2) * (2 * header + 1)
+    tap_x = margin + 3 * pitch * (column + 1)
+    direction = np.where(column % 2 == 0, 1, -1)  # drops alternate below / above the header
+
+    # Header segment leading into each tap (the first one of a header starts at the source)
+    header_segments = np.stack([tap_x - 3 * pitch, header_y, tap_x, header_y], axis=1)
+    # Vertical drops
+    owner, step = _ragged(depth)
+    y0 = header_y[owner] + direction[owner] * pitch * step
+    drops = np.stack([tap_x[owner], y0, tap_x[owner], y0 + direction[owner] * pitch], axis=1)
+    # Outlet stubs
+    end_y = header_y + direction * pitch * depth
+    stubs = np.stack([tap_x, end_y, tap_x + pitch, end_y], axis=1)
+    pipes = np.concatenate([header_segments, drops, stubs]).astype(np.int32)
+
+    # Isolation valve half a pitch below/above every tap, block valves, some stub valves
+    isolation = np.stack([tap_x, header_y + direction * (pitch // 2)], axis=1)
+    block = header_segments[(column % BLOCK_VALVE_EVERY) == BLOCK_VALVE_EVERY // 2]
+    block = np.stack([(block[:, 0] + block[:, 2]) // 2, block[:, 1]], axis=1)
+    on_stub = rng.random(branches) < STUB_VALVE_RATE
+    stub_valves = np.stack([tap_x[on_stub] + pitch // 2, end_y[on_stub]], axis=1)
+    valve_xy = np.concatenate([isolation, block, stub_valves]).astype(np.int32)
+
+    # Each header's first segment is fed by a pressure source
+    sources = (np.flatnonzero(column == 0) + 1).tolist()
+    size = (int(margin * 2 + 3 * pitch * (per_header + 1)),
+            int(margin * 2 + pitch * (MAX_DEPTH + 2) * 2 * headers))
+    return SyntheticRig(name or f"synthetic_{segments}", seed, pipes, valve_xy, sources, size, pitch)
+
+
+def _paint_runs(canvas, runs, axis, thickness):
+    """Darken horizontal (axis=1) or vertical (axis=0) runs with a difference array"""
+    if not len(runs):
+        return
+    height, width = canvas.shape
+    diff = np.zeros((height + 1, width + 1), dtype=np.int32)
+    if axis == 1:
+        lines, start, stop = runs[:, 1], np.minimum(runs[:, 0], runs[:, 2]), np.maximum(runs[:, 0], runs[:, 2])
+    else:
+        lines, start, stop = runs[:, 0], np.minimum(runs[:, 1], runs[:, 3]), np.maximum(runs[:, 1], runs[:, 3])
+    for offset in range(-(thickness // 2), thickness - thickness // 2):
+        line = np.clip(lines + offset, 0, (height if axis == 1 else width) - 1)
+        if axis == 1:
+            np.add.at(diff, (line, start), 1)
+            np.add.at(diff, (line, stop + 1), -1)
+        else:
+            np.add.at(diff, (start, line), 1)
+            np.add.at(diff, (stop + 1, line), -1)
+    covered = np.cumsum(diff, axis=axis)[:height, :width] > 0
+    canvas[covered] = 0
+
+
+def _valve_stencil(radius):
+    """Pixel offsets of a bow-tie valve symbol"""
+    dy, dx = np.mgrid[-radius:radius + 1, -radius:radius + 1]
+    mask = np.abs(dy) <= np.abs(dx)
+    return dx[mask], dy[mask]
+
+
+def draw(rig, labels=None):
+    """Rasterize pipes, valves and source markers; ``labels`` defaults to small rigs only"""
+    from PIL import Image, ImageDraw
+
+    width, height = rig.size
+    canvas = np.full((height, width), 255, dtype=np.uint8)
+    thickness = 2 if rig.pitch >= 6 else 1
+    horizontal = rig.pipes[:, 1] == rig.pipes[:, 3]
+    _paint_runs(canvas, rig.pipes[horizontal], 1, thickness)
+    _paint_runs(canvas, rig.pipes[~horizontal], 0, thickness)
+
+    dx, dy = _valve_stencil(max(2, rig.pitch // 3))
+    xs = np.clip(rig.valve_xy[:, :1] + dx, 0, width - 1)
+    ys = np.clip(rig.valve_xy[:, 1:] + dy, 0, height - 1)
+    canvas[ys, xs] = 0
+
+    # Sources: filled square at the start of each fed header
+    starts = rig.pipes[np.asarray(rig.sources, dtype=np.intp) - 1]
+    r = max(2, rig.pitch // 2)
+    sx, sy = np.meshgrid(np.arange(-r, r + 1), np.arange(-r, r + 1))
+    canvas[np.clip(starts[:, 1:2, None] + sy, 0, height - 1),
+           np.clip(starts[:, 0:1, None] + sx, 0, width - 1)] = 96
+
+    image = Image.fromarray(canvas)  # uint8 2-D -> grayscale "L"
+    if labels is None:
+        labels = len(rig.tags) <= 2000
+    if labels:
+        text = ImageDraw.Draw(image)
+        for tag, (x, y) in zip(rig.tags, rig.valve_xy.tolist()):
+            text.text((x + 4, y - 12), tag, fill=0)
+    return image
+
+
+def write(rig, root=ROOT, register=False):
+    """Write ``data/{pipes,valves}_<name>.json`` and ``assets/p&id_<name>.png``; returns the paths"""
+    valves_path = f"data/valves_{rig.name}.json"
+    pipes_path = f"data/pipes_{rig.name}.json"
+    png_path = f"assets/p&id_{rig.name}.png"
+    with open(os.path.join(root, valves_path), 'w') as f:
+        json.dump(rig.valves_json(), f)
+    with open(os.path.join(root, pipes_path), 'w') as f:
+        json.dump(rig.pipes_json(), f)
+    rig.image().save(os.path.join(root, png_path), optimize=False, compress_level=1)
+
+    if register:
+        registry_path = os.path.join(root, os.path.relpath(REGISTRY_PATH, ROOT))
+        with open(registry_path, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+        entries[rig.name] = rig.registry_entry(valves_path, pipes_path, png_path)
+        with open(registry_path, 'w', encoding='utf-8') as f:
+            json.dump(entries, f, indent=2, ensure_ascii=False)
+            f.write("\n")
+    return valves_path, pipes_path, png_path
+
+
+def main(argv=None):
+    import time
+
+    parser = argparse.ArgumentParser(description="Generate a synthetic rig (JSON + PNG)")
+    parser.add_argument("segments", type=int, help="number of pipe segments")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--name", help="system key / file suffix (default synthetic_<segments>)")
+    parser.add_argument("--max-side", type=int, default=4096, help="largest drawing side in pixels")
+    parser.add_argument("--register", action="store_true", help="add the rig to data/systems.json")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    rig = generate(args.segments, args.seed, args.max_side, args.name)
+    built = time.perf_counter()
+    paths = write(rig, register=args.register)
+    done = time.perf_counter()
+    print(f"{rig.name}: {len(rig.pipes)} pipes, {len(rig.tags)} valves, {len(rig.sources)} sources, "
+          f"{rig.size[0]}x{rig.size[1]} px (pitch {rig.pitch})")
+    print(f"generated in {(built - start) * 1000:.0f} ms, written in {(done - built) * 1000:.0f} ms")
+    for path in paths:
+        print(f"  {path}")
+    if args.register:
+        print("  registered in data/systems.json")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
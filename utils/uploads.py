@@ -0,0 +1,71 @@
+"""Uploaded drawings for the marker tool: decoded once, shown as a preview.
+
+Streamlit hands the script the same upload on every rerun.  ``load_drawing``
+hashes it the first time it is seen (keyed on the upload's file id), decodes
+it, and builds a preview no larger than ``max_side`` px together with its
+PNG data URL, and keeps that in the session.  Later reruns reuse all three,
+so a widget interaction costs neither a decode nor a full-size transfer.
+
+Everything is marked up on the preview and stored at full resolution:
+``to_full`` / ``to_preview`` convert between the two.
+"""
+import hashlib
+
+from utils.pid_click import encode_png
+
+PREVIEW_SIDE = 1600
+
+
+class Drawing:
+    """One decoded upload: full image, preview image, preview data URL and preview scale"""
+
+    __slots__ = ("file_id", "digest", "name", "image", "preview", "preview_url", "scale")
+
+    def __init__(self, file_id, digest, name, image, max_side=PREVIEW_SIDE):
+        self.file_id = file_id
+        self.digest = digest
+        self.name = name
+        self.image = image
+        width, height = image.size
+        self.scale = min(1.0, max_side / max(width, height))
+        if self.scale < 1:
+            self.preview = image.resize((round(width * self.scale), round(height * self.scale)))
+        else:
+            self.preview = image
+        self.preview_url = encode_png(self.preview)
+
+    @property
+    def size(self):
+        return self.image.size
+
+    def to_full(self, x, y):
+        """Preview pixel -> full-resolution pixel"""
+        return round(x / self.scale), round(y / self.scale)
+
+    def to_preview(self, x, y):
+        return x * self.scale, y * self.scale
+
+
+def load_drawing(uploaded_file, state, key="drawing", max_side=PREVIEW_SIDE):
+    """The ``Drawing`` for ``uploaded_file``, decoded only when a new file arrives
+
+    ``state`` is the session state; the drawing is kept under ``key``.
+    """
+    from PIL import Image
+
+    drawing = state.get(key)
+    file_id = getattr(uploaded_file, "file_id", None) or uploaded_file.name
+    if drawing is not None and drawing.file_id == file_id:
+        return drawing
+    data = uploaded_file.getvalue()
+    digest = hashlib.sha256(data).hexdigest()
+    if drawing is not None and drawing.digest == digest:
+        drawing.file_id = file_id  # same file uploaded again
+        return drawing
+    image = Image.open(uploaded_file)
+    image.load()
+    if image.mode not in ("RGB", "RGBA", "L"):
+        image = image.convert("RGB")
+    drawing = Drawing(file_id, digest, uploaded_file.name, image, max_side)
+    state[key] = drawing
+    return drawing
@@ -0,0 +1,162 @@
+"""Bitset valve state.
+
+Every canonical valve tag gets a dense bit position from a process-wide,
+append-only ``TagRegistry``.  A session's valve state is then a single
+Python int: toggling is one XOR, the "Open Valves" metric is a popcount and
+``states.key(mask)`` is a cheap hashable cache key.  Tags shared between
+systems (``V-216`` is on both the DGS and Seal drawings) map to the same bit,
+so opening a valve in one system still shows it open everywhere.
+
+``ValveStates`` keeps the old ``tag -> bool`` dict interface (``get``,
+``[]``, ``values()``, ...) for code that has not moved to bit positions.
+"""
+import threading
+from collections.abc import MutableMapping
+
+from utils.model import canonical_tag
+
+
+class TagRegistry:
+    """Append-only canonical tag -> bit position table, shared by all sessions"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.index = {}
+        self.tags = []
+
+    def position(self, tag):
+        pos = self.index.get(tag)
+        if pos is not None:
+            return pos
+        tag = canonical_tag(tag)
+        with self._lock:
+            pos = self.index.get(tag)
+            if pos is None:
+                pos = len(self.tags)
+                self.tags.append(tag)
+                self.index[tag] = pos
+        return pos
+
+    def find(self, tag):
+        """Bit position of an already registered tag, or None"""
+        pos = self.index.get(tag)
+        if pos is None and isinstance(tag, str):
+            pos = self.index.get(tag.strip().upper())
+        return pos
+
+    def positions(self, tags):
+        return tuple(self.position(tag) for tag in tags)
+
+
+TAGS = TagRegistry()
+
+
+def mask_of(positions):
+    """Bitmask with the given bit positions set"""
+    mask = 0
+    for pos in positions:
+        mask |= 1 << pos
+    return mask
+
+
+def bits_of(mask):
+    """Bit positions set in ``mask``, lowest first"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class ValveStates(MutableMapping):
+    """Valve open/closed state as an int bitmask, with dict-style access by tag"""
+
+    __slots__ = ("bits", "known")
+    registry = TAGS
+
+    def __init__(self, states=None):
+        self.bits = 0   # set bit = valve open
+        self.known = 0  # set bit = tag has a state in this session
+        if states:
+            self.update(states)
+
+    # ---- bit-level API ----
+    def positions(self, model):
+        """Bit positions of a SystemModel's valves, indexed by valve ID"""
+        return self.registry.positions(model.tags)
+
+    def is_open(self, pos):
+        return (self.bits >> pos) & 1 == 1
+
+    def toggle(self, pos):
+        self.known |= 1 << pos
+        self.bits ^= 1 << pos
+
+    def set_bit(self, pos, value):
+        self.known |= 1 << pos
+        if value:
+            self.bits |= 1 << pos
+        else:
+            self.bits &= ~(1 << pos)
+
+    def apply(self, xor):
+        """Flip the bits in ``xor`` (a diff from ``utils.rig_bus``)"""
+        self.known |= xor
+        self.bits ^= xor
+
+    def close_all(self, mask):
+        self.known |= mask
+        self.bits &= ~mask
+
+    def count_open(self, mask=None):
+        return (self.bits if mask is None else self.bits & mask).bit_count()
+
+    def key(self, mask=None):
+        """Hashable snapshot of the state (restricted to ``mask``) for cache keys"""
+        return self.bits if mask is None else self.bits & mask
+
+    # ---- dict-style API ----
+    def __getitem__(self, tag):
+        pos = self.registry.find(tag)
+        if pos is None or not (self.known >> pos) & 1:
+            raise KeyError(tag)
+        return self.is_open(pos)
+
+    def get(self, tag, default=None):
+        pos = self.registry.find(tag)
+        if pos is None or not (self.known >> pos) & 1:
+            return default
+        return self.is_open(pos)
+
+    def __contains__(self, tag):
+        pos = self.registry.find(tag)
+        return pos is not None and (self.known >> pos) & 1 == 1
+
+    def __setitem__(self, tag, value):
+        self.set_bit(self.registry.position(tag), bool(value))
+
+    def __delitem__(self, tag):
+        pos = self.registry.find(tag)
+        if pos is None or not (self.known >> pos) & 1:
+            raise KeyError(tag)
+        self.known &= ~(1 << pos)
+        self.bits &= ~(1 << pos)
+
+    def __iter__(self):
+        known, tags = self.known, self.registry.tags
+        while known:
+            low = known & -known
+            yield tags[low.bit_length() - 1]
+            known ^= low
+
+    def __len__(self):
+        return self.known.bit_count()
+
+    def __eq__(self, other):
+        if isinstance(other, ValveStates):
+            return self.bits == other.bits and self.known == other.known
+        return MutableMapping.__eq__(self, other)
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"ValveStates(open={self.count_open()}, known={len(self)})"
@@ -0,0 +1,126 @@
+"""Warm-up: precompile every registered system into the shared cache.
+
+Run once per server process, in parallel, so the first operator to open a
+system does not pay for JSON parsing and PNG decoding.  The result is a
+manifest (file status, counts, timings, errors per system) that the home
+page reads instead of checking every path on each rerun.
+
+Start the server with warm-up at boot:
+
+    python -m utils.warmup run streamlit_app.py [streamlit options]
+
+``streamlit run streamlit_app.py`` still works; the dashboard then starts
+warm-up in the background on its first run.  ``RIG_WARMUP=0`` turns the
+background warm-up off (systems then compile on first use), which the
+cold-start benchmark uses to measure a page on its own.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.lint import lint_system, summary
+from utils.shared import get_system
+from utils.systems import REGISTRY, get_system_files, resolve
+
+log = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_done = threading.Event()
+_started = False
+MANIFEST = {}
+
+
+def _warm_system(system_name):
+    valves_path, pipes_path, png_path = get_system_files(system_name)
+    files = {
+        kind: {"path": path, "exists": bool(path) and os.path.exists(resolve(path))}
+        for kind, path in (("valves", valves_path), ("pipes", pipes_path), ("png", png_path))
+    }
+    try:
+        compiled = get_system(system_name)
+        errors = list(compiled.errors)
+        counts = {"valves": len(compiled.model.valves), "pipes": len(compiled.model.pipes)}
+        # Compile time only, not the wait for another thread compiling the same system
+        seconds = compiled.seconds
+    except Exception as e:  # keep warming the other systems
+        errors = [f"Warm-up failed: {e}"]
+        counts = {"valves": 0, "pipes": 0}
+        seconds = 0.0
+    start = time.perf_counter()
+    try:
+        findings = lint_system(system_name)
+    except Exception as e:  # the linter must never hold up warm-up
+        findings = []
+        log.warning("lint %s failed: %s", system_name, e)
+    lint_seconds = time.perf_counter() - start
+    entry = {
+        "ready": all(f["exists"] for f in files.values()) and not errors,
+        "files": files,
+        "errors": errors,
+        "seconds": seconds,
+        "lint_seconds": lint_seconds,
+        "lint": summary(findings),
+        "findings": findings,
+        **counts,
+    }
+    log.info("warm-up %-8s %6.1f ms  %3d valves  %3d pipes%s  lint: %d errors, %d warnings in %.1f ms",
+             system_name, seconds * 1000, counts["valves"], counts["pipes"],
+             f"  ({len(errors)} errors)" if errors else "", entry["lint"]["error"], entry["lint"]["warning"],
+             lint_seconds * 1000)
+    return system_name, entry
+
+
+def warm_up(systems=None, workers=None):
+    """Compile ``systems`` (default: all registered) in parallel and return the manifest"""
+    systems = list(REGISTRY) if systems is None else list(systems)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers or min(8, len(systems) or 1)) as pool:
+        for system_name, entry in pool.map(_warm_system, systems):
+            MANIFEST[system_name] = entry
+    log.info("warm-up done: %d systems in %.1f ms", len(systems), (time.perf_counter() - start) * 1000)
+    _done.set()
+    return MANIFEST
+
+
+def start_warm_up():
+    """Kick off warm-up in a background thread, once per process"""
+    global _started
+    if os.environ.get("RIG_WARMUP", "1") == "0":
+        return
+    with _lock:
+        if _started:
+            return
+        _started = True
+    threading.Thread(target=warm_up, name="rig-warmup", daemon=True).start()
+
+
+def is_warming():
+    """True while a started warm-up has not finished yet"""
+    return _started and not _done.is_set()
+
+
+def get_manifest(timeout=None):
+    """The warm-up manifest, waiting up to ``timeout`` seconds for warm-up to finish"""
+    start_warm_up()
+    _done.wait(timeout)
+    return MANIFEST
+
+
+def main(argv):
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(message)s")
+    # Use the importable module, not __main__, so the app sees the same manifest
+    from utils import warmup
+    if argv[:1] == ["run"]:
+        # Warm up inside the server process, then hand over to the Streamlit CLI
+        warmup.start_warm_up()
+        from streamlit.web import cli
+        sys.argv = ["streamlit", *argv]
+        sys.exit(cli.main())
+    warmup.warm_up()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])